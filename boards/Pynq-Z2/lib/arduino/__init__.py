@@ -51,9 +51,20 @@ from .arduino_grove_usranger import Grove_usranger
 from .arduino_grove_autoalarm import Grove_autoalarm
 from .arduino_grove_gesgame import Grove_gesgame
 from .grove_imu import G_IMU
+from .grove_imu import IMUFrame
+from .grove_imu_fusion import OrientationFilter
+from .grove_imu_calibration import IMUCalibration
+from .grove_imu_sampler import IMUSampler
+from .grove_pedometer import Pedometer
+from .grove_vibration import VibrationMonitor
 from .arduino_grove_multisensor import Grove_multi
 from .arduino_grove_pcounter import Grove_pcounter
 from .arduino_grove_psensor import Grove_psensor
+from .arduino_backend import clear_program_cache
+from .arduino_sim import Arduino_Sim
+from .arduino_sim import sim_info
+from .arduino_stats import Arduino_Stats
+from .arduino_stats import instrument
 
 __author__ = "Graham Schelle, Yun Rock Qu"
 __copyright__ = "Copyright 2016, Xilinx"
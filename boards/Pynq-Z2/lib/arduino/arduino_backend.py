@@ -0,0 +1,575 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import asyncio
+import hashlib
+import os
+import time
+import weakref
+from pynq import Clocks
+from pynq import PL
+from . import Arduino
+from . import BATCH_COMMANDS
+from . import BIN_LOCATION
+from . import GET_FIRMWARE_VERSION
+from . import MAILBOX_OFFSET
+from . import MAILBOX_PY2IOP_CMD_OFFSET
+from . import MAILBOX_PY2IOP_DATA_OFFSET
+from .arduino_stats import Arduino_Stats
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+POLL_INTERVAL = 0.001
+EVENT_POLL_INTERVAL = 0.01
+
+_firmware_versions = weakref.WeakKeyDictionary()
+_mailbox_locks = weakref.WeakKeyDictionary()
+_program_cache = dict()
+_switch_configs = weakref.WeakKeyDictionary()
+
+
+def _program_digest(mb_program):
+    if not os.path.isabs(mb_program):
+        mb_program = os.path.join(BIN_LOCATION, mb_program)
+    try:
+        with open(mb_program, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return mb_program
+
+
+def _program_running(microblaze, mb_info):
+    """Return whether a cached instance still runs its program.
+
+    Downloading an overlay resets the IOPs but leaves the `state` of their
+    Python instances untouched; the program the PL records for the IP is
+    cleared by the download, so it is checked as well. Other backends are
+    trusted to report their own `state`.
+
+    """
+    if getattr(microblaze, 'state', 'RUNNING') != 'RUNNING':
+        return False
+    if 'backend' in mb_info:
+        return True
+    ip = PL.ip_dict.get(mb_info['ip_name'])
+    return ip is not None and \
+        ip.get('state') == getattr(microblaze, 'mb_program', None)
+
+
+def open_microblaze(mb_info, mb_program, force=False):
+    """Return the Microblaze instance a Grove driver talks to.
+
+    By default this is a real `Arduino` IOP loaded with `mb_program`. When
+    `mb_info` carries a `backend` entry, that callable is used instead; it
+    is called as `backend(mb_info, mb_program)` and must provide the same
+    mailbox interface as `Arduino` (see `Arduino_Sim`).
+
+    Loaded programs are cached per IOP and backend, keyed by the hash of
+    the binary. If the same binary is still running on the IOP, the
+    existing instance is returned instead of resetting and reloading it;
+    after an overlay download the program is reloaded.
+
+    Parameters
+    ----------
+    mb_info : dict
+        A dictionary storing Microblaze information, such as the
+        IP name and the reset name.
+    mb_program : str
+        The Microblaze program (.bin) to run on the IOP.
+    force : bool
+        Reload the program even if it is already running.
+
+    Returns
+    -------
+    Arduino
+        The Microblaze processor instance.
+
+    """
+    backend = mb_info.get('backend', Arduino)
+    key = (mb_info['ip_name'], backend)
+    digest = _program_digest(mb_program)
+    if not force and key in _program_cache:
+        cached_digest, microblaze = _program_cache[key]
+        if cached_digest == digest and \
+                _program_running(microblaze, mb_info):
+            return microblaze
+
+    microblaze = backend(mb_info, mb_program)
+    _program_cache[key] = (digest, microblaze)
+    return microblaze
+
+
+def clear_program_cache():
+    """Forget all cached programs, so that the next driver reloads."""
+    _program_cache.clear()
+
+
+def base_microblaze(microblaze):
+    """Return the Microblaze instance behind wrappers such as `Arduino_Stats`.
+
+    Per-IOP state (mailbox locks, switch configurations, LED bar caches) is
+    keyed on this instance, so that drivers sharing an IOP share that state
+    whether or not they are instrumented.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance, possibly wrapped.
+
+    Returns
+    -------
+    Arduino
+        The unwrapped Microblaze processor instance.
+
+    """
+    while isinstance(microblaze, Arduino_Stats):
+        microblaze = microblaze.microblaze
+    return microblaze
+
+
+def configure_switch(microblaze, command, pins=None):
+    """Configure the IOP switch of a Grove program.
+
+    `pins` is written to the mailbox and `command` (the program's
+    CONFIG_IOP_SWITCH) is issued. The command is skipped if the same pins
+    were already configured on this instance, which happens when the
+    program was reattached by `open_microblaze`.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The switch configuration command of the program.
+    pins : int or list
+        The pin configuration the program expects, if any.
+
+    Returns
+    -------
+    None
+
+    """
+    config = (command, tuple(pins) if isinstance(pins, list) else pins)
+    key = base_microblaze(microblaze)
+    if _switch_configs.get(key) == config:
+        return
+    if pins is not None:
+        microblaze.write_mailbox(0, pins)
+    microblaze.write_blocking_command(command)
+    _switch_configs[key] = config
+
+
+def fclk0_mhz(microblaze):
+    """Return the frequency of the clock driving the IOP timers.
+
+    Backends that do not run on the PL (such as `Arduino_Sim`) report their
+    own clock through a `fclk0_mhz` attribute.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+
+    Returns
+    -------
+    float
+        The clock frequency in MHz.
+
+    """
+    if hasattr(microblaze, 'fclk0_mhz'):
+        return microblaze.fclk0_mhz
+    return Clocks.fclk0_mhz
+
+
+def firmware_version(microblaze):
+    """Return the version of the extended command set of the running program.
+
+    The programs built from this tree answer `GET_FIRMWARE_VERSION` with
+    their version in the first mailbox word. The stock programs ignore
+    commands they do not know and leave the mailbox untouched, so they
+    report 0. The answer is cached per IOP; a reloaded program is a new
+    instance and is asked again.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+
+    Returns
+    -------
+    int
+        The version, 0 for a stock program.
+
+    """
+    key = base_microblaze(microblaze)
+    if key not in _firmware_versions:
+        microblaze.write_mailbox(0, 0)
+        microblaze.write_blocking_command(GET_FIRMWARE_VERSION)
+        _firmware_versions[key] = microblaze.read_mailbox(0)
+    return _firmware_versions[key]
+
+
+def require_firmware(microblaze, feature, version=1):
+    """Raise an error unless the running program implements a feature.
+
+    Commands added in this tree are silently ignored by the stock programs,
+    which would leave stale mailbox words to be decoded as results. Drivers
+    call this before issuing such a command.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    feature : str
+        The name of the method needing the command, for the error message.
+    version : int
+        The firmware version that introduced the command.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    RuntimeError
+        If the running program is older than `version`.
+
+    """
+    if firmware_version(microblaze) < version:
+        program = os.path.basename(
+            getattr(base_microblaze(microblaze), 'mb_program', ''))
+        raise RuntimeError(
+            "{} needs {} rebuilt with firmware version {} or later; the "
+            "program running on the IOP does not implement it.".format(
+                feature, program or "a program", version))
+
+
+def mailbox_lock(microblaze):
+    """Return the lock serializing asynchronous exchanges with an IOP.
+
+    Coroutines sharing one Microblaze must hold this lock from the first
+    mailbox write of an exchange until its results have been read.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+
+    Returns
+    -------
+    asyncio.Lock
+        The lock associated with `microblaze`.
+
+    """
+    key = base_microblaze(microblaze)
+    if key not in _mailbox_locks:
+        _mailbox_locks[key] = asyncio.Lock()
+    return _mailbox_locks[key]
+
+
+async def write_async_command(microblaze, command,
+                              poll_interval=POLL_INTERVAL):
+    """Issue a command and wait for it without blocking the event loop.
+
+    This is the coroutine counterpart of `write_blocking_command`: the
+    command word is polled every `poll_interval` seconds, and the event
+    loop is free to run other tasks in between.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The command to write to the mailbox.
+    poll_interval : float
+        Time in seconds between two polls of the command word.
+
+    Returns
+    -------
+    None
+
+    """
+    microblaze.write_non_blocking_command(command)
+    while microblaze.read(MAILBOX_OFFSET + MAILBOX_PY2IOP_CMD_OFFSET) != 0:
+        await asyncio.sleep(poll_interval)
+
+
+async def wait_for_interrupt(microblaze, poll_interval=POLL_INTERVAL):
+    """Wait for the Microblaze to raise its interrupt, and acknowledge it.
+
+    If the Microblaze has no interrupt line, this sleeps `poll_interval`
+    seconds instead, so callers degrade to polling.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    poll_interval : float
+        Time in seconds to sleep when there is no interrupt.
+
+    Returns
+    -------
+    None
+
+    """
+    interrupt = getattr(microblaze, 'interrupt', None)
+    if interrupt is None:
+        await asyncio.sleep(poll_interval)
+        return
+    await interrupt.wait()
+    interrupt.clear()
+
+
+async def _wait_for_event(microblaze, command, lock=None):
+    restart = 1
+    while True:
+        if lock is None:
+            microblaze.write_mailbox(0, restart)
+            microblaze.write_blocking_command(command)
+            occurred = microblaze.read_mailbox(0)
+        else:
+            async with lock:
+                microblaze.write_mailbox(0, restart)
+                await write_async_command(microblaze, command)
+                occurred = microblaze.read_mailbox(0)
+        if occurred:
+            return
+        restart = 0
+        await wait_for_interrupt(microblaze)
+
+
+async def wait_for_event_async(microblaze, command):
+    """Wait for an event the Microblaze signals with its interrupt.
+
+    `command` arms the program: it is issued with 1 in the mailbox the
+    first time, to forget earlier events, and 0 after each interrupt. It
+    returns a non-zero word once the event has occurred; until then the
+    program raises its interrupt when the event occurs. Use
+    `asyncio.wait_for` to add a timeout.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The command arming the program, e.g. `WAIT_MOTION`.
+
+    Returns
+    -------
+    None
+
+    """
+    await _wait_for_event(microblaze, command, mailbox_lock(microblaze))
+
+
+def _poll_for_event(microblaze, command, timeout):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    restart = 1
+    while True:
+        microblaze.write_mailbox(0, restart)
+        microblaze.write_blocking_command(command)
+        if microblaze.read_mailbox(0):
+            return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        restart = 0
+        time.sleep(EVENT_POLL_INTERVAL)
+
+
+def wait_for_event(microblaze, command, timeout=None):
+    """Block until an event the Microblaze signals with its interrupt.
+
+    This is the blocking counterpart of `wait_for_event_async`. The
+    interrupt of a Microblaze can only be awaited on the event loop it was
+    created on, which is the default loop of the thread owning the
+    overlay. When that thread has no running loop, the wait runs on its
+    loop and sleeps until the interrupt. When a loop is already running,
+    as in Jupyter, it cannot be re-entered; the command is then polled
+    every `EVENT_POLL_INTERVAL` seconds instead, which blocks that loop.
+    Coroutines should use `wait_for_event_async`. Programs without an
+    interrupt are always polled.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The command arming the program, e.g. `WAIT_MOTION`.
+    timeout : float
+        Time in seconds to wait at most; None to wait forever.
+
+    Returns
+    -------
+    bool
+        True if the event occurred, False on timeout.
+
+    """
+    try:
+        asyncio.get_running_loop()
+        loop_running = True
+    except RuntimeError:
+        loop_running = False
+    if loop_running or getattr(microblaze, 'interrupt', None) is None:
+        return _poll_for_event(microblaze, command, timeout)
+
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(asyncio.wait_for(
+            _wait_for_event(microblaze, command), timeout))
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+class Transaction(object):
+    """This class batches several Grove commands into one mailbox exchange.
+
+    Queued commands are written to the mailbox as `[n, cmd_1, ..., cmd_n]`
+    and issued with a single `BATCH_COMMANDS`. The program runs them in
+    order and writes their results back to back from the start of the
+    mailbox, so all of them are collected with one `read_mailbox` call.
+    Only commands that take no input data can be batched, and only by the
+    programs built from this tree (see `firmware_version`).
+
+    Attributes
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance the commands are sent to.
+    commands : list
+        The queued `(command, num_words)` pairs.
+    num_words : int
+        The total number of result words of the queued commands.
+
+    """
+    def __init__(self, microblaze):
+        """Return a new, empty transaction.
+
+        Parameters
+        ----------
+        microblaze : Arduino
+            Microblaze processor instance the commands are sent to.
+
+        """
+        self.microblaze = microblaze
+        self.commands = []
+        self.num_words = 0
+
+    def add(self, command, num_words):
+        """Queue a command.
+
+        Parameters
+        ----------
+        command : int
+            The command code.
+        num_words : int
+            The number of result words the command writes to the mailbox.
+
+        Returns
+        -------
+        Transaction
+            This transaction, so that calls can be chained.
+
+        """
+        total = self.num_words + num_words
+        if max(total, len(self.commands) + 2) * 4 > \
+                MAILBOX_PY2IOP_DATA_OFFSET:
+            raise ValueError("Transaction does not fit in the mailbox.")
+        self.commands.append((command, num_words))
+        self.num_words = total
+        return self
+
+    def execute(self):
+        """Run all queued commands in one firmware dispatch.
+
+        Returns
+        -------
+        list
+            One list of result words per queued command, in order.
+
+        Raises
+        ------
+        RuntimeError
+            If the running program cannot batch commands.
+
+        """
+        require_firmware(self.microblaze, "Transaction.execute")
+        self._write_commands()
+        self.microblaze.write_blocking_command(BATCH_COMMANDS)
+        return self._read_results()
+
+    async def execute_async(self, poll_interval=POLL_INTERVAL):
+        """Run all queued commands without blocking the event loop.
+
+        Parameters
+        ----------
+        poll_interval : float
+            Time in seconds between two polls of the command word.
+
+        Returns
+        -------
+        list
+            One list of result words per queued command, in order.
+
+        Raises
+        ------
+        RuntimeError
+            If the running program cannot batch commands.
+
+        """
+        async with mailbox_lock(self.microblaze):
+            require_firmware(self.microblaze, "Transaction.execute_async")
+            self._write_commands()
+            await write_async_command(self.microblaze, BATCH_COMMANDS,
+                                      poll_interval)
+            return self._read_results()
+
+    def _write_commands(self):
+        codes = [command for command, _ in self.commands]
+        self.microblaze.write_mailbox(0, [len(codes)] + codes)
+
+    def _read_results(self):
+        data = self.microblaze.read_mailbox(0, self.num_words)
+        if self.num_words == 1:
+            data = [data]
+
+        results = []
+        start = 0
+        for _, num_words in self.commands:
+            results.append(data[start:start + num_words])
+            start += num_words
+        return results
@@ -27,8 +27,18 @@
 #   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF 
 #   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from pynq import Clocks
-from . import Arduino
+from .arduino_backend import fclk0_mhz
+from .arduino_backend import configure_switch
+from .arduino_backend import open_microblaze
+from .arduino_backend import require_firmware
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
+from .arduino_backend import wait_for_interrupt
+from .grove_ledbar import play_ledbar
+from .grove_ledbar import reclaim_ledbar
+from .grove_ledbar import release_ledbar
+from .grove_ledbar import stop_ledbar
+from .grove_ledbar import write_ledbar
 from . import ARDUINO_GROVE_G1
 from . import ARDUINO_GROVE_G2
 from . import ARDUINO_GROVE_G3
@@ -36,6 +46,7 @@ from . import ARDUINO_GROVE_G4
 from . import ARDUINO_GROVE_G5
 from . import ARDUINO_GROVE_G6
 from . import ARDUINO_GROVE_G7
+from . import MAILBOX_PY2IOP_DATA_OFFSET
 
 __author__ = "zou cong"
 __copyright__ = "Copyright 2019, Xilinx"
@@ -46,6 +57,18 @@ ARDUINO_GROVE_AUTOALARM_PROGRAM = "arduino_grove_autoalarm.bin"
 CONFIG_IOP_SWITCH = 0x1
 GET_DISTANCE =      0x3
 WRITE_LEDS =        0x5
+START_EVENTS =      0x7
+STOP_EVENTS =       0x9
+READ_EVENTS =       0xB
+PLAY_SEQUENCE =     0xD
+STOP_SEQUENCE =     0xF
+
+# Default distance bands (cm): the closer, the fewer LEDs lit
+DEFAULT_THRESHOLDS = (10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+MAX_THRESHOLDS = 15
+
+# READ_EVENTS returns [count, dropped] followed by count events of 3 words
+MAX_EVENTS = (MAILBOX_PY2IOP_DATA_OFFSET // 4 - 2) // 3
 
 class Grove_autoalarm(object):
     """This class controls the grove_usranger. 
@@ -56,6 +79,11 @@ class Grove_autoalarm(object):
     ----------
     microblaze : Arduino
         Microblaze processor instance used by this module.
+    band : int
+        The distance band last reported in event mode, or None.
+    events_dropped : int
+        The number of events the Microblaze dropped because its queue was
+        full.
         
     """
     def __init__(self, mb_info, us_pin = ARDUINO_GROVE_G1, led_pin = ARDUINO_GROVE_G4):
@@ -87,9 +115,11 @@ class Grove_autoalarm(object):
                            ARDUINO_GROVE_G7]:
             raise ValueError("Group number of ledbar can only be G1 - G7.")
         
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_AUTOALARM_PROGRAM)
-        self.microblaze.write_mailbox(0, us_pin + led_pin)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_AUTOALARM_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH, us_pin + led_pin)
+        self._clk_period_ns = int(1000 / fclk0_mhz(self.microblaze))
+        self.band = None
+        self.events_dropped = 0
 
     def get_distance(self):
         '''
@@ -105,18 +135,167 @@ class Grove_autoalarm(object):
         '''
         self.microblaze.write_blocking_command(GET_DISTANCE)
         raw_value = self.microblaze.read_mailbox(0)
-        clk_period_ns = int(1000 / Clocks.fclk0_mhz)
-        num_microseconds = raw_value * clk_period_ns * 0.001
+        return self._distance(raw_value)
+
+    async def get_distance_async(self):
+        '''
+        get the distance from usranger asynchronously
+
+        Returns
+        -------
+        float : distance in cm, same as `get_distance`
+        '''
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_DISTANCE)
+            raw_value = self.microblaze.read_mailbox(0)
+        return self._distance(raw_value)
+
+    def _distance(self, raw_value):
+        num_microseconds = raw_value * self._clk_period_ns * 0.001
         if num_microseconds * 0.001 > 30:
             return 500
         else:
             return num_microseconds/58
+
+    def _counts(self, distance):
+        return int(distance * 58 * 1000 / self._clk_period_ns)
+
+    def start_events(self, thresholds=DEFAULT_THRESHOLDS, patterns=None,
+                     hysteresis=2, period=0.05):
+        '''
+        start the event mode
+
+        The Microblaze measures the distance every `period` seconds and
+        sorts it into the bands delimited by `thresholds`. When the band
+        changes, it shows the pattern of the new band on the LED bar and
+        queues an event for the host, raising its interrupt. A band is
+        only left once the distance is `hysteresis` cm past its edge.
+
+        Parameters
+        ----------
+        thresholds : list
+            increasing band edges in cm; band 0 is below the first one
+        patterns : list
+            LED bar pattern of each band, one more than `thresholds`;
+            by default the number of LEDs lit grows with the distance
+        hysteresis : float
+            distance in cm past a band edge needed to change band
+        period : float
+            time in seconds between two measurements
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            if the program on the IOP predates the event mode
+        '''
+        require_firmware(self.microblaze, "Grove_autoalarm.start_events")
+        thresholds = list(thresholds)
+        if not 0 < len(thresholds) <= MAX_THRESHOLDS:
+            raise ValueError("Number of thresholds can only be 1 - {}.".format(
+                MAX_THRESHOLDS))
+        if any(a >= b for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError("Thresholds must be increasing.")
+        num_bands = len(thresholds) + 1
+        if patterns is None:
+            patterns = [(1 << (10 * band // (num_bands - 1))) - 1
+                        for band in range(num_bands)]
+        if len(patterns) != num_bands:
+            raise ValueError("Expected {} patterns.".format(num_bands))
+
+        data = [int(period * 1e6), self._counts(hysteresis), len(thresholds)]
+        data += [self._counts(threshold) for threshold in thresholds]
+        data += [pattern & 0x3ff for pattern in patterns]
+        self.microblaze.write_mailbox(0, data)
+        self.microblaze.write_blocking_command(START_EVENTS)
+        release_ledbar(self.microblaze, until_write=False)
+        self.band = None
+        self.events_dropped = 0
+
+    def stop_events(self):
+        '''
+        stop the event mode and discard pending events
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            if the program on the IOP predates the event mode
+        '''
+        require_firmware(self.microblaze, "Grove_autoalarm.stop_events")
+        self.microblaze.write_blocking_command(STOP_EVENTS)
+        reclaim_ledbar(self.microblaze)
+
+    def read_events(self):
+        '''
+        read the band transitions since the previous read
+
+        Returns
+        -------
+        list : (time, band, distance) tuples, oldest first, with the time
+               in seconds since `start_events` and the distance in cm
+
+        Raises
+        ------
+        RuntimeError
+            if the program on the IOP predates the event mode
+        '''
+        require_firmware(self.microblaze, "Grove_autoalarm.read_events")
+        self.microblaze.write_blocking_command(READ_EVENTS)
+        return self._events()
+
+    async def wait_events(self):
+        '''
+        wait for band transitions without blocking the event loop
+
+        The coroutine sleeps until the Microblaze raises its interrupt,
+        so no mailbox traffic happens while the band does not change.
+
+        Returns
+        -------
+        list : the events, as returned by `read_events`
+
+        Raises
+        ------
+        RuntimeError
+            if the program on the IOP predates the event mode
+        '''
+        while True:
+            async with mailbox_lock(self.microblaze):
+                require_firmware(self.microblaze,
+                                 "Grove_autoalarm.wait_events")
+                await write_async_command(self.microblaze, READ_EVENTS)
+                events = self._events()
+            if events:
+                return events
+            await wait_for_interrupt(self.microblaze)
+
+    def _events(self):
+        count, dropped = self.microblaze.read_mailbox(0, 2)
+        if count > MAX_EVENTS:
+            raise RuntimeError("Microblaze reported {} events, at most {} "
+                               "fit in the mailbox.".format(count, MAX_EVENTS))
+        self.events_dropped += dropped
+        if count == 0:
+            return []
+        data = self.microblaze.read_mailbox(8, 3 * count)
+        events = [(data[i] / 1000, data[i + 1], self._distance(data[i + 2]))
+                  for i in range(0, 3 * count, 3)]
+        self.band = events[-1][1]
+        return events
+
     def write_binary(self, data_in):
         """Set individual LEDs in the LEDbar based on 10 bit binary input.
 
         Each bit in the 10-bit `data_in` points to a LED position on the
         LEDbar. Red LED corresponds to the LSB, while green LED corresponds
-        to the MSB.
+        to the MSB. Nothing is sent if the LEDbar already shows `data_in`.
 
         Parameters
         ----------
@@ -128,5 +307,50 @@ class Grove_autoalarm(object):
         None
 
         """
-        self.microblaze.write_mailbox(0, data_in)
-        self.microblaze.write_blocking_command(WRITE_LEDS)
+        write_ledbar(self.microblaze, WRITE_LEDS, [data_in], data_in & 0x3ff)
+
+    def play_sequence(self, patterns, durations, repeat=1):
+        """Play an animation on the LEDbar from the Microblaze.
+
+        All the frames are uploaded in one mailbox write and played by the
+        Microblaze, so the host is free to issue other commands meanwhile.
+        Playing another sequence replaces this one; writing the LEDbar
+        cancels it.
+
+        Parameters
+        ----------
+        patterns : list
+            The 10-bit LED pattern of each frame.
+        durations : float or list
+            The duration of each frame in seconds, or one for all frames.
+        repeat : int
+            The number of times the sequence is played, 0 to loop forever.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates LED bar sequences.
+
+        """
+        play_ledbar(self.microblaze, PLAY_SEQUENCE, patterns, durations,
+                    repeat)
+
+    def stop_sequence(self):
+        """Stop the animation, leaving its current frame lit.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates LED bar sequences.
+
+        """
+        stop_ledbar(self.microblaze, STOP_SEQUENCE)
+
@@ -27,8 +27,13 @@
 #   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF 
 #   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from pynq import Clocks
-from . import Arduino
+from .arduino_backend import configure_switch
+from .arduino_backend import open_microblaze
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
+from .grove_ledbar import play_ledbar
+from .grove_ledbar import stop_ledbar
+from .grove_ledbar import write_ledbar
 from . import ARDUINO_GROVE_G1
 from . import ARDUINO_GROVE_G2
 from . import ARDUINO_GROVE_G3
@@ -46,6 +51,8 @@ ARDUINO_GROVE_GESGAME_PROGRAM = "arduino_grove_gesgame.bin"
 CONFIG_IOP_SWITCH = 0x1
 GET_GESTURE =       0x3
 WRITE_LEDS =        0x5
+PLAY_SEQUENCE =     0x7
+STOP_SEQUENCE =     0x9
 
 GESTURE_MAP = {0: "no-detection",
 
@@ -102,9 +109,8 @@ class Grove_gesgame(object):
                            ARDUINO_GROVE_G7]:
             raise ValueError("Group number of ledbar can only be G1 - G7.")
         
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_GESGAME_PROGRAM)
-        self.microblaze.write_mailbox(0, led_pin)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_GESGAME_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH, led_pin)
 
     def get_gesture(self):
         '''
@@ -121,13 +127,26 @@ class Grove_gesgame(object):
         self.microblaze.write_blocking_command(GET_GESTURE)
         value = self.microblaze.read_mailbox(0)
         return value
+
+    async def get_gesture_async(self):
+        '''
+        get the gesture code asynchronously
+
+        Returns
+        -------
+        int : gesture code, same as `get_gesture`
+        '''
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_GESTURE)
+            value = self.microblaze.read_mailbox(0)
+        return value
     
     def write_binary(self, data_in):
         """Set individual LEDs in the LEDbar based on 10 bit binary input.
 
         Each bit in the 10-bit `data_in` points to a LED position on the
         LEDbar. Red LED corresponds to the LSB, while green LED corresponds
-        to the MSB.
+        to the MSB. Nothing is sent if the LEDbar already shows `data_in`.
 
         Parameters
         ----------
@@ -139,5 +158,50 @@ class Grove_gesgame(object):
         None
 
         """
-        self.microblaze.write_mailbox(0, data_in)
-        self.microblaze.write_blocking_command(WRITE_LEDS)
+        write_ledbar(self.microblaze, WRITE_LEDS, [data_in], data_in & 0x3ff)
+
+    def play_sequence(self, patterns, durations, repeat=1):
+        """Play an animation on the LEDbar from the Microblaze.
+
+        All the frames are uploaded in one mailbox write and played by the
+        Microblaze, so the host is free to issue other commands meanwhile.
+        Playing another sequence replaces this one; writing the LEDbar
+        cancels it.
+
+        Parameters
+        ----------
+        patterns : list
+            The 10-bit LED pattern of each frame.
+        durations : float or list
+            The duration of each frame in seconds, or one for all frames.
+        repeat : int
+            The number of times the sequence is played, 0 to loop forever.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates LED bar sequences.
+
+        """
+        play_ledbar(self.microblaze, PLAY_SEQUENCE, patterns, durations,
+                    repeat)
+
+    def stop_sequence(self):
+        """Stop the animation, leaving its current frame lit.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates LED bar sequences.
+
+        """
+        stop_ledbar(self.microblaze, STOP_SEQUENCE)
+
@@ -1,4 +1,4 @@
-from . import Arduino
+from .arduino_backend import open_microblaze
 
 from . import ARDUINO_GROVE_I2C
 
@@ -106,7 +106,7 @@ class Grove_Gesture(object):
 
 
 
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_GESTURE_PROGRAM)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_GESTURE_PROGRAM)
 
         self.reset()
 
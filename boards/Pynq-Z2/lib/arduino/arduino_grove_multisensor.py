@@ -29,7 +29,28 @@
 
 
 import math
-from . import Arduino
+from .arduino_backend import configure_switch
+from .arduino_backend import firmware_version
+from .arduino_backend import open_microblaze
+from .arduino_backend import require_firmware
+from .arduino_backend import Transaction
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
+from .grove_codec import BMP180_CONVERSION_MS
+from .grove_codec import BMP180_ULTRA_LOW_POWER
+from .grove_codec import IMUDecoder
+from .grove_codec import decode_floats
+from .grove_codec import encode_imu_config
+from .grove_codec import imu_scale
+from .grove_codec import present
+from .grove_imu_calibration import IMUCalibration
+from .grove_imu_calibration import calibrate
+from .grove_imu_math import atm
+from .grove_imu_math import barometric_altitude
+from .grove_imu_math import heading
+from .grove_imu_math import tilt_heading
+from .grove_imu_math import pressure_to_atm
+from .grove_imu_math import pressure_to_barometric_altitude
 from . import ARDUINO_GROVE_I2C
 from . import LT_PINS
 from . import ARDUINO_GROVE_G1
@@ -52,52 +73,11 @@ CONFIG_IOP_SWITCH = 0x1
 GET_IMU_DATA =      0x3
 GET_DTH_DATA =      0x5
 GET_ALIGHT_DATA =   0x7
+CONFIGURE_IMU =     0x9
+GET_PRESSURE =      0xB
 
-
-def _reg2float(reg):
-    """Converts 32-bit register value to floats in Python.
-
-    Parameters
-    ----------
-    reg: int
-        A 32-bit register value read from the mailbox.
-
-    Returns
-    -------
-    float
-        A float number translated from the register value.
-
-    """
-    if reg == 0:
-        return 0.0
-    sign = (reg & 0x80000000) >> 31 & 0x01
-    exp = ((reg & 0x7f800000) >> 23) - 127
-    if exp == 0:
-        man = (reg & 0x007fffff) / pow(2, 23)
-    else:
-        man = 1 + (reg & 0x007fffff) / pow(2, 23)
-    result = pow(2, exp) * man * ((sign * -2) + 1)
-    return float("{0:.2f}".format(result))
-
-
-def _reg2int(reg):
-    """Converts 32-bit register value to signed integer in Python.
-
-    Parameters
-    ----------
-    reg: int
-        A 32-bit register value read from the mailbox.
-
-    Returns
-    -------
-    int
-        A signed integer translated from the register value.
-
-    """
-    result = -(reg >> 31 & 0x1) * (1 << 31)
-    for i in range(31):
-        result += (reg >> i & 0x1) * (1 << i)
-    return result
+# Light sensor: 0-3.3V corresponds to 0-350 Lux
+LIGHT_SCALE = 350 / 3.3
 
 
 class Grove_multi(object):
@@ -119,9 +99,12 @@ class Grove_multi(object):
     ----------
     microblaze : Arduino
         Microblaze processor instance used by this module.
+    decoder : IMUDecoder
+        The decoder turning raw IMU frames into calibrated physical values.
         
     """
-    def __init__(self, mb_info, imu_pin = ARDUINO_GROVE_I2C, dth_pin = ARDUINO_GROVE_G2, al_pin = "CHANNEL_A0"):
+    def __init__(self, mb_info, imu_pin = ARDUINO_GROVE_I2C, dth_pin = ARDUINO_GROVE_G2, al_pin = "CHANNEL_A0",
+                 calibration=None):
         """Return a new instance of an Grove IMU object. 
         
         Parameters
@@ -131,6 +114,9 @@ class Grove_multi(object):
             IP name and the reset name.
         gr_pin: list
             A group of pins on arduino-grove shield.
+        calibration : IMUCalibration or str
+            Optional IMU calibration, or the path or device name of a saved
+            one, applied to all the IMU data read.
 
         """
         if imu_pin not in [ARDUINO_GROVE_I2C]:
@@ -153,12 +139,24 @@ class Grove_multi(object):
         pin.append(LT_PINS[al_pin])
         print(pin)
 
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_MULTISENSOR_PROGRAM)
-        self.microblaze.write_mailbox(0, pin)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_MULTISENSOR_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH, pin)
+        if isinstance(calibration, str):
+            calibration = IMUCalibration.load(calibration)
+        self.decoder = IMUDecoder(calibration=calibration)
 
-    def get_imu_data(self):
+    def get_imu_data(self, precision=2, out=None):
         """Get the whole data from the grove IMU.
+
+        With `precision=None` the values are returned at full float32
+        precision, without rounding, in `out` if it is given.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+        out : numpy.ndarray
+            Optional float32 array of 11 elements receiving raw values.
         
         Returns
         -------
@@ -167,46 +165,312 @@ class Grove_multi(object):
             [3,4,5] A list of the gyro data along X-axis, Y-axis, and Z-axis.
             [6,7,8] A list of the compass data along X-axis, Y-axis, and Z-axis.
             [9,10]  A list of the value of temperature and pressure.
+            A numpy.ndarray with the same layout if `precision` is None.
         """
         self.microblaze.write_blocking_command(GET_IMU_DATA)
         data = self.microblaze.read_mailbox(0, 11)
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = [_reg2float(i) for i in data]
-
-        return [float("{0:.2f}".format(ax / 16384)),
-                float("{0:.2f}".format(ay / 16384)),
-                float("{0:.2f}".format(az / 16384)),
-                float("{0:.2f}".format(gx * 250 / 32768)),
-                float("{0:.2f}".format(gy * 250 / 32768)),
-                float("{0:.2f}".format(gz * 250 / 32768)),
-                float("{0:.2f}".format(mx * 1200 / 4096)),
-                float("{0:.2f}".format(my * 1200 / 4096)),
-                float("{0:.2f}".format(mz * 1200 / 4096)),
-                float("{0:.2f}".format(temp)),
-                float("{0:.2f}".format(pres))]
-    def get_dht_data(self):
+        return self._imu_data(data, precision, out)
+
+    def get_pressure(self, oversampling=BMP180_ULTRA_LOW_POWER, precision=2):
+        """Get the temperature and pressure from the barometer only.
+
+        Only the BMP180 is read, not the whole IMU frame. The oversampling
+        setting trades conversion time for resolution, from 4.5 ms with
+        `BMP180_ULTRA_LOW_POWER` to 25.5 ms with
+        `BMP180_ULTRA_HIGH_RESOLUTION`. This needs a program built with
+        the `GET_PRESSURE` command.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3.
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        list
+            [0,1] A list of the value of temperature and pressure.
+            A numpy.ndarray with the same layout if `precision` is None.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `GET_PRESSURE`.
+
+        """
+        require_firmware(self.microblaze, "Grove_multi.get_pressure")
+        if oversampling not in range(len(BMP180_CONVERSION_MS)):
+            raise ValueError("Oversampling can only be 0 - 3.")
+        self.microblaze.write_mailbox(0, oversampling)
+        self.microblaze.write_blocking_command(GET_PRESSURE)
+        data = self.microblaze.read_mailbox(0, 2)
+        return present(decode_floats(data), precision)
+
+    async def get_pressure_async(self, oversampling=BMP180_ULTRA_LOW_POWER,
+                                 precision=2):
+        """Get the temperature and pressure asynchronously.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3.
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        list
+            The same values as `get_pressure`.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `GET_PRESSURE`.
+
+        """
+        if oversampling not in range(len(BMP180_CONVERSION_MS)):
+            raise ValueError("Oversampling can only be 0 - 3.")
+        async with mailbox_lock(self.microblaze):
+            require_firmware(self.microblaze,
+                             "Grove_multi.get_pressure_async")
+            self.microblaze.write_mailbox(0, oversampling)
+            await write_async_command(self.microblaze, GET_PRESSURE)
+            data = self.microblaze.read_mailbox(0, 2)
+        return present(decode_floats(data), precision)
+
+    def get_dht_data(self, precision=2, out=None):
         """Get the whole data from the grove DTH11.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+        out : numpy.ndarray
+            Optional float32 array of 2 elements receiving raw values.
         
         Returns
         -------
         list
             [0,1] A list of data, [0] is temperature (Celcius), [1] is humidity (percent).
+            A numpy.ndarray with the same layout if `precision` is None.
         """
         self.microblaze.write_blocking_command(GET_DTH_DATA)
         data = self.microblaze.read_mailbox(0, 2)
-        [temp, humi] = [_reg2float(i) for i in data]
+        return self._dht_data(data, precision, out)
+
+    def get_al_data(self, precision=2):
+        """Get the illuminance from the grove light sensor.
 
-        return[float("{0:.2f}".format(temp)),
-               float("{0:.2f}".format(humi))]
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
 
-    def get_al_data(self):
+        Returns
+        -------
+        float
+            The illuminance (Lux).
+        """
         self.microblaze.write_blocking_command(GET_ALIGHT_DATA)
         voltage = self.microblaze.read_mailbox(0)
-        voltage = _reg2float(voltage)
+        return self._al_data([voltage], precision)
 
-        return float("{0:.2f}".format((voltage*350) / 3.3))
+    def get_all_data(self, precision=2):
+        """Get the IMU, DTH11 and light sensor data, batched if possible.
+
+        If the program can batch commands (see `firmware_version`), the
+        three reads are made in a single mailbox exchange. The stock program
+        cannot, so `get_imu_data`, `get_dht_data` and `get_al_data` are
+        then called one after another.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        list
+            [0] The IMU data, as returned by `get_imu_data`.
+            [1] The DTH11 data, as returned by `get_dht_data`.
+            [2] The illuminance, as returned by `get_al_data`.
+        """
+        if not firmware_version(self.microblaze):
+            return [self.get_imu_data(precision),
+                    self.get_dht_data(precision),
+                    self.get_al_data(precision)]
+        imu, dht, al = Transaction(self.microblaze) \
+            .add(GET_IMU_DATA, 11) \
+            .add(GET_DTH_DATA, 2) \
+            .add(GET_ALIGHT_DATA, 1) \
+            .execute()
+        return [self._imu_data(imu, precision),
+                self._dht_data(dht, precision),
+                self._al_data(al, precision)]
+
+    async def get_imu_data_async(self, precision=2, out=None):
+        """Get the whole data from the grove IMU asynchronously.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+        out : numpy.ndarray
+            Optional float32 array of 11 elements receiving raw values.
+
+        Returns
+        -------
+        list
+            The same values as `get_imu_data`.
+        """
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_IMU_DATA)
+            data = self.microblaze.read_mailbox(0, 11)
+        return self._imu_data(data, precision, out)
+
+    async def get_dht_data_async(self, precision=2, out=None):
+        """Get the whole data from the grove DTH11 asynchronously.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+        out : numpy.ndarray
+            Optional float32 array of 2 elements receiving raw values.
+
+        Returns
+        -------
+        list
+            The same values as `get_dht_data`.
+        """
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_DTH_DATA)
+            data = self.microblaze.read_mailbox(0, 2)
+        return self._dht_data(data, precision, out)
+
+    async def get_al_data_async(self, precision=2):
+        """Get the illuminance from the grove light sensor asynchronously.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        float
+            The same value as `get_al_data`.
+        """
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_ALIGHT_DATA)
+            voltage = self.microblaze.read_mailbox(0)
+        return self._al_data([voltage], precision)
+
+    async def get_all_data_async(self, precision=2):
+        """Get all sensor data asynchronously, batched if possible.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        list
+            The same values as `get_all_data`.
+        """
+        async with mailbox_lock(self.microblaze):
+            batched = firmware_version(self.microblaze) > 0
+        if not batched:
+            return [await self.get_imu_data_async(precision),
+                    await self.get_dht_data_async(precision),
+                    await self.get_al_data_async(precision)]
+        imu, dht, al = await Transaction(self.microblaze) \
+            .add(GET_IMU_DATA, 11) \
+            .add(GET_DTH_DATA, 2) \
+            .add(GET_ALIGHT_DATA, 1) \
+            .execute_async()
+        return [self._imu_data(imu, precision),
+                self._dht_data(dht, precision),
+                self._al_data(al, precision)]
+
+    def configure_imu(self, accel_range=2, gyro_range=250, rate=None,
+                      bandwidth=184):
+        """Configure the MPU9250 ranges, data rate and low-pass filter.
+
+        The scale factors used to decode the data follow the new ranges,
+        and compose with the calibration, if any.
+
+        Parameters
+        ----------
+        accel_range : int
+            The accelerometer full-scale range in g: 2, 4, 8 or 16.
+        gyro_range : int
+            The gyroscope full-scale range in deg/s: 250, 500, 1000 or
+            2000.
+        rate : float
+            The output data rate in Hz, up to 1 kHz; None for 1 kHz. It is
+            fixed to 8 kHz with a 250 Hz bandwidth.
+        bandwidth : int
+            The low-pass filter bandwidth in Hz: 250, 184, 92, 41, 20, 10
+            or 5.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `CONFIGURE_IMU`.
+
+        """
+        require_firmware(self.microblaze, "Grove_multi.configure_imu")
+        data = encode_imu_config(accel_range, gyro_range, rate, bandwidth)
+        self.microblaze.write_mailbox(0, data)
+        self.microblaze.write_blocking_command(CONFIGURE_IMU)
+        self.decoder.scale = imu_scale(accel_range, gyro_range)
+
+    def _imu_data(self, data, precision=2, out=None):
+        return present(self.decoder.decode(data, out), precision)
+
+    def calibrate(self, num_samples=1000, rate=50, num_stationary=0,
+                  device=None):
+        """Record a rotation sweep and calibrate the IMU with it.
+
+        See `G_IMU.calibrate`.
+
+        Parameters
+        ----------
+        num_samples : int
+            The number of frames in the sweep.
+        rate : float
+            The sampling rate in Hz.
+        num_stationary : int
+            The number of frames taken at rest before the sweep.
+        device : str
+            The name of the calibrated device.
+
+        Returns
+        -------
+        IMUCalibration
+            The fitted calibration.
+
+        """
+        self.decoder.calibration = None
+        self.decoder.calibration = calibrate(
+            lambda: self.get_imu_data(precision=None), num_samples, rate,
+            num_stationary, device)
+        return self.decoder.calibration
+
+    @staticmethod
+    def _dht_data(data, precision=2, out=None):
+        return present(decode_floats(data, out=out), precision)
+
+    @staticmethod
+    def _al_data(data, precision=2):
+        return present(decode_floats(data, LIGHT_SCALE), precision)[0]
         
     def get_heading(self):
         """Get the value of the heading.
@@ -217,15 +481,8 @@ class Grove_multi(object):
             The angle deviated from the X-axis, toward the positive Y-axis.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-        
-        heading = 180 * math.atan2(my, mx) / math.pi
-        if heading < 0:
-            heading += 360
-        return float("{0:.2f}".format(heading))
+        data = self.get_imu_data(precision=None)
+        return float("{0:.2f}".format(heading(data)))
 
     def get_tilt_heading(self):
         """Get the value of the tilt heading.
@@ -236,46 +493,47 @@ class Grove_multi(object):
             The tilt heading value.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-
-        try:
-            pitch = math.asin(-ax)
-            roll = math.asin(ay / math.cos(pitch))
-        except ZeroDivisionError:
+        data = self.get_imu_data(precision=None)
+        tilt = float(tilt_heading(data))
+        if math.isnan(tilt):
             raise RuntimeError("Value out of range or device not connected.")
+        return float("{0:.2f}".format(tilt))
 
-        xh = mx * math.cos(pitch) + mz * math.sin(pitch)
-        yh = mx * math.sin(roll) * math.sin(pitch) + \
-            my * math.cos(roll) - mz * math.sin(roll) * math.cos(pitch)
-        _ = -mx * math.cos(roll) * math.sin(pitch) + \
-            my * math.sin(roll) + mz * math.cos(roll) * math.cos(pitch)
-        tilt_heading = 180 * math.atan2(yh, xh) / math.pi
-        if yh < 0:
-            tilt_heading += 360
-        return float("{0:.2f}".format(tilt_heading))
-        
-        
-    def get_atm(self):
+    def get_atm(self, oversampling=None):
         """Get the current pressure in relative atmosphere.
 
+        By default the value is derived from a whole IMU frame. With an
+        `oversampling` setting, only the barometer is read instead, see
+        `get_pressure`; this needs a program built with `GET_PRESSURE`.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3, or None to read a frame.
+
         Returns
         -------
         float
             The related atmosphere.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-        
-        return float("{0:.2f}".format(pres / 101325))
+        if oversampling is None:
+            data = self.get_imu_data(precision=None)
+            return float("{0:.2f}".format(atm(data)))
+        pressure = self.get_pressure(oversampling, precision=None)[1]
+        return float("{0:.2f}".format(pressure_to_atm(pressure)))
         
-    def get_altitude(self):
+    def get_altitude(self, oversampling=None):
         """Get the current altitude.
+
+        By default the value is derived from a whole IMU frame. With an
+        `oversampling` setting, only the barometer is read instead, see
+        `get_pressure`; this needs a program built with `GET_PRESSURE`.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3, or None to read a frame.
         
         Returns
         -------
@@ -283,13 +541,9 @@ class Grove_multi(object):
             The altitude value.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-        
-        a = pres / 101325
-        b = 1 / 5.255
-        c = 1 - pow(a, b)
-        altitude = 44300 * c
-        return float("{0:.2f}".format(altitude))
+        if oversampling is None:
+            data = self.get_imu_data(precision=None)
+            return float("{0:.2f}".format(barometric_altitude(data)))
+        pressure = self.get_pressure(oversampling, precision=None)[1]
+        return float("{0:.2f}".format(
+            pressure_to_barometric_altitude(pressure)))
@@ -28,7 +28,22 @@
 #   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from . import Arduino
+from .arduino_backend import configure_switch
+from .arduino_backend import open_microblaze
+from .arduino_backend import require_firmware
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
+from .arduino_backend import wait_for_event
+from .arduino_backend import wait_for_event_async
+from .grove_ledbar import encode_brightness
+from .grove_ledbar import encode_level
+from .grove_ledbar import invalidate_ledbar
+from .grove_ledbar import play_ledbar
+from .grove_ledbar import read_ledbar
+from .grove_ledbar import reclaim_ledbar
+from .grove_ledbar import release_ledbar
+from .grove_ledbar import stop_ledbar
+from .grove_ledbar import write_ledbar
 from . import ARDUINO_GROVE_G1
 from . import ARDUINO_GROVE_G2
 from . import ARDUINO_GROVE_G3
@@ -56,6 +71,15 @@ SET_BRIGHTNESS =    0x7
 SET_LEVEL =         0x9
 READ_LEDS =         0xB
 READ_PIR  =         0xD
+PLAY_SEQUENCE =     0xF
+STOP_SEQUENCE =     0x11
+START_COUNTER =     0x13
+STOP_COUNTER =      0x15
+GET_COUNT =         0x17
+RESET_COUNT =       0x19
+WAIT_MOTION =       0x1B
+SET_BRIGHTNESS_PACKED = 0x1D
+SET_LEVEL_PACKED =  0x1F
 
 class Grove_pcounter(object):
     """This class controls the Grove LED BAR. 
@@ -67,9 +91,12 @@ class Grove_pcounter(object):
     ----------
     microblaze : Arduino
         Microblaze processor instance used by this module.
+    packed : bool
+        Whether brightness and level commands use the packed wire format.
         
     """
-    def __init__(self, mb_info, led_pin = ARDUINO_GROVE_G4, pir_pin = ARDUINO_GROVE_G3):
+    def __init__(self, mb_info, led_pin = ARDUINO_GROVE_G4, pir_pin = ARDUINO_GROVE_G3,
+                 packed=False):
         """Return a new instance of an Grove LEDbar object. 
         
         Parameters
@@ -79,6 +106,11 @@ class Grove_pcounter(object):
             IP name and the reset name.
         gr_pin: list
             A group of pins on arduino-grove shield.
+        packed : bool
+            Send brightness and levels packed, in 4 and 1 mailbox words
+            instead of 11 and 3. This needs a program built with the
+            `SET_BRIGHTNESS_PACKED` and `SET_LEVEL_PACKED` commands; a
+            RuntimeError is raised if the running program predates them.
 
         """
         if led_pin not in [ARDUINO_GROVE_G1,
@@ -103,9 +135,11 @@ class Grove_pcounter(object):
         pin.append(led_pin[0])
         pin.append(pir_pin[0])
 
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_PCOUNTER_PROGRAM)
-        self.microblaze.write_mailbox(0, pin)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.packed = packed
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_PCOUNTER_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH, pin)
+        if packed:
+            require_firmware(self.microblaze, "Grove_pcounter(packed=True)")
 
     def reset(self):
         """Resets the LEDbar.
@@ -117,14 +151,14 @@ class Grove_pcounter(object):
         None
 
         """
-        self.microblaze.write_blocking_command(RESET)
+        write_ledbar(self.microblaze, RESET, leds=0)
 
     def write_binary(self, data_in):
         """Set individual LEDs in the LEDbar based on 10 bit binary input.
 
         Each bit in the 10-bit `data_in` points to a LED position on the
         LEDbar. Red LED corresponds to the LSB, while green LED corresponds
-        to the MSB.
+        to the MSB. Nothing is sent if the LEDbar already shows `data_in`.
 
         Parameters
         ----------
@@ -136,8 +170,7 @@ class Grove_pcounter(object):
         None
 
         """
-        self.microblaze.write_mailbox(0, data_in)
-        self.microblaze.write_blocking_command(WRITE_LEDS)
+        write_ledbar(self.microblaze, WRITE_LEDS, [data_in], data_in & 0x3ff)
 
     def write_brightness(self, data_in, brightness=[MED] * 10):
         """Set individual LEDs with 3 level brightness control.
@@ -152,6 +185,9 @@ class Grove_pcounter(object):
         0xAA : MED
         0x01 : LOW
 
+        With `packed` set, the levels are sent four per mailbox word.
+        Nothing is sent if the LEDbar already shows the same pattern.
+
         Parameters
         ----------
         data_in : int
@@ -164,10 +200,15 @@ class Grove_pcounter(object):
         None
 
         """
-        data = [data_in]
-        data += brightness
-        self.microblaze.write_mailbox(0, data)
-        self.microblaze.write_blocking_command(SET_BRIGHTNESS)
+        if self.packed:
+            write_ledbar(self.microblaze, SET_BRIGHTNESS_PACKED,
+                         encode_brightness(data_in, brightness),
+                         data_in & 0x3ff)
+        else:
+            data = [data_in]
+            data += brightness
+            write_ledbar(self.microblaze, SET_BRIGHTNESS, data,
+                         data_in & 0x3ff)
 
     def write_level(self, level, bright_level, green_to_red):
         """Set the level to which the leds are to be lit in levels 1 - 10.
@@ -184,6 +225,8 @@ class Grove_pcounter(object):
         `green_to_red` indicates the direction, either from red to green when
         it is 0, or green to red when it is 1.
 
+        Nothing is sent if the same level is already set.
+
         Parameters
         ----------
         level : int
@@ -198,28 +241,84 @@ class Grove_pcounter(object):
         None
 
         """
-        self.microblaze.write_mailbox(0, [level, bright_level, green_to_red])
-        self.microblaze.write_blocking_command(SET_LEVEL)
-
-    def read(self):
+        if self.packed:
+            write_ledbar(self.microblaze, SET_LEVEL_PACKED,
+                         [encode_level(level, bright_level, green_to_red)])
+        else:
+            write_ledbar(self.microblaze, SET_LEVEL,
+                         [level, bright_level, green_to_red])
+
+    def read(self, force=False):
         """Reads the current status of LEDbar.
 
-        Reads the current status of LED bar and returns 10-bit binary string.
-        Each bit position corresponds to a LED position in the LEDbar,
-        and bit value corresponds to the LED state.
+        Reads the current status of LED bar and returns it as a 10-bit
+        integer. Each bit position corresponds to a LED position in the
+        LEDbar, and bit value corresponds to the LED state; use
+        `bin(value)[2:].zfill(10)` for a binary string.
 
         Red LED corresponds to the LSB, while green LED corresponds
         to the MSB.
 
+        The status written last is returned without a mailbox exchange,
+        unless `force` is set or it is not known (e.g. after `write_level`).
+
+        Parameters
+        ----------
+        force : bool
+            Read the status back from the Microblaze.
+
+        Returns
+        -------
+        int
+            The 10 LED states as bits.
+
+        """
+        return read_ledbar(self.microblaze, READ_LEDS, force)
+
+    def play_sequence(self, patterns, durations, repeat=1):
+        """Play an animation on the LEDbar from the Microblaze.
+
+        All the frames are uploaded in one mailbox write and played by the
+        Microblaze, so the host is free to issue other commands meanwhile.
+        Playing another sequence replaces this one; writing the LEDbar
+        cancels it.
+
+        Parameters
+        ----------
+        patterns : list
+            The 10-bit LED pattern of each frame.
+        durations : float or list
+            The duration of each frame in seconds, or one for all frames.
+        repeat : int
+            The number of times the sequence is played, 0 to loop forever.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates LED bar sequences.
+
+        """
+        play_ledbar(self.microblaze, PLAY_SEQUENCE, patterns, durations,
+                    repeat)
+
+    def stop_sequence(self):
+        """Stop the animation, leaving its current frame lit.
+
         Returns
         -------
-        str
-            String of 10 binary bits.
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates LED bar sequences.
 
         """
-        self.microblaze.write_blocking_command(READ_LEDS)
-        value = self.microblaze.read_mailbox(0)
-        return bin(value)[2:].zfill(10)
+        stop_ledbar(self.microblaze, STOP_SEQUENCE)
 
     def read_pir(self):
         """Reads the current status of Mini PIR.
@@ -234,4 +333,178 @@ class Grove_pcounter(object):
         state = self.microblaze.read_mailbox(0)
         return state
 
+    def start_counting(self, debounce=0.05, display=True):
+        """Start counting pedestrians on the Microblaze.
+
+        The Microblaze samples the Mini PIR in its main loop and counts
+        each rising edge, so no pulse is missed between two host reads and
+        the host does not have to poll. A rising edge is only counted once
+        the PIR output has stayed high for `debounce` seconds.
+
+        With `display` set, the Microblaze also lights the LEDbar from the
+        count: 1 to 10 LEDs for counts 1 to 10, then again from 1 LED.
+
+        Parameters
+        ----------
+        debounce : float
+            The time in seconds the PIR output must stay high.
+        display : bool
+            Whether the LEDbar shows the count.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the counter.
+
+        """
+        require_firmware(self.microblaze, "Grove_pcounter.start_counting")
+        if debounce < 0:
+            raise ValueError("Debounce time cannot be negative.")
+        self.microblaze.write_mailbox(0, [int(debounce * 1e6), int(display)])
+        self.microblaze.write_blocking_command(START_COUNTER)
+        if display:
+            release_ledbar(self.microblaze, until_write=False)
+
+    def stop_counting(self):
+        """Stop counting, keeping the count.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the counter.
+
+        """
+        require_firmware(self.microblaze, "Grove_pcounter.stop_counting")
+        self.microblaze.write_blocking_command(STOP_COUNTER)
+        reclaim_ledbar(self.microblaze)
+
+    def get_count(self):
+        """Reads the number of pedestrians counted by the Microblaze.
+
+        Returns
+        -------
+        int
+            The number of rising edges of the Mini PIR since the count
+            was last reset.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the counter.
+
+        """
+        require_firmware(self.microblaze, "Grove_pcounter.get_count")
+        self.microblaze.write_blocking_command(GET_COUNT)
+        return self.microblaze.read_mailbox(0)
+
+    async def get_count_async(self):
+        """Reads the number of pedestrians counted asynchronously.
+
+        Returns
+        -------
+        int
+            The number of rising edges of the Mini PIR since the count
+            was last reset.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the counter.
+
+        """
+        async with mailbox_lock(self.microblaze):
+            require_firmware(self.microblaze,
+                             "Grove_pcounter.get_count_async")
+            await write_async_command(self.microblaze, GET_COUNT)
+            count = self.microblaze.read_mailbox(0)
+        return count
+
+    def reset_count(self):
+        """Resets the count to 0, clearing the LEDbar if it shows it.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the counter.
+
+        """
+        require_firmware(self.microblaze, "Grove_pcounter.reset_count")
+        self.microblaze.write_blocking_command(RESET_COUNT)
+        invalidate_ledbar(self.microblaze)
+
+    async def read_pir_async(self):
+        """Reads the current status of Mini PIR asynchronously.
+
+        Returns
+        -------
+        int
+            1 means barrier exists, 0 means no barrier
+
+        """
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, READ_PIR)
+            state = self.microblaze.read_mailbox(0)
+        return state
+
+    def wait_for_motion(self, timeout=None):
+        """Wait until the Mini PIR detects motion.
+
+        This sleeps until the Microblaze raises its interrupt on a rising
+        edge of the Mini PIR, so no CPU is used while nothing moves. When
+        called with an event loop running, as in Jupyter, the PIR is
+        polled every 10 ms instead; see `wait_for_event`.
+
+        Parameters
+        ----------
+        timeout : float
+            Time in seconds to wait at most; None to wait forever.
+
+        Returns
+        -------
+        bool
+            True if motion was detected, False on timeout.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `WAIT_MOTION`.
+
+        """
+        require_firmware(self.microblaze, "Grove_pcounter.wait_for_motion")
+        return wait_for_event(self.microblaze, WAIT_MOTION, timeout)
+
+    async def wait_for_motion_async(self):
+        """Wait until the Mini PIR detects motion, without blocking.
+
+        The Microblaze is armed to raise its interrupt on the next rising
+        edge of the Mini PIR; it returns at once if the PIR is already
+        high. Use `asyncio.wait_for` to add a timeout.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `WAIT_MOTION`.
+
+        """
+        async with mailbox_lock(self.microblaze):
+            require_firmware(self.microblaze,
+                             "Grove_pcounter.wait_for_motion_async")
+        await wait_for_event_async(self.microblaze, WAIT_MOTION)
+
         
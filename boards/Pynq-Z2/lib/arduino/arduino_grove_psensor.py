@@ -28,7 +28,13 @@
 #   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
-from . import Arduino
+from .arduino_backend import configure_switch
+from .arduino_backend import open_microblaze
+from .arduino_backend import require_firmware
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
+from .arduino_backend import wait_for_event
+from .arduino_backend import wait_for_event_async
 from . import ARDUINO_GROVE_G1
 from . import ARDUINO_GROVE_G2
 from . import ARDUINO_GROVE_G3
@@ -48,6 +54,10 @@ ARDUINO_GROVE_PSENSOR_PROGRAM = "arduino_grove_psensor.bin"
 CONFIG_IOP_SWITCH = 0x1
 READ_PIR  =         0x3
 WRITE_RELAY =       0x5
+WAIT_MOTION =       0x7
+START_RULE =        0x9
+STOP_RULE =         0xB
+GET_RULE_STATUS =   0xD
 
 class Grove_psensor(object):
     """This class controls the Grove mini PIR and relay. 
@@ -94,9 +104,8 @@ class Grove_psensor(object):
         pin.append(pir_pin[0])
         pin.append(relay_pin[0])
 
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_PSENSOR_PROGRAM)
-        self.microblaze.write_mailbox(0, pin)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_PSENSOR_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH, pin)
 
     def read_pir(self):
         """Reads the current status of Mini PIR.
@@ -111,10 +120,157 @@ class Grove_psensor(object):
         state = self.microblaze.read_mailbox(0)
         return state
 
+    async def read_pir_async(self):
+        """Reads the current status of Mini PIR asynchronously.
+
+        Returns
+        -------
+        int
+            1 means barrier exists, 0 means no barrier
+
+        """
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, READ_PIR)
+            state = self.microblaze.read_mailbox(0)
+        return state
+
+    def wait_for_motion(self, timeout=None):
+        """Wait until the Mini PIR detects motion.
+
+        This sleeps until the Microblaze raises its interrupt on a rising
+        edge of the Mini PIR, so no CPU is used while nothing moves. When
+        called with an event loop running, as in Jupyter, the PIR is
+        polled every 10 ms instead; see `wait_for_event`.
+
+        Parameters
+        ----------
+        timeout : float
+            Time in seconds to wait at most; None to wait forever.
+
+        Returns
+        -------
+        bool
+            True if motion was detected, False on timeout.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `WAIT_MOTION`.
+
+        """
+        require_firmware(self.microblaze, "Grove_psensor.wait_for_motion")
+        return wait_for_event(self.microblaze, WAIT_MOTION, timeout)
+
+    async def wait_for_motion_async(self):
+        """Wait until the Mini PIR detects motion, without blocking.
+
+        The Microblaze is armed to raise its interrupt on the next rising
+        edge of the Mini PIR; it returns at once if the PIR is already
+        high. Use `asyncio.wait_for` to add a timeout.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `WAIT_MOTION`.
+
+        """
+        async with mailbox_lock(self.microblaze):
+            require_firmware(self.microblaze,
+                             "Grove_psensor.wait_for_motion_async")
+        await wait_for_event_async(self.microblaze, WAIT_MOTION)
+
     def write_relay(self, status):
         """control the current status of relay.
         """
         self.microblaze.write_mailbox(0, status)
         self.microblaze.write_blocking_command(WRITE_RELAY)
 
+    def start_rule(self, hold=4.0, off_delay=0.0, retrigger=True):
+        """Let the Microblaze drive the relay from the Mini PIR.
+
+        A rising edge of the PIR turns the relay on. The relay is turned
+        off once `hold` seconds have passed since it was turned on, and
+        the PIR has been low for `off_delay` seconds. With `retrigger`
+        set, every rising edge while the relay is on restarts the hold
+        time.
+
+        The rule runs in the main loop of the Microblaze, so the relay
+        reacts within a loop iteration, and the host only reads the status
+        when it needs to. Do not call `write_relay` while the rule runs.
+
+        Parameters
+        ----------
+        hold : float
+            The minimum time in seconds the relay stays on.
+        off_delay : float
+            The time in seconds the PIR must stay low before the relay is
+            turned off.
+        retrigger : bool
+            Whether rising edges restart the hold time.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the rule.
+
+        """
+        require_firmware(self.microblaze, "Grove_psensor.start_rule")
+        if hold < 0 or off_delay < 0:
+            raise ValueError("Hold time and off-delay cannot be negative.")
+        self.microblaze.write_mailbox(0, [int(hold * 1000),
+                                          int(off_delay * 1000),
+                                          int(retrigger)])
+        self.microblaze.write_blocking_command(START_RULE)
+
+    def stop_rule(self):
+        """Stop driving the relay from the Mini PIR, leaving it as it is.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the rule.
+
+        """
+        require_firmware(self.microblaze, "Grove_psensor.stop_rule")
+        self.microblaze.write_blocking_command(STOP_RULE)
+
+    def get_rule_status(self):
+        """Reads the state of the rule and its event counters.
+
+        The counters are cleared by `start_rule`.
+
+        Returns
+        -------
+        dict
+            `running`, whether the rule runs; `relay` and `pir`, the
+            current states; `triggers`, the number of rising edges of the
+            PIR; `activations`, the number of times the relay was turned on.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the rule.
+
+        """
+        require_firmware(self.microblaze, "Grove_psensor.get_rule_status")
+        self.microblaze.write_blocking_command(GET_RULE_STATUS)
+        flags, triggers, activations = self.microblaze.read_mailbox(0, 3)
+        return {'running': bool(flags & 0x4),
+                'relay': flags & 0x1,
+                'pir': (flags >> 1) & 0x1,
+                'triggers': triggers,
+                'activations': activations}
+
         
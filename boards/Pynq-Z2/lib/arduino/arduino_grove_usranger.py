@@ -27,8 +27,13 @@
 #   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF 
 #   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-from pynq import Clocks
-from . import Arduino
+import numpy as np
+from .arduino_backend import fclk0_mhz
+from .arduino_backend import configure_switch
+from .arduino_backend import open_microblaze
+from .arduino_backend import require_firmware
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
 from . import ARDUINO_GROVE_G1
 from . import ARDUINO_GROVE_G2
 from . import ARDUINO_GROVE_G3
@@ -36,6 +41,7 @@ from . import ARDUINO_GROVE_G4
 from . import ARDUINO_GROVE_G5
 from . import ARDUINO_GROVE_G6
 from . import ARDUINO_GROVE_G7
+from . import MAILBOX_PY2IOP_DATA_OFFSET
 
 __author__ = "zou cong"
 __copyright__ = "Copyright 2019, Xilinx"
@@ -45,6 +51,18 @@ ARDUINO_GROVE_USRANGER_PROGRAM = "arduino_grove_usranger.bin"
 
 CONFIG_IOP_SWITCH = 0x1
 GET_DISTANCE =      0x3
+GET_DISTANCE_BURST = 0x5
+
+# Reductions applied by the Microblaze to a burst of echoes
+BURST_METHODS = {None: 0, 'median': 1, 'trimmed_mean': 2}
+
+# A ping waits up to 30 ms for its echo. Bursts are capped so that the
+# blocking command lasts at most BURST_MAX_TIME seconds, well below what
+# the mailbox could hold.
+PING_TIMEOUT = 0.03
+BURST_MAX_TIME = 3.0
+BURST_MAX_PINGS = min(MAILBOX_PY2IOP_DATA_OFFSET // 4,
+                      int(round(BURST_MAX_TIME / PING_TIMEOUT)))
 
 class Grove_usranger(object):
     """This class controls the grove_usranger. 
@@ -78,9 +96,9 @@ class Grove_usranger(object):
                           ARDUINO_GROVE_G7]:
             raise ValueError("Group number can only be G1 - G7.")
         
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_USRANGER_PROGRAM)
-        self.microblaze.write_mailbox(0, gr_pin)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_USRANGER_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH, gr_pin)
+        self._clk_period_ns = int(1000 / fclk0_mhz(self.microblaze))
 
     def get_distance(self):
         '''
@@ -96,9 +114,78 @@ class Grove_usranger(object):
         '''
         self.microblaze.write_blocking_command(GET_DISTANCE)
         raw_value = self.microblaze.read_mailbox(0)
-        clk_period_ns = int(1000 / Clocks.fclk0_mhz)
-        num_microseconds = raw_value * clk_period_ns * 0.001
+        return self._distance(raw_value)
+
+    async def get_distance_async(self):
+        '''
+        get the distance from usranger asynchronously
+
+        Returns
+        -------
+        float : distance in cm, same as `get_distance`
+        '''
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_DISTANCE)
+            raw_value = self.microblaze.read_mailbox(0)
+        return self._distance(raw_value)
+
+    def get_distance_burst(self, n, method=None, trim=0.2):
+        '''
+        get the distances of a burst of pings from usranger
+
+        The Microblaze fires `n` pings back to back and returns all the
+        echoes in one mailbox read, or reduces them to one value itself.
+        Each ping takes up to `PING_TIMEOUT` (30 ms) when nothing echoes,
+        so the call blocks for up to n * 30 ms, 3 s for the largest burst.
+
+        Parameters
+        ----------
+        n : int
+            number of pings, 1 - BURST_MAX_PINGS (100)
+        method : str
+            None to return every distance, 'median' or 'trimmed_mean'
+            to have the Microblaze return a single filtered distance
+        trim : float
+            fraction of the echoes dropped at each end by 'trimmed_mean'
+
+        Returns
+        -------
+        numpy.ndarray : the n distances in cm, if `method` is None
+        float : the filtered distance in cm, otherwise
+
+        Raises
+        ------
+        RuntimeError
+            if the program on the IOP predates `GET_DISTANCE_BURST`
+        '''
+        require_firmware(self.microblaze, "Grove_usranger.get_distance_burst")
+        if not 0 < n <= BURST_MAX_PINGS:
+            raise ValueError("Number of pings can only be 1 - {}.".format(
+                BURST_MAX_PINGS))
+        if method not in BURST_METHODS:
+            raise ValueError("Method can only be None, 'median' or "
+                             "'trimmed_mean'.")
+        num_trimmed = int(n * trim) if method == 'trimmed_mean' else 0
+        if not 0 <= 2 * num_trimmed < n:
+            raise ValueError("Trim must leave at least one echo.")
+
+        self.microblaze.write_mailbox(0, [n, BURST_METHODS[method],
+                                          num_trimmed])
+        self.microblaze.write_blocking_command(GET_DISTANCE_BURST)
+        if method is not None:
+            return self._distance(self.microblaze.read_mailbox(0))
+        raw_values = self.microblaze.read_mailbox(0, n)
+        return self._distances([raw_values] if n == 1 else raw_values)
+
+    def _distance(self, raw_value):
+        num_microseconds = raw_value * self._clk_period_ns * 0.001
         if num_microseconds * 0.001 > 30:
             return 500
         else:
             return num_microseconds/58
+
+    def _distances(self, raw_values):
+        num_microseconds = np.asarray(raw_values, dtype=np.float64) * \
+            self._clk_period_ns * 0.001
+        return np.where(num_microseconds * 0.001 > 30, 500,
+                        num_microseconds / 58)
@@ -0,0 +1,1028 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import asyncio
+import bisect
+import collections
+import functools
+import os
+import struct
+import time
+from . import BATCH_COMMANDS
+from . import BIN_LOCATION
+from . import FIRMWARE_VERSION
+from . import GET_FIRMWARE_VERSION
+from . import IOP_MMIO_REGSIZE
+from . import MAILBOX_OFFSET
+from . import MAILBOX_PY2IOP_CMD_OFFSET
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+SIM_FCLK0_MHZ = 100.0
+INTERRUPT_POLL_INTERVAL = 0.001
+
+# Default sensor models, in the units the firmware reports them
+DEFAULT_SENSORS = {
+    # Raw MPU9250 counts (accel, gyro, compass), then BMP180 temp and pressure
+    'imu': (0.0, 0.0, 16384.0,
+            0.0, 0.0, 0.0,
+            100.0, 0.0, -200.0,
+            25.0, 101325.0),
+    # DHT11 temperature (Celsius) and humidity (percent)
+    'dht': (25.0, 50.0),
+    # Light sensor output voltage
+    'light': 1.0,
+    # Ultrasonic ranger distance in cm
+    'distance': 100.0,
+    # Mini PIR state
+    'pir': 0,
+    # Gesture code
+    'gesture': 0,
+}
+
+_FIRMWARE = {}
+
+
+def _float2reg(value):
+    """Converts a float to the 32-bit register value the firmware writes.
+
+    Parameters
+    ----------
+    value: float
+        The value to encode as IEEE-754 single precision.
+
+    Returns
+    -------
+    int
+        The 32-bit register value.
+
+    """
+    return struct.unpack('<I', struct.pack('<f', value))[0]
+
+
+def _program(name):
+    """Register a firmware model for the Microblaze program `name`."""
+    def register(cls):
+        _FIRMWARE[name] = cls
+        return cls
+    return register
+
+
+class Arduino_Sim(object):
+    """This class emulates an Arduino IOP in software.
+
+    The simulator keeps the IOP memory in Python and implements the mailbox
+    protocol used by the Grove drivers: data is exchanged through
+    `write_mailbox` / `read_mailbox`, and a command written to
+    `MAILBOX_PY2IOP_CMD_OFFSET` is dispatched to a firmware model of the
+    loaded program, which clears the command word when it is done.
+
+    Sensor readings come from scripted models. A model can be a constant,
+    an iterator (advanced on every read, the last value is repeated once it
+    is exhausted) or a callable taking the elapsed time in seconds. Values
+    written to actuators are recorded in `outputs`.
+
+    It can be used in place of `Arduino` by any Grove driver through the
+    `backend` entry of `mb_info`, see `sim_info`.
+
+    Attributes
+    ----------
+    mb_info : dict
+        A dictionary storing Microblaze information.
+    mb_program : str
+        The absolute path of the emulated Microblaze program.
+    sensors : dict
+        The sensor models, keyed by sensor name.
+    outputs : dict
+        The last value written to each actuator.
+    latency : float or dict
+        Time in seconds taken by each command, or a dictionary mapping
+        command codes to their latency.
+    fclk0_mhz : float
+        The frequency of the emulated IOP timer clock.
+    firmware_version : int
+        The version reported to `GET_FIRMWARE_VERSION`; with 0 the program
+        behaves like a stock one and ignores the shared commands.
+    state : str
+        The state of the emulated IOP.
+    interrupt : object
+        The emulated interrupt line, if `mb_info` has one.
+
+    """
+    def __init__(self, mb_info, mb_program, sensors=None, latency=0.0,
+                 program_latency=0.0, fclk0_mhz=SIM_FCLK0_MHZ,
+                 firmware_version=FIRMWARE_VERSION):
+        """Create a new simulated IOP and load `mb_program` on it.
+
+        Parameters
+        ----------
+        mb_info : dict
+            A dictionary storing Microblaze information, such as the
+            IP name and the reset name.
+        mb_program : str
+            The Microblaze program to emulate.
+        sensors : dict
+            Sensor models overriding `DEFAULT_SENSORS`.
+        latency : float or dict
+            Time in seconds taken by each command, or a dictionary mapping
+            command codes to their latency.
+        program_latency : float
+            Time in seconds taken to load the program.
+        fclk0_mhz : float
+            The frequency of the emulated IOP timer clock.
+        firmware_version : int
+            The version of the extended command set to emulate; 0 for a
+            stock program.
+
+        """
+        if not os.path.isabs(mb_program):
+            mb_program = os.path.join(BIN_LOCATION, mb_program)
+        name = os.path.basename(mb_program)
+        if name not in _FIRMWARE:
+            raise ValueError("No firmware model for program {}.".format(name))
+
+        self.mb_info = mb_info
+        self.mb_program = mb_program
+        self.sensors = dict(DEFAULT_SENSORS)
+        self.sensors.update(sensors or {})
+        self.outputs = dict()
+        self.latency = latency
+        self.program_latency = program_latency
+        self.fclk0_mhz = fclk0_mhz
+        self.firmware_version = firmware_version
+        self.state = 'IDLE'
+        self._firmware_cls = _FIRMWARE[name]
+        self._last = dict()
+        self._t0 = time.monotonic()
+        self.interrupt = None
+        if mb_info.get('intr_pin_name'):
+            self.interrupt = _SimInterrupt(self)
+        self.program()
+
+    def reset(self):
+        """Reset the emulated IOP and clear its memory."""
+        self._mem = [0] * (IOP_MMIO_REGSIZE // 4)
+        self._pending = None
+        self.state = 'STOPPED'
+
+    def program(self):
+        """Reset the emulated IOP and load the program on it."""
+        self.reset()
+        if self.program_latency:
+            time.sleep(self.program_latency)
+        self.firmware = self._firmware_cls(self)
+        self.state = 'RUNNING'
+
+    def raise_interrupt(self):
+        """Raise the emulated interrupt line, if there is one."""
+        if self.interrupt is not None:
+            self.interrupt.raised = True
+
+    def elapsed(self):
+        """Return the time in seconds since the simulator was created."""
+        return time.monotonic() - self._t0
+
+    def sample(self, name, t=None):
+        """Return the reading of the sensor model `name`.
+
+        Parameters
+        ----------
+        name : str
+            The name of the sensor model.
+        t : float
+            The elapsed time at which callable models are evaluated;
+            defaults to now.
+
+        """
+        model = self.sensors[name]
+        if callable(model):
+            return model(self.elapsed() if t is None else t)
+        if hasattr(model, '__next__'):
+            try:
+                self._last[name] = next(model)
+            except StopIteration:
+                if name not in self._last:
+                    raise RuntimeError(
+                        "Sensor model {} is exhausted.".format(name))
+            return self._last[name]
+        return model
+
+    def read(self, offset, length=1):
+        """Read `length` words from the emulated IOP memory.
+
+        Parameters
+        ----------
+        offset : int
+            The byte offset in the IOP memory; must be a multiple of 4.
+        length : int
+            The number of words to read.
+
+        Returns
+        -------
+        int or list
+            A single word if `length` is 1, a list of words otherwise.
+
+        """
+        if offset % 4:
+            raise MemoryError('Unaligned read: offset must be multiple of 4.')
+        self._complete()
+        index = offset // 4
+        if length == 1:
+            return self._mem[index]
+        return self._mem[index:index + length]
+
+    def write(self, offset, data):
+        """Write words to the emulated IOP memory.
+
+        Writing a non-zero value to the command word issues that command.
+
+        Parameters
+        ----------
+        offset : int
+            The byte offset in the IOP memory; must be a multiple of 4.
+        data : int or list
+            A single word or a list of words.
+
+        Returns
+        -------
+        None
+
+        """
+        if offset % 4:
+            raise MemoryError('Unaligned write: offset must be multiple of 4.')
+        if isinstance(data, int):
+            data = [data]
+        index = offset // 4
+        for i, word in enumerate(data):
+            self._mem[index + i] = word & 0xffffffff
+
+        cmd_index = (MAILBOX_OFFSET + MAILBOX_PY2IOP_CMD_OFFSET) // 4
+        if index <= cmd_index < index + len(data) and self._mem[cmd_index]:
+            command = self._mem[cmd_index]
+            self._pending = (command, time.monotonic() + self._latency(command))
+
+    def write_mailbox(self, data_offset, data):
+        """Write data into the mailbox.
+
+        Parameters
+        ----------
+        data_offset : int
+            The byte offset in the mailbox.
+        data : int or list
+            A single word or a list of words.
+
+        Returns
+        -------
+        None
+
+        """
+        self.write(MAILBOX_OFFSET + data_offset, data)
+
+    def read_mailbox(self, data_offset, num_words=1):
+        """Read data from the mailbox.
+
+        Parameters
+        ----------
+        data_offset : int
+            The byte offset in the mailbox.
+        num_words : int
+            The number of words to read.
+
+        Returns
+        -------
+        int or list
+            A single word if `num_words` is 1, a list of words otherwise.
+
+        """
+        return self.read(MAILBOX_OFFSET + data_offset, num_words)
+
+    def write_non_blocking_command(self, command):
+        """Issue a command and return immediately.
+
+        Parameters
+        ----------
+        command : int
+            The command to write to the mailbox.
+
+        Returns
+        -------
+        None
+
+        """
+        self.write(MAILBOX_OFFSET + MAILBOX_PY2IOP_CMD_OFFSET, command)
+
+    def write_blocking_command(self, command):
+        """Issue a command and wait until the IOP has executed it.
+
+        Parameters
+        ----------
+        command : int
+            The command to write to the mailbox.
+
+        Returns
+        -------
+        None
+
+        """
+        self.write_non_blocking_command(command)
+        if self._pending is None:
+            return
+        _, deadline = self._pending
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        self._complete()
+
+    def _latency(self, command):
+        if isinstance(self.latency, dict):
+            return self.latency.get(command, 0.0)
+        return self.latency
+
+    def _complete(self):
+        self.firmware.background()
+        if self._pending is None or time.monotonic() < self._pending[1]:
+            return
+        command = self._pending[0]
+        self._pending = None
+        self.firmware.dispatch(command)
+        self._mem[(MAILBOX_OFFSET + MAILBOX_PY2IOP_CMD_OFFSET) // 4] = 0
+
+
+class _SimInterrupt(object):
+    """Emulated Microblaze interrupt line.
+
+    It has the `wait` coroutine and `clear` method of the interrupt of a
+    real Microblaze. While waiting, the firmware model runs its background
+    work, which is where it raises the interrupt.
+
+    """
+    def __init__(self, sim):
+        self.sim = sim
+        self.raised = False
+
+    async def wait(self):
+        while True:
+            self.sim.firmware.background()
+            if self.raised:
+                return
+            await asyncio.sleep(INTERRUPT_POLL_INTERVAL)
+
+    def clear(self):
+        self.raised = False
+
+
+def sim_info(mb_info, **kwargs):
+    """Return a copy of `mb_info` that makes drivers use `Arduino_Sim`.
+
+    Parameters
+    ----------
+    mb_info : dict
+        A dictionary storing Microblaze information, such as `ARDUINO`.
+    kwargs : dict
+        Keyword arguments passed to `Arduino_Sim`, such as `sensors` and
+        `latency`.
+
+    Returns
+    -------
+    dict
+        The Microblaze information with a simulator `backend` entry.
+
+    """
+    info = dict(mb_info)
+    info['backend'] = functools.partial(Arduino_Sim, **kwargs)
+    return info
+
+
+class _Firmware(object):
+    """Base class of the firmware models run by `Arduino_Sim`.
+
+    `commands` maps each command code to the name of the method handling it,
+    and `results` maps the commands that can be batched to the number of
+    words they return.
+
+    """
+    commands = {0x1: 'config_iop_switch'}
+    results = {}
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.configured = False
+
+    def background(self):
+        """Run the work the firmware does between commands."""
+        pass
+
+    def dispatch(self, command):
+        if command in (BATCH_COMMANDS, GET_FIRMWARE_VERSION):
+            # Stock programs ignore the commands they do not know
+            if not self.sim.firmware_version:
+                return
+            if command == GET_FIRMWARE_VERSION:
+                self.sim.write_mailbox(0, self.sim.firmware_version)
+            else:
+                self.batch()
+            return
+        if command not in self.commands:
+            raise RuntimeError("Command 0x{:x} not supported by {}.".format(
+                command, os.path.basename(self.sim.mb_program)))
+        getattr(self, self.commands[command])()
+
+    def read_words(self, num_words, data_offset=0):
+        data = self.sim.read_mailbox(data_offset, num_words)
+        return [data] if num_words == 1 else data
+
+    def write_floats(self, values):
+        self.sim.write_mailbox(0, [_float2reg(v) for v in values])
+
+    def config_iop_switch(self):
+        self.configured = True
+
+    def batch(self):
+        num_commands = self.read_words(1)[0]
+        commands = self.read_words(num_commands, 4)
+        data = []
+        for command in commands:
+            if command not in self.results:
+                raise RuntimeError(
+                    "Command 0x{:x} cannot be batched.".format(command))
+            self.dispatch(command)
+            data += self.read_words(self.results[command])
+        self.sim.write_mailbox(0, data)
+
+
+class _LEDbarFirmware(_Firmware):
+    """Firmware model of the MY9221 LED bar commands."""
+    HIGH = 0xFF
+    MED = 0xAA
+    LOW = 0x01
+    OFF = 0x00
+
+    sequence = None
+
+    def reset_leds(self):
+        self.sequence = None
+        self.sim.outputs['ledbar'] = 0
+
+    def write_leds(self):
+        self.sequence = None
+        self.sim.outputs['ledbar'] = self.read_words(1)[0] & 0x3ff
+
+    def set_brightness(self):
+        self.sequence = None
+        data = self.read_words(11)
+        self.sim.outputs['ledbar'] = data[0] & 0x3ff
+        self.sim.outputs['brightness'] = data[1:]
+
+    def set_brightness_packed(self):
+        self.sequence = None
+        data = self.read_words(4)
+        self.sim.outputs['ledbar'] = data[0] & 0x3ff
+        self.sim.outputs['brightness'] = [
+            (data[1 + i // 4] >> (8 * (i % 4))) & 0xff for i in range(10)]
+
+    def set_level(self):
+        self.show_level(*self.read_words(3))
+
+    def set_level_packed(self):
+        word = self.read_words(1)[0]
+        self.show_level(word & 0xff, (word >> 8) & 0xff, (word >> 16) & 0x1)
+
+    def show_level(self, level, bright_level, green_to_red):
+        self.sequence = None
+        level = max(0, min(level, 10))
+        bits = (1 << level) - 1
+        if green_to_red:
+            bits <<= 10 - level
+        if bright_level == 0:
+            bits = 0
+        bright = [self.OFF, self.LOW, self.MED, self.HIGH][bright_level & 3]
+        self.sim.outputs['ledbar'] = bits
+        self.sim.outputs['brightness'] = [bright] * 10
+
+    def read_leds(self):
+        self.sim.write_mailbox(0, self.sim.outputs.get('ledbar', 0))
+
+    def play_sequence(self):
+        num_frames, repeat = self.read_words(2)
+        frames = self.read_words(num_frames, 8)
+        self.sequence = ([f & 0x3ff for f in frames],
+                         [(f >> 10) * 1e-3 for f in frames],
+                         repeat, self.sim.elapsed())
+        self.background()
+
+    def stop_sequence(self):
+        self.background()
+        self.sequence = None
+
+    def background(self):
+        super().background()
+        if self.sequence is None:
+            return
+        patterns, durations, repeat, start = self.sequence
+        t = self.sim.elapsed() - start
+        total = sum(durations)
+        if repeat and t >= total * repeat:
+            self.sim.outputs['ledbar'] = patterns[-1]
+            self.sequence = None
+            return
+        t %= total
+        for pattern, duration in zip(patterns, durations):
+            if t < duration:
+                break
+            t -= duration
+        self.sim.outputs['ledbar'] = pattern
+
+
+class _RangerFirmware(_Firmware):
+    """Firmware model of the ultrasonic ranger echo timer."""
+    def get_distance(self):
+        distance = self.sim.sample('distance')
+        counts = int(distance * 58 * self.sim.fclk0_mhz)
+        self.sim.write_mailbox(0, counts)
+
+    def get_distance_burst(self):
+        num_pings, method, num_trimmed = self.read_words(3)
+        counts = [int(self.sim.sample('distance') * 58 * self.sim.fclk0_mhz)
+                  for _ in range(num_pings)]
+        if method == 0:
+            self.sim.write_mailbox(0, counts)
+            return
+        counts.sort()
+        if method == 1:
+            middle = (counts[(num_pings - 1) // 2] + counts[num_pings // 2])
+            self.sim.write_mailbox(0, (middle + 1) // 2)
+        else:
+            kept = counts[num_trimmed:num_pings - num_trimmed]
+            self.sim.write_mailbox(0, int(round(sum(kept) / len(kept))))
+
+
+class _MPU9250Firmware(_Firmware):
+    """Firmware model of the MPU9250 configuration.
+
+    The `imu` sensor model gives counts at the power-on full-scale ranges;
+    they are rescaled to the configured ranges and saturated to 16 bits.
+
+    """
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.accel_fs_sel = 0
+        self.gyro_fs_sel = 0
+        self.smplrt_div = 0
+        self.dlpf_cfg = 0
+
+    def configure_imu(self):
+        self.accel_fs_sel, self.gyro_fs_sel, self.smplrt_div, \
+            self.dlpf_cfg = self.read_words(4)
+        self.sim.outputs['imu_config'] = [self.accel_fs_sel,
+                                          self.gyro_fs_sel,
+                                          self.smplrt_div,
+                                          self.dlpf_cfg]
+
+    def sample_imu(self, t=None):
+        frame = list(self.sim.sample('imu', t))
+        for i in range(6):
+            fs_sel = self.accel_fs_sel if i < 3 else self.gyro_fs_sel
+            frame[i] = max(-32768.0, min(frame[i] / (1 << fs_sel), 32767.0))
+        return frame
+
+
+class _BMP180Firmware(_Firmware):
+    """Firmware model of the BMP180 pressure-only read."""
+    def get_pressure(self):
+        oversampling = self.read_words(1)[0]
+        if oversampling > 3:
+            raise RuntimeError("Invalid BMP180 oversampling setting.")
+        self.sim.outputs['bmp180_oversampling'] = oversampling
+        self.write_floats(self.sim.sample('imu')[9:11])
+
+
+@_program("grove_imu.bin")
+class _IMUFirmware(_MPU9250Firmware, _BMP180Firmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'get_data',
+                0x5: 'start_fifo',
+                0x7: 'stop_fifo',
+                0x9: 'read_fifo',
+                0xB: 'configure_imu',
+                0xD: 'get_pressure'}
+    results = {0x3: 11}
+    FIFO_DEPTH = 512
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.fifo = collections.deque()
+        self.fifo_period = None
+        self.fifo_next = 0.0
+        self.fifo_dropped = 0
+
+    def get_data(self):
+        self.write_floats(self.sample_imu())
+
+    def start_fifo(self):
+        self.fifo.clear()
+        self.fifo_dropped = 0
+        self.fifo_period = self.read_words(1)[0] * 1e-6
+        self.fifo_next = self.sim.elapsed()
+
+    def stop_fifo(self):
+        self.fifo.clear()
+        self.fifo_period = None
+
+    def read_fifo(self):
+        max_frames = self.read_words(1)[0]
+        self.fill_fifo()
+        frames = [self.fifo.popleft()
+                  for _ in range(min(max_frames, len(self.fifo)))]
+        data = [len(frames), self.fifo_dropped]
+        for frame in frames:
+            data += [_float2reg(v) for v in frame]
+        self.sim.write_mailbox(0, data)
+        self.fifo_dropped = 0
+
+    def fill_fifo(self):
+        if self.fifo_period is None:
+            return
+        now = self.sim.elapsed()
+        if now < self.fifo_next:
+            return
+        due = int((now - self.fifo_next) / self.fifo_period) + 1
+        taken = min(due, self.FIFO_DEPTH - len(self.fifo))
+        for i in range(taken):
+            self.fifo.append(self.sample_imu(
+                self.fifo_next + i * self.fifo_period))
+        self.fifo_dropped += due - taken
+        self.fifo_next += due * self.fifo_period
+
+
+@_program("arduino_grove_multisensor.bin")
+class _MultisensorFirmware(_MPU9250Firmware, _BMP180Firmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'get_imu_data',
+                0x5: 'get_dht_data',
+                0x7: 'get_al_data',
+                0x9: 'configure_imu',
+                0xB: 'get_pressure'}
+    results = {0x3: 11, 0x5: 2, 0x7: 1}
+
+    def get_imu_data(self):
+        self.write_floats(self.sample_imu())
+
+    def get_dht_data(self):
+        self.write_floats(self.sim.sample('dht'))
+
+    def get_al_data(self):
+        self.write_floats([self.sim.sample('light')])
+
+
+@_program("arduino_grove_usranger.bin")
+class _UsrangerFirmware(_RangerFirmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'get_distance',
+                0x5: 'get_distance_burst'}
+    results = {0x3: 1}
+
+
+@_program("arduino_grove_autoalarm.bin")
+class _AutoalarmFirmware(_RangerFirmware, _LEDbarFirmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'get_distance',
+                0x5: 'write_leds',
+                0x7: 'start_events',
+                0x9: 'stop_events',
+                0xB: 'read_events',
+                0xD: 'play_sequence',
+                0xF: 'stop_sequence'}
+    results = {0x3: 1}
+    EVENT_QUEUE_DEPTH = 64
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.events = collections.deque()
+        self.events_dropped = 0
+        self.event_period = None
+        self.event_start = 0.0
+        self.event_next = 0.0
+        self.band = None
+
+    def start_events(self):
+        period_us, self.hysteresis, num_thresholds = self.read_words(3)
+        words = self.read_words(2 * num_thresholds + 1, 12)
+        self.thresholds = words[:num_thresholds]
+        self.patterns = words[num_thresholds:]
+        self.events.clear()
+        self.events_dropped = 0
+        self.band = None
+        self.event_period = period_us * 1e-6
+        self.event_start = self.event_next = self.sim.elapsed()
+        self.sequence = None
+
+    def stop_events(self):
+        self.events.clear()
+        self.event_period = None
+
+    def read_events(self):
+        data = [len(self.events), self.events_dropped]
+        for event in self.events:
+            data += event
+        self.sim.write_mailbox(0, data)
+        self.events.clear()
+        self.events_dropped = 0
+
+    def background(self):
+        super().background()
+        if self.event_period is None:
+            return
+        now = self.sim.elapsed()
+        while self.event_next <= now:
+            t = self.event_next
+            self.event_next += self.event_period
+            counts = int(self.sim.sample('distance', t) *
+                         58 * self.sim.fclk0_mhz)
+            band = self.classify(counts)
+            if band == self.band:
+                continue
+            self.band = band
+            self.sequence = None
+            self.sim.outputs['ledbar'] = self.patterns[band] & 0x3ff
+            if len(self.events) < self.EVENT_QUEUE_DEPTH:
+                self.events.append(
+                    [int((t - self.event_start) * 1000), band, counts])
+            else:
+                self.events_dropped += 1
+            self.sim.raise_interrupt()
+
+    def classify(self, counts):
+        thresholds = self.thresholds
+        if self.band is None:
+            return bisect.bisect_right(thresholds, counts)
+        band = self.band
+        while band < len(thresholds) and \
+                counts > thresholds[band] + self.hysteresis:
+            band += 1
+        while band > 0 and counts < thresholds[band - 1] - self.hysteresis:
+            band -= 1
+        return band
+
+
+@_program("arduino_grove_gesgame.bin")
+class _GesgameFirmware(_LEDbarFirmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'get_gesture',
+                0x5: 'write_leds',
+                0x7: 'play_sequence',
+                0x9: 'stop_sequence'}
+    results = {0x3: 1}
+
+    def get_gesture(self):
+        self.sim.write_mailbox(0, self.sim.sample('gesture'))
+
+
+@_program("arduino_grove_gesture.bin")
+class _GestureFirmware(_Firmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'get_gesture',
+                0x5: 'set_speed',
+                0xF: 'reset'}
+    results = {0x3: 1}
+
+    def get_gesture(self):
+        self.sim.write_mailbox(0, self.sim.sample('gesture'))
+
+    def set_speed(self):
+        self.sim.outputs['gesture_speed'] = self.read_words(1)[0]
+
+    def reset(self):
+        self.sim.outputs['gesture_speed'] = 0
+
+
+class _MotionFirmware(_Firmware):
+    """Firmware model of the PIR motion interrupt.
+
+    Once armed, the main loop samples the PIR every millisecond and raises
+    the interrupt on its next rising edge.
+
+    """
+    MOTION_PERIOD = 0.001
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.motion = 0
+        self.motion_armed = False
+        self.motion_level = 0
+        self.motion_next = 0.0
+
+    def wait_motion(self):
+        if self.read_words(1)[0]:
+            self.motion = 0
+        self.motion_level = self.sim.sample('pir')
+        detected = int(bool(self.motion or self.motion_level))
+        self.sim.write_mailbox(0, detected)
+        self.motion_armed = not detected
+        self.motion_next = self.sim.elapsed()
+
+    def background(self):
+        super().background()
+        now = self.sim.elapsed()
+        while self.motion_armed and self.motion_next <= now:
+            t = self.motion_next
+            self.motion_next += self.MOTION_PERIOD
+            level = self.sim.sample('pir', t)
+            if level and not self.motion_level:
+                self.motion = 1
+                self.motion_armed = False
+                self.sim.raise_interrupt()
+            self.motion_level = level
+
+
+@_program("arduino_grove_pcounter.bin")
+class _PcounterFirmware(_LEDbarFirmware, _MotionFirmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'reset_leds',
+                0x5: 'write_leds',
+                0x7: 'set_brightness',
+                0x9: 'set_level',
+                0xB: 'read_leds',
+                0xD: 'read_pir',
+                0xF: 'play_sequence',
+                0x11: 'stop_sequence',
+                0x13: 'start_counter',
+                0x15: 'stop_counter',
+                0x17: 'get_count',
+                0x19: 'reset_count',
+                0x1B: 'wait_motion',
+                0x1D: 'set_brightness_packed',
+                0x1F: 'set_level_packed'}
+    results = {0xB: 1, 0xD: 1, 0x17: 1}
+
+    # The main loop samples the PIR once per millisecond
+    COUNTER_PERIOD = 0.001
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.count = 0
+        self.counting = False
+        self.display = False
+        self.debounce = 0.0
+        self.counter_next = 0.0
+        self.high_since = None
+        self.pir_level = 0
+
+    def read_pir(self):
+        self.sim.write_mailbox(0, self.sim.sample('pir'))
+
+    def start_counter(self):
+        debounce_us, self.display = self.read_words(2)
+        self.debounce = debounce_us * 1e-6
+        self.counting = True
+        self.counter_next = self.sim.elapsed()
+        self.high_since = None
+        self.pir_level = 0
+        if self.display:
+            self.sequence = None
+            self.show_count()
+
+    def stop_counter(self):
+        self.background()
+        self.counting = False
+
+    def get_count(self):
+        self.sim.write_mailbox(0, self.count)
+
+    def reset_count(self):
+        self.count = 0
+        if self.counting and self.display:
+            self.show_count()
+
+    def show_count(self):
+        level = (self.count - 1) % 10 + 1 if self.count else 0
+        self.sim.outputs['ledbar'] = (1 << level) - 1
+
+    def background(self):
+        super().background()
+        if not self.counting:
+            return
+        now = self.sim.elapsed()
+        while self.counter_next <= now:
+            t = self.counter_next
+            self.counter_next += self.COUNTER_PERIOD
+            if not self.sim.sample('pir', t):
+                self.high_since = None
+                self.pir_level = 0
+                continue
+            if self.pir_level:
+                continue
+            if self.high_since is None:
+                self.high_since = t
+            if t - self.high_since >= self.debounce:
+                self.pir_level = 1
+                self.count += 1
+                if self.display:
+                    self.sequence = None
+                    self.show_count()
+
+
+@_program("arduino_grove_psensor.bin")
+class _PsensorFirmware(_MotionFirmware):
+    commands = {0x1: 'config_iop_switch',
+                0x3: 'read_pir',
+                0x5: 'write_relay',
+                0x7: 'wait_motion',
+                0x9: 'start_rule',
+                0xB: 'stop_rule',
+                0xD: 'get_rule_status'}
+    results = {0x3: 1, 0xD: 3}
+
+    # The main loop samples the PIR once per millisecond
+    RULE_PERIOD = 0.001
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.rule = False
+        self.rule_next = 0.0
+        self.rule_pir = 0
+        self.hold = 0.0
+        self.off_delay = 0.0
+        self.retrigger = 1
+        self.hold_until = 0.0
+        self.low_since = 0.0
+        self.triggers = 0
+        self.activations = 0
+
+    def read_pir(self):
+        self.sim.write_mailbox(0, self.sim.sample('pir'))
+
+    def write_relay(self):
+        self.sim.outputs['relay'] = self.read_words(1)[0]
+
+    def start_rule(self):
+        hold_ms, off_delay_ms, self.retrigger = self.read_words(3)
+        self.hold = hold_ms * 1e-3
+        self.off_delay = off_delay_ms * 1e-3
+        self.triggers = 0
+        self.activations = 0
+        self.rule_pir = 0
+        self.rule = True
+        self.rule_next = self.sim.elapsed()
+
+    def stop_rule(self):
+        self.rule = False
+
+    def get_rule_status(self):
+        flags = (self.sim.outputs.get('relay', 0) & 0x1) | \
+            (self.rule_pir << 1) | (int(self.rule) << 2)
+        self.sim.write_mailbox(0, [flags, self.triggers, self.activations])
+
+    def background(self):
+        super().background()
+        now = self.sim.elapsed()
+        while self.rule and self.rule_next <= now:
+            t = self.rule_next
+            self.rule_next += self.RULE_PERIOD
+            level = self.sim.sample('pir', t)
+            relay = self.sim.outputs.get('relay', 0)
+            if level and not self.rule_pir:
+                self.triggers += 1
+                if not relay:
+                    relay = 1
+                    self.activations += 1
+                    self.hold_until = t + self.hold
+                elif self.retrigger:
+                    self.hold_until = t + self.hold
+            elif self.rule_pir and not level:
+                self.low_since = t
+            self.rule_pir = level
+            if relay and not level and t >= self.hold_until and \
+                    t - self.low_since >= self.off_delay:
+                relay = 0
+            self.sim.outputs['relay'] = relay
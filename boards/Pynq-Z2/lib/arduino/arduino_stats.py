@@ -0,0 +1,240 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import json
+import time
+from . import MAILBOX_OFFSET
+from . import MAILBOX_PY2IOP_CMD_OFFSET
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+class _Histogram(object):
+    """Latency histogram with power-of-two microsecond buckets."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = dict()
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        self.count += 1
+        self.total += us
+        self.min = us if self.min is None else min(self.min, us)
+        self.max = us if self.max is None else max(self.max, us)
+        bound = 1
+        while bound <= us:
+            bound <<= 1
+        self.buckets[bound] = self.buckets.get(bound, 0) + 1
+
+    def to_dict(self):
+        return {'count': self.count,
+                'mean_us': self.total / self.count if self.count else None,
+                'min_us': self.min,
+                'max_us': self.max,
+                'buckets_us': {str(k): self.buckets[k]
+                               for k in sorted(self.buckets)}}
+
+
+class _CommandStats(object):
+    """Traffic recorded for one command code."""
+    def __init__(self):
+        self.count = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.wait = _Histogram()
+        self.read = _Histogram()
+
+    def to_dict(self):
+        return {'count': self.count,
+                'bytes_written': self.bytes_written,
+                'bytes_read': self.bytes_read,
+                'wait': self.wait.to_dict(),
+                'read': self.read.to_dict()}
+
+
+class Arduino_Stats(object):
+    """This class records the mailbox traffic of a Microblaze.
+
+    It wraps an `Arduino` (or any backend with the same interface) and
+    forwards every call to it. For each command code it records how many
+    times the command was issued, the bytes written to the mailbox before
+    the command and read back after it, and latency histograms of the wait
+    for completion and of the mailbox reads.
+
+    Latencies are bucketed by powers of two microseconds; a bucket keyed
+    `n` counts the samples below `n` us and not below `n / 2` us.
+
+    Attributes
+    ----------
+    microblaze : Arduino
+        The wrapped Microblaze processor instance.
+    names : dict
+        Optional names for command codes, used in `stats`.
+
+    """
+    def __init__(self, microblaze, names=None):
+        """Return a new recorder wrapping `microblaze`.
+
+        Parameters
+        ----------
+        microblaze : Arduino
+            Microblaze processor instance to wrap.
+        names : dict
+            Optional mapping from command codes to names.
+
+        """
+        self.microblaze = microblaze
+        self.names = dict(names or {})
+        self.reset_stats()
+
+    def __getattr__(self, name):
+        return getattr(self.microblaze, name)
+
+    def reset_stats(self):
+        """Clear all recorded traffic."""
+        self._commands = dict()
+        self._command = None
+        self._issued = None
+        self._written = 0
+
+    def write_mailbox(self, data_offset, data):
+        """Write data into the mailbox, counting the bytes written."""
+        self._written += 4 * (1 if isinstance(data, int) else len(data))
+        self.microblaze.write_mailbox(data_offset, data)
+
+    def read_mailbox(self, data_offset, num_words=1):
+        """Read data from the mailbox, timing the read."""
+        start = time.perf_counter()
+        data = self.microblaze.read_mailbox(data_offset, num_words)
+        if self._command is not None:
+            entry = self._commands[self._command]
+            entry.read.add(time.perf_counter() - start)
+            entry.bytes_read += 4 * num_words
+        return data
+
+    def write_blocking_command(self, command):
+        """Issue a command, timing the wait for its completion."""
+        entry = self._issue(command)
+        start = time.perf_counter()
+        self.microblaze.write_blocking_command(command)
+        entry.wait.add(time.perf_counter() - start)
+        self._issued = None
+
+    def write_non_blocking_command(self, command):
+        """Issue a command; its completion is timed by `read`."""
+        self._issue(command)
+        self._issued = time.perf_counter()
+        self.microblaze.write_non_blocking_command(command)
+
+    def read(self, offset, length=1):
+        """Read IOP memory, detecting completion of pending commands."""
+        data = self.microblaze.read(offset, length)
+        if self._issued is not None and data == 0 and \
+                offset == MAILBOX_OFFSET + MAILBOX_PY2IOP_CMD_OFFSET:
+            self._commands[self._command].wait.add(
+                time.perf_counter() - self._issued)
+            self._issued = None
+        return data
+
+    def stats(self):
+        """Return the recorded traffic.
+
+        Returns
+        -------
+        dict
+            Statistics keyed by command code (or by its name when known).
+
+        """
+        result = dict()
+        for command in sorted(self._commands):
+            key = self.names.get(command, '0x{:x}'.format(command))
+            result[key] = self._commands[command].to_dict()
+        return result
+
+    def dump_json(self, fp=None):
+        """Dump the recorded traffic as JSON.
+
+        Parameters
+        ----------
+        fp : file
+            A writable text file; if None the JSON string is returned.
+
+        Returns
+        -------
+        str
+            The JSON document, if `fp` is None.
+
+        """
+        if fp is None:
+            return json.dumps(self.stats(), indent=2)
+        json.dump(self.stats(), fp, indent=2)
+
+    def _issue(self, command):
+        if command not in self._commands:
+            self._commands[command] = _CommandStats()
+        entry = self._commands[command]
+        entry.count += 1
+        entry.bytes_written += self._written
+        self._written = 0
+        self._command = command
+        return entry
+
+
+def instrument(driver, names=None):
+    """Record the mailbox traffic of a Grove driver.
+
+    The `microblaze` attribute of `driver` is replaced by an
+    `Arduino_Stats` wrapping it; calling this again on the same driver
+    returns the existing recorder.
+
+    Parameters
+    ----------
+    driver : object
+        Any Grove driver with a `microblaze` attribute, e.g. `Grove_multi`.
+    names : dict
+        Optional mapping from command codes to names.
+
+    Returns
+    -------
+    Arduino_Stats
+        The recorder; use its `stats` and `dump_json` methods.
+
+    """
+    if not isinstance(driver.microblaze, Arduino_Stats):
+        driver.microblaze = Arduino_Stats(driver.microblaze, names)
+    elif names:
+        driver.microblaze.names.update(names)
+    return driver.microblaze
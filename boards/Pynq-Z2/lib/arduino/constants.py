@@ -56,6 +56,14 @@ WRITE_CMD = 0
 READ_CMD = 1
 IOP_MMIO_REGSIZE = 0x10000
 
+# Grove program commands shared by all programs
+BATCH_COMMANDS = 0x41
+GET_FIRMWARE_VERSION = 0x43
+
+# Version of the extended command set of the Grove programs built from this
+# tree; the stock programs ignore GET_FIRMWARE_VERSION and report 0
+FIRMWARE_VERSION = 1
+
 # Arduino switch register map
 ARDUINO_SWITCHCONFIG_BASEADDR = 0x44A20000
 ARDUINO_SWITCHCONFIG_NUMREGS = 5
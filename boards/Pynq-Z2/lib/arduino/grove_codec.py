@@ -0,0 +1,334 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import numpy as np
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+# MPU9250 full-scale ranges (g and deg/s), indexed by their FS_SEL value
+ACCEL_RANGES = (2, 4, 8, 16)
+GYRO_RANGES = (250, 500, 1000, 2000)
+
+# MPU9250 digital low-pass filter bandwidths (Hz), indexed by DLPF_CFG
+DLPF_BANDWIDTHS = (250, 184, 92, 41, 20, 10, 5)
+
+# BMP180 oversampling settings (OSS) and their pressure conversion times (ms)
+BMP180_ULTRA_LOW_POWER = 0
+BMP180_STANDARD = 1
+BMP180_HIGH_RESOLUTION = 2
+BMP180_ULTRA_HIGH_RESOLUTION = 3
+BMP180_CONVERSION_MS = (4.5, 7.5, 13.5, 25.5)
+
+
+def imu_scale(accel_range=2, gyro_range=250):
+    """Return the scale factors turning a raw IMU frame into physical units.
+
+    The units are: acceleration (g), angular rate (deg/s), magnetic field
+    (uT), temperature (Celsius) and pressure (Pa).
+
+    Parameters
+    ----------
+    accel_range: int
+        The accelerometer full-scale range in g.
+    gyro_range: int
+        The gyroscope full-scale range in deg/s.
+
+    Returns
+    -------
+    numpy.ndarray
+        The float32 scale factor of each of the 11 fields.
+
+    """
+    return np.array([accel_range / 32768] * 3 +
+                    [gyro_range / 32768] * 3 +
+                    [1200 / 4096] * 3 +
+                    [1, 1], dtype=np.float32)
+
+
+# Scale factors at the power-on ranges of +/-2 g and +/-250 deg/s
+IMU_SCALE = imu_scale()
+
+
+def encode_imu_config(accel_range=2, gyro_range=250, rate=None,
+                      bandwidth=184):
+    """Encode an MPU9250 configuration into mailbox words.
+
+    Parameters
+    ----------
+    accel_range: int
+        The accelerometer full-scale range in g: 2, 4, 8 or 16.
+    gyro_range: int
+        The gyroscope full-scale range in deg/s: 250, 500, 1000 or 2000.
+    rate: float
+        The output data rate in Hz, 1 kHz divided by an integer between 1
+        and 256; None for 1 kHz. With a 250 Hz bandwidth the low-pass
+        filter is bypassed, the divider is ignored and the rate is fixed
+        to 8 kHz.
+    bandwidth: int
+        The low-pass filter bandwidth in Hz, one of `DLPF_BANDWIDTHS`.
+
+    Returns
+    -------
+    list
+        The ACCEL_FS_SEL, GYRO_FS_SEL, SMPLRT_DIV and DLPF_CFG values.
+
+    """
+    if accel_range not in ACCEL_RANGES:
+        raise ValueError("Accelerometer range can only be {}.".format(
+            ACCEL_RANGES))
+    if gyro_range not in GYRO_RANGES:
+        raise ValueError("Gyroscope range can only be {}.".format(
+            GYRO_RANGES))
+    if bandwidth not in DLPF_BANDWIDTHS:
+        raise ValueError("Filter bandwidth can only be {}.".format(
+            DLPF_BANDWIDTHS))
+    if bandwidth == 250:
+        if rate is not None and rate != 8000:
+            raise ValueError("Rate is fixed to 8000 Hz with a 250 Hz "
+                             "bandwidth.")
+        divider = 1
+    else:
+        if rate is None:
+            divider = 1
+        else:
+            divider = int(round(1000 / rate)) if rate > 0 else 0
+        if not 1 <= divider <= 256:
+            raise ValueError("Rate can only be {} - {} Hz.".format(
+                1000 / 256, 1000))
+    return [ACCEL_RANGES.index(accel_range),
+            GYRO_RANGES.index(gyro_range),
+            divider - 1,
+            DLPF_BANDWIDTHS.index(bandwidth)]
+
+
+def reg2float(data):
+    """Converts 32-bit register values to floats.
+
+    The words are reinterpreted as IEEE-754 single precision numbers in one
+    step, without any per-element Python work.
+
+    Parameters
+    ----------
+    data: int or list or numpy.ndarray
+        32-bit register values read from the mailbox, of any shape.
+
+    Returns
+    -------
+    numpy.ndarray
+        The float32 values, with the shape of `data`.
+
+    """
+    return np.asarray(data, dtype=np.uint32).view(np.float32)
+
+
+def reg2int(data):
+    """Converts 32-bit register values to signed integers.
+
+    Parameters
+    ----------
+    data: int or list or numpy.ndarray
+        32-bit register values read from the mailbox, of any shape.
+
+    Returns
+    -------
+    numpy.ndarray
+        The int32 values, with the shape of `data`.
+
+    """
+    return np.asarray(data, dtype=np.uint32).view(np.int32)
+
+
+def decode_floats(data, scale=1, out=None):
+    """Converts register values to floats and applies scale factors.
+
+    Parameters
+    ----------
+    data: list or numpy.ndarray
+        32-bit register values; the last axis holds the fields of a frame,
+        so a batch of frames can be decoded at once.
+    scale: float or numpy.ndarray
+        A scale factor, or one scale factor per field, e.g. `IMU_SCALE`.
+    out: numpy.ndarray
+        Optional float32 array receiving the result.
+
+    Returns
+    -------
+    numpy.ndarray
+        The scaled float32 values.
+
+    """
+    return np.multiply(reg2float(data), scale, out=out)
+
+
+def decode_affine(data, matrix, offset, out=None):
+    """Converts register values to floats and applies an affine transform.
+
+    Parameters
+    ----------
+    data: list or numpy.ndarray
+        32-bit register values; the last axis holds the fields of a frame,
+        so a batch of frames can be decoded at once.
+    matrix: numpy.ndarray
+        A float32 (fields, fields) matrix applied to each frame.
+    offset: numpy.ndarray
+        A float32 offset added to each transformed frame.
+    out: numpy.ndarray
+        Optional float32 array receiving the result.
+
+    Returns
+    -------
+    numpy.ndarray
+        The transformed float32 values, `matrix @ frame + offset`.
+
+    """
+    out = np.matmul(reg2float(data), matrix.T, out=out)
+    out += offset
+    return out
+
+
+class IMUDecoder(object):
+    """This class decodes raw IMU frames into physical units.
+
+    The scale factors of the sensors and an optional calibration are fused
+    into a single affine transform, so a calibrated frame is decoded in one
+    vectorized step, like an uncalibrated one.
+
+    Attributes
+    ----------
+    scale : numpy.ndarray
+        The scale factor of each field of a frame, e.g. `IMU_SCALE`.
+    calibration : IMUCalibration
+        The calibration applied after scaling, or None.
+
+    """
+    def __init__(self, scale=IMU_SCALE, calibration=None):
+        """Return a new decoder.
+
+        Parameters
+        ----------
+        scale : numpy.ndarray
+            The scale factor of each field of a frame.
+        calibration : IMUCalibration
+            The calibration applied after scaling, or None.
+
+        """
+        self._scale = np.asarray(scale, dtype=np.float32)
+        self._calibration = calibration
+        self._update()
+
+    @property
+    def scale(self):
+        return self._scale
+
+    @scale.setter
+    def scale(self, value):
+        self._scale = np.asarray(value, dtype=np.float32)
+        self._update()
+
+    @property
+    def calibration(self):
+        return self._calibration
+
+    @calibration.setter
+    def calibration(self, value):
+        self._calibration = value
+        self._update()
+
+    def _update(self):
+        if self._calibration is None:
+            self._matrix = self._offset = None
+        else:
+            self._matrix, self._offset = \
+                self._calibration.transform(self._scale)
+
+    def decode(self, data, out=None):
+        """Decode raw IMU frames.
+
+        Parameters
+        ----------
+        data: list or numpy.ndarray
+            32-bit register values of one frame, or a (N, 11) batch.
+        out: numpy.ndarray
+            Optional float32 array receiving the result.
+
+        Returns
+        -------
+        numpy.ndarray
+            The float32 values in physical units.
+
+        """
+        if self._matrix is None:
+            return decode_floats(data, self._scale, out)
+        return decode_affine(data, self._matrix, self._offset, out)
+
+
+def to_list(values, decimals=2):
+    """Round decoded values for presentation.
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        Decoded values.
+    decimals: int
+        Number of decimal places to keep.
+
+    Returns
+    -------
+    list
+        The rounded values as Python floats.
+
+    """
+    return np.round(values.astype(np.float64), decimals).tolist()
+
+
+def present(values, precision=2):
+    """Return decoded values as the drivers report them.
+
+    Parameters
+    ----------
+    values: numpy.ndarray
+        Decoded float32 values.
+    precision: int
+        Number of decimal places to keep; if None, `values` is returned
+        untouched, at full float32 precision.
+
+    Returns
+    -------
+    list or numpy.ndarray
+        The rounded values as Python floats, or `values` itself.
+
+    """
+    if precision is None:
+        return values
+    return to_list(values, precision)
@@ -29,8 +29,30 @@
 
 
 import math
-from . import Arduino
+import time
+import numpy as np
+from .arduino_backend import configure_switch
+from .arduino_backend import open_microblaze
+from .arduino_backend import require_firmware
+from .arduino_backend import mailbox_lock
+from .arduino_backend import write_async_command
+from .grove_codec import BMP180_CONVERSION_MS
+from .grove_codec import BMP180_ULTRA_LOW_POWER
+from .grove_codec import IMUDecoder
+from .grove_codec import decode_floats
+from .grove_codec import encode_imu_config
+from .grove_codec import imu_scale
+from .grove_codec import present
+from .grove_imu_calibration import IMUCalibration
+from .grove_imu_calibration import calibrate
+from .grove_imu_math import altitude
+from .grove_imu_math import atm
+from .grove_imu_math import heading
+from .grove_imu_math import tilt_heading
+from .grove_imu_math import pressure_to_altitude
+from .grove_imu_math import pressure_to_atm
 from . import ARDUINO_GROVE_I2C
+from . import MAILBOX_PY2IOP_DATA_OFFSET
 
 
 __author__ = "Yun Rock Qu"
@@ -42,52 +64,14 @@ __email__ = "pynq_support@xilinx.com"
 ARDUINO_GROVE_IMU_PROGRAM = "grove_imu.bin"
 CONFIG_IOP_SWITCH = 0x1
 GET_DATA = 0x3
+START_FIFO = 0x5
+STOP_FIFO = 0x7
+READ_FIFO = 0x9
+CONFIGURE_IMU = 0xB
+GET_PRESSURE = 0xD
 
-
-def _reg2float(reg):
-    """Converts 32-bit register value to floats in Python.
-
-    Parameters
-    ----------
-    reg: int
-        A 32-bit register value read from the mailbox.
-
-    Returns
-    -------
-    float
-        A float number translated from the register value.
-
-    """
-    if reg == 0:
-        return 0.0
-    sign = (reg & 0x80000000) >> 31 & 0x01
-    exp = ((reg & 0x7f800000) >> 23) - 127
-    if exp == 0:
-        man = (reg & 0x007fffff) / pow(2, 23)
-    else:
-        man = 1 + (reg & 0x007fffff) / pow(2, 23)
-    result = pow(2, exp) * man * ((sign * -2) + 1)
-    return float("{0:.2f}".format(result))
-
-
-def _reg2int(reg):
-    """Converts 32-bit register value to signed integer in Python.
-
-    Parameters
-    ----------
-    reg: int
-        A 32-bit register value read from the mailbox.
-
-    Returns
-    -------
-    int
-        A signed integer translated from the register value.
-
-    """
-    result = -(reg >> 31 & 0x1) * (1 << 31)
-    for i in range(31):
-        result += (reg >> i & 0x1) * (1 << i)
-    return result
+# A FIFO burst returns [count, dropped] followed by count frames of 11 words
+FIFO_MAX_FRAMES = (MAILBOX_PY2IOP_DATA_OFFSET // 4 - 2) // 11
 
 
 class G_IMU(object):
@@ -103,9 +87,14 @@ class G_IMU(object):
     ----------
     microblaze : Arduino
         Microblaze processor instance used by this module.
+    decoder : IMUDecoder
+        The decoder turning raw frames into calibrated physical values.
+    fifo_dropped : int
+        The number of frames the Microblaze FIFO has dropped because it was
+        full, since `start_fifo`.
         
     """
-    def __init__(self, mb_info, gr_pin):
+    def __init__(self, mb_info, gr_pin, calibration=None):
         """Return a new instance of an Grove IMU object. 
         
         Parameters
@@ -115,16 +104,33 @@ class G_IMU(object):
             IP name and the reset name.
         gr_pin: list
             A group of pins on arduino-grove shield.
+        calibration : IMUCalibration or str
+            Optional calibration, or the path or device name of a saved
+            one, applied to all the data read.
 
         """
         if gr_pin not in [ARDUINO_GROVE_I2C]:
             raise ValueError("Group number can only be I2C.")
+        if isinstance(calibration, str):
+            calibration = IMUCalibration.load(calibration)
 
-        self.microblaze = Arduino(mb_info, ARDUINO_GROVE_IMU_PROGRAM)
-        self.microblaze.write_blocking_command(CONFIG_IOP_SWITCH)
+        self.microblaze = open_microblaze(mb_info, ARDUINO_GROVE_IMU_PROGRAM)
+        configure_switch(self.microblaze, CONFIG_IOP_SWITCH)
+        self.decoder = IMUDecoder(calibration=calibration)
+        self.fifo_dropped = 0
 
-    def get_data(self):
+    def get_data(self, precision=2, out=None):
         """Get the whole data from the accelerometer.
+
+        With `precision=None` the values are returned at full float32
+        precision, without rounding, in `out` if it is given.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+        out : numpy.ndarray
+            Optional float32 array of 11 elements receiving raw values.
         
         Returns
         -------
@@ -133,26 +139,292 @@ class G_IMU(object):
             [3,4,5] A list of the gyro data along X-axis, Y-axis, and Z-axis.
             [6,7,8] A list of the compass data along X-axis, Y-axis, and Z-axis.
             [9,10]  A list of the value of temperature and pressure.
+            A numpy.ndarray with the same layout if `precision` is None.
         """
         self.microblaze.write_blocking_command(GET_DATA)
         data = self.microblaze.read_mailbox(0, 11)
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = [_reg2float(i) for i in data]
-
-        return [float("{0:.2f}".format(ax / 16384)),
-                float("{0:.2f}".format(ay / 16384)),
-                float("{0:.2f}".format(az / 16384)),
-                float("{0:.2f}".format(gx * 250 / 32768)),
-                float("{0:.2f}".format(gy * 250 / 32768)),
-                float("{0:.2f}".format(gz * 250 / 32768)),
-                float("{0:.2f}".format(mx * 1200 / 4096)),
-                float("{0:.2f}".format(my * 1200 / 4096)),
-                float("{0:.2f}".format(mz * 1200 / 4096)),
-                float("{0:.2f}".format(temp)),
-                float("{0:.2f}".format(pres))]
-        
+        return self._data(data, precision, out)
+
+    async def get_data_async(self, precision=2, out=None):
+        """Get the whole data from the accelerometer asynchronously.
+
+        The event loop keeps running while the Microblaze reads the sensors.
+
+        Parameters
+        ----------
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+        out : numpy.ndarray
+            Optional float32 array of 11 elements receiving raw values.
+
+        Returns
+        -------
+        list
+            The same values as `get_data`.
+        """
+        async with mailbox_lock(self.microblaze):
+            await write_async_command(self.microblaze, GET_DATA)
+            data = self.microblaze.read_mailbox(0, 11)
+        return self._data(data, precision, out)
+
+    def configure(self, accel_range=2, gyro_range=250, rate=None,
+                  bandwidth=184):
+        """Configure the MPU9250 ranges, data rate and low-pass filter.
+
+        The scale factors used to decode the data follow the new ranges,
+        and compose with the calibration, if any. Frames still queued in
+        the Microblaze FIFO are decoded with the new ranges, so stop it
+        first.
+
+        Parameters
+        ----------
+        accel_range : int
+            The accelerometer full-scale range in g: 2, 4, 8 or 16.
+        gyro_range : int
+            The gyroscope full-scale range in deg/s: 250, 500, 1000 or
+            2000.
+        rate : float
+            The output data rate in Hz, up to 1 kHz; None for 1 kHz. It is
+            fixed to 8 kHz with a 250 Hz bandwidth.
+        bandwidth : int
+            The low-pass filter bandwidth in Hz: 250, 184, 92, 41, 20, 10
+            or 5.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `CONFIGURE_IMU`.
+
+        """
+        require_firmware(self.microblaze, "G_IMU.configure")
+        data = encode_imu_config(accel_range, gyro_range, rate, bandwidth)
+        self.microblaze.write_mailbox(0, data)
+        self.microblaze.write_blocking_command(CONFIGURE_IMU)
+        self.decoder.scale = imu_scale(accel_range, gyro_range)
+
+    def _data(self, data, precision=2, out=None):
+        return present(self.decoder.decode(data, out), precision)
+
+    def calibrate(self, num_samples=1000, rate=50, num_stationary=0,
+                  device=None):
+        """Record a rotation sweep and calibrate the IMU with it.
+
+        The first `num_stationary` frames are taken with the IMU at rest to
+        estimate the gyroscope bias; the IMU should then be rotated slowly
+        through all orientations. The fitted calibration is applied to all
+        subsequent reads; save it with its `save` method.
+
+        Parameters
+        ----------
+        num_samples : int
+            The number of frames in the sweep.
+        rate : float
+            The sampling rate in Hz.
+        num_stationary : int
+            The number of frames taken at rest before the sweep.
+        device : str
+            The name of the calibrated device.
+
+        Returns
+        -------
+        IMUCalibration
+            The fitted calibration.
+
+        """
+        self.decoder.calibration = None
+        self.decoder.calibration = calibrate(
+            lambda: self.get_data(precision=None), num_samples, rate,
+            num_stationary, device)
+        return self.decoder.calibration
+
+    def start_fifo(self, rate):
+        """Start sampling into the Microblaze FIFO.
+
+        The Microblaze samples the MPU9250 and BMP180 on its own at `rate`
+        and queues the raw frames, until `stop_fifo` is called. Frames are
+        drained in bursts with `read_fifo`.
+
+        Parameters
+        ----------
+        rate : float
+            The sampling rate in Hz.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the FIFO.
+
+        """
+        require_firmware(self.microblaze, "G_IMU.start_fifo")
+        if rate <= 0:
+            raise ValueError("Sampling rate must be positive.")
+        self.fifo_dropped = 0
+        self.microblaze.write_mailbox(0, int(1e6 / rate))
+        self.microblaze.write_blocking_command(START_FIFO)
+
+    def stop_fifo(self):
+        """Stop sampling into the Microblaze FIFO and discard its content.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the FIFO.
+
+        """
+        require_firmware(self.microblaze, "G_IMU.stop_fifo")
+        self.microblaze.write_blocking_command(STOP_FIFO)
+
+    def read_fifo(self, max_frames=FIFO_MAX_FRAMES, precision=None):
+        """Drain up to `max_frames` frames from the Microblaze FIFO.
+
+        All frames are transferred with one command and one bulk mailbox
+        read, and decoded at once.
+
+        Parameters
+        ----------
+        max_frames : int
+            The maximum number of frames to drain, at most
+            `FIFO_MAX_FRAMES`.
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        numpy.ndarray
+            A (n, 11) array with the layout of `get_data`, oldest first;
+            a list of lists if `precision` is not None.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates the FIFO.
+
+        """
+        require_firmware(self.microblaze, "G_IMU.read_fifo")
+        if not 0 < max_frames <= FIFO_MAX_FRAMES:
+            raise ValueError("Number of frames must be 1 - {}.".format(
+                FIFO_MAX_FRAMES))
+        self.microblaze.write_mailbox(0, max_frames)
+        self.microblaze.write_blocking_command(READ_FIFO)
+        count, dropped = self.microblaze.read_mailbox(0, 2)
+        if count > max_frames:
+            raise RuntimeError("Microblaze returned {} frames, {} were "
+                               "requested.".format(count, max_frames))
+        self.fifo_dropped += dropped
+        if count == 0:
+            data = np.zeros((0, 11), dtype=np.uint32)
+        else:
+            data = np.asarray(self.microblaze.read_mailbox(8, 11 * count),
+                              dtype=np.uint32).reshape(count, 11)
+        return present(self.decoder.decode(data), precision)
+
+    def get_pressure(self, oversampling=BMP180_ULTRA_LOW_POWER, precision=2):
+        """Get the temperature and pressure from the barometer only.
+
+        Only the BMP180 is read, not the whole IMU frame. The oversampling
+        setting trades conversion time for resolution, from 4.5 ms with
+        `BMP180_ULTRA_LOW_POWER` to 25.5 ms with
+        `BMP180_ULTRA_HIGH_RESOLUTION`. This needs a program built with
+        the `GET_PRESSURE` command.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3.
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        list
+            [0,1] A list of the value of temperature and pressure.
+            A numpy.ndarray with the same layout if `precision` is None.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `GET_PRESSURE`.
+
+        """
+        require_firmware(self.microblaze, "G_IMU.get_pressure")
+        if oversampling not in range(len(BMP180_CONVERSION_MS)):
+            raise ValueError("Oversampling can only be 0 - 3.")
+        self.microblaze.write_mailbox(0, oversampling)
+        self.microblaze.write_blocking_command(GET_PRESSURE)
+        data = self.microblaze.read_mailbox(0, 2)
+        return present(decode_floats(data), precision)
+
+    async def get_pressure_async(self, oversampling=BMP180_ULTRA_LOW_POWER,
+                                 precision=2):
+        """Get the temperature and pressure asynchronously.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3.
+        precision : int
+            Number of decimal places to round to, or None for raw values.
+
+        Returns
+        -------
+        list
+            The same values as `get_pressure`.
+
+        Raises
+        ------
+        RuntimeError
+            If the program on the IOP predates `GET_PRESSURE`.
+
+        """
+        if oversampling not in range(len(BMP180_CONVERSION_MS)):
+            raise ValueError("Oversampling can only be 0 - 3.")
+        async with mailbox_lock(self.microblaze):
+            require_firmware(self.microblaze,
+                             "G_IMU.get_pressure_async")
+            self.microblaze.write_mailbox(0, oversampling)
+            await write_async_command(self.microblaze, GET_PRESSURE)
+            data = self.microblaze.read_mailbox(0, 2)
+        return present(decode_floats(data), precision)
+
+    def get_frame(self):
+        """Get a snapshot of the whole IMU data from one read.
+
+        Derived quantities (heading, tilt heading, atmosphere and altitude)
+        are computed from the snapshot when first accessed, so a single
+        mailbox read can feed all of them.
+
+        Returns
+        -------
+        IMUFrame
+            The IMU data at full float32 precision.
+
+        """
+        return IMUFrame(self.get_data(precision=None), time.monotonic())
+
+    async def get_frame_async(self):
+        """Get a snapshot of the whole IMU data asynchronously.
+
+        Returns
+        -------
+        IMUFrame
+            The IMU data at full float32 precision.
+
+        """
+        data = await self.get_data_async(precision=None)
+        return IMUFrame(data, time.monotonic())
+
     def get_heading(self):
         """Get the value of the heading.
         
@@ -162,15 +434,7 @@ class G_IMU(object):
             The angle deviated from the X-axis, toward the positive Y-axis.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-        
-        heading = 180 * math.atan2(my, mx) / math.pi
-        if heading < 0:
-            heading += 360
-        return float("{0:.2f}".format(heading))
+        return float("{0:.2f}".format(self.get_frame().heading))
 
     def get_tilt_heading(self):
         """Get the value of the tilt heading.
@@ -181,46 +445,42 @@ class G_IMU(object):
             The tilt heading value.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-
-        try:
-            pitch = math.asin(-ax)
-            roll = math.asin(ay / math.cos(pitch))
-        except ZeroDivisionError:
-            raise RuntimeError("Value out of range or device not connected.")
-
-        xh = mx * math.cos(pitch) + mz * math.sin(pitch)
-        yh = mx * math.sin(roll) * math.sin(pitch) + \
-            my * math.cos(roll) - mz * math.sin(roll) * math.cos(pitch)
-        _ = -mx * math.cos(roll) * math.sin(pitch) + \
-            my * math.sin(roll) + mz * math.cos(roll) * math.cos(pitch)
-        tilt_heading = 180 * math.atan2(yh, xh) / math.pi
-        if yh < 0:
-            tilt_heading += 360
-        return float("{0:.2f}".format(tilt_heading))
-        
-        
-    def get_atm(self):
+        return float("{0:.2f}".format(self.get_frame().tilt_heading))
+
+    def get_atm(self, oversampling=None):
         """Get the current pressure in relative atmosphere.
 
+        By default the value is derived from a whole IMU frame. With an
+        `oversampling` setting, only the barometer is read instead, see
+        `get_pressure`; this needs a program built with `GET_PRESSURE`.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3, or None to read a frame.
+
         Returns
         -------
         float
             The related atmosphere.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-        
-        return float("{0:.2f}".format(pres / 101325))
-        
-    def get_altitude(self):
+        if oversampling is None:
+            return float("{0:.2f}".format(self.get_frame().atm))
+        pressure = self.get_pressure(oversampling, precision=None)[1]
+        return float("{0:.2f}".format(pressure_to_atm(pressure)))
+
+    def get_altitude(self, oversampling=None):
         """Get the current altitude.
+
+        By default the value is derived from a whole IMU frame. With an
+        `oversampling` setting, only the barometer is read instead, see
+        `get_pressure`; this needs a program built with `GET_PRESSURE`.
+
+        Parameters
+        ----------
+        oversampling : int
+            The BMP180 oversampling setting, 0 - 3, or None to read a frame.
         
         Returns
         -------
@@ -228,13 +488,100 @@ class G_IMU(object):
             The altitude value.
         
         """
-        [ax, ay, az,
-         gx, gy, gz,
-         mx, my, mz,
-         temp, pres] = self.get_data()
-        
-        a = pres / 1000
-        b = 1 / 5.25885
-        c = 288.15 - math.exp((math.log(a) + 18.2573)*b)
-        altitude = (1/0.0065) * c
-        return float("{0:.2f}".format(altitude))
+        if oversampling is None:
+            return float("{0:.2f}".format(self.get_frame().altitude))
+        pressure = self.get_pressure(oversampling, precision=None)[1]
+        return float("{0:.2f}".format(pressure_to_altitude(pressure)))
+
+
+class IMUFrame(object):
+    """This class holds one snapshot of the Grove IMU data.
+
+    The derived quantities are computed lazily from the snapshot and cached,
+    so they all refer to the same instant and cost nothing when unused.
+
+    Attributes
+    ----------
+    data : numpy.ndarray
+        The 11 values returned by `G_IMU.get_data`, at full precision.
+    timestamp : float
+        The `time.monotonic` time at which the frame was read.
+
+    """
+    __slots__ = ('data', 'timestamp',
+                 '_heading', '_tilt_heading', '_atm', '_altitude')
+
+    def __init__(self, data, timestamp=None):
+        """Return a new snapshot.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            The 11 values returned by `G_IMU.get_data`.
+        timestamp : float
+            The time at which the frame was read.
+
+        """
+        self.data = data
+        self.timestamp = timestamp
+        self._heading = None
+        self._tilt_heading = None
+        self._atm = None
+        self._altitude = None
+
+    @property
+    def accel(self):
+        """The acceleration along X-axis, Y-axis, and Z-axis (g)."""
+        return self.data[0:3]
+
+    @property
+    def gyro(self):
+        """The angular rate along X-axis, Y-axis, and Z-axis (deg/s)."""
+        return self.data[3:6]
+
+    @property
+    def compass(self):
+        """The magnetic field along X-axis, Y-axis, and Z-axis (uT)."""
+        return self.data[6:9]
+
+    @property
+    def temperature(self):
+        """The temperature (Celsius)."""
+        return float(self.data[9])
+
+    @property
+    def pressure(self):
+        """The pressure (Pa)."""
+        return float(self.data[10])
+
+    @property
+    def heading(self):
+        """The angle deviated from the X-axis, toward the positive Y-axis."""
+        if self._heading is None:
+            self._heading = float(heading(self.data))
+        return self._heading
+
+    @property
+    def tilt_heading(self):
+        """The tilt-compensated heading."""
+        if self._tilt_heading is None:
+            value = float(tilt_heading(self.data))
+            if math.isnan(value):
+                raise RuntimeError(
+                    "Value out of range or device not connected.")
+            self._tilt_heading = value
+        return self._tilt_heading
+
+    @property
+    def atm(self):
+        """The pressure in relative atmosphere."""
+        if self._atm is None:
+            self._atm = float(atm(self.data))
+        return self._atm
+
+    @property
+    def altitude(self):
+        """The altitude derived from the pressure."""
+        if self._altitude is None:
+            self._altitude = float(altitude(self.data))
+        return self._altitude
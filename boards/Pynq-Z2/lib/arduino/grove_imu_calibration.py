@@ -0,0 +1,326 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+
+import json
+import os
+import time
+import numpy as np
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+# Calibrations saved by device name are kept in this directory
+CALIBRATION_DIR = os.path.join(os.path.expanduser('~'), '.pynq',
+                               'imu_calibration')
+
+
+def _fit_ellipsoid(points):
+    """Fit an ellipsoid to 3D points.
+
+    Returns the center and the symmetric matrix `S` such that the ellipsoid
+    is `(x - center)^T S (x - center) = 1`.
+
+    """
+    x, y, z = points[:, 0], points[:, 1], points[:, 2]
+    design = np.stack([x * x, y * y, z * z, 2 * y * z, 2 * x * z, 2 * x * y,
+                       2 * x, 2 * y, 2 * z], axis=1)
+    v = np.linalg.lstsq(design, np.ones(len(points)), rcond=None)[0]
+    quadric = np.array([[v[0], v[5], v[4]],
+                        [v[5], v[1], v[3]],
+                        [v[4], v[3], v[2]]])
+    center = -np.linalg.solve(quadric, v[6:9])
+    shape = quadric / (1 + center.dot(quadric).dot(center))
+    return center, shape
+
+
+def _sphere_map(shape, radius=None):
+    """Return the matrix mapping an ellipsoid onto a sphere.
+
+    The sphere has the given radius, or by default the geometric mean of
+    the semi-axes of the ellipsoid.
+
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(shape)
+    if np.any(eigenvalues <= 0):
+        raise ValueError("Sweep does not cover enough orientations.")
+    if radius is None:
+        radius = np.prod(eigenvalues) ** (-1 / 6)
+    return radius * eigenvectors.dot(
+        np.diag(np.sqrt(eigenvalues))).dot(eigenvectors.T)
+
+
+class IMUCalibration(object):
+    """This class holds the calibration of a Grove IMU.
+
+    The accelerometer and the magnetometer are corrected by an affine map,
+    `matrix @ (value - bias)`; the bias of the magnetometer is the hard-iron
+    offset and its matrix the soft-iron correction. The gyroscope is
+    corrected by its bias only. Values are in physical units (g, deg/s, uT).
+
+    Attributes
+    ----------
+    accel_matrix : numpy.ndarray
+        The 3x3 accelerometer correction matrix.
+    accel_bias : numpy.ndarray
+        The accelerometer bias (g).
+    gyro_bias : numpy.ndarray
+        The gyroscope bias (deg/s).
+    mag_matrix : numpy.ndarray
+        The 3x3 soft-iron correction matrix.
+    mag_bias : numpy.ndarray
+        The hard-iron offset (uT).
+    device : str
+        The name of the calibrated device, used to save the calibration.
+
+    """
+    def __init__(self, accel_matrix=None, accel_bias=None, gyro_bias=None,
+                 mag_matrix=None, mag_bias=None, device=None):
+        """Return a new calibration; missing terms are the identity.
+
+        Parameters
+        ----------
+        accel_matrix : numpy.ndarray
+            The 3x3 accelerometer correction matrix.
+        accel_bias : numpy.ndarray
+            The accelerometer bias (g).
+        gyro_bias : numpy.ndarray
+            The gyroscope bias (deg/s).
+        mag_matrix : numpy.ndarray
+            The 3x3 soft-iron correction matrix.
+        mag_bias : numpy.ndarray
+            The hard-iron offset (uT).
+        device : str
+            The name of the calibrated device.
+
+        """
+        def matrix(value):
+            return np.eye(3) if value is None else \
+                np.asarray(value, dtype=np.float64).reshape(3, 3)
+
+        def vector(value):
+            return np.zeros(3) if value is None else \
+                np.asarray(value, dtype=np.float64).reshape(3)
+
+        self.accel_matrix = matrix(accel_matrix)
+        self.accel_bias = vector(accel_bias)
+        self.gyro_bias = vector(gyro_bias)
+        self.mag_matrix = matrix(mag_matrix)
+        self.mag_bias = vector(mag_bias)
+        self.device = device
+
+    def transform(self, scale):
+        """Return the affine transform decoding raw frames.
+
+        The scale factors and the calibration are fused, so that the
+        calibrated frame is `matrix @ raw + offset`.
+
+        Parameters
+        ----------
+        scale : numpy.ndarray
+            The scale factor of each of the 11 fields of a raw frame.
+
+        Returns
+        -------
+        tuple
+            The float32 (11, 11) matrix and (11,) offset.
+
+        """
+        scale = np.asarray(scale, dtype=np.float64)
+        matrix = np.diag(scale)
+        offset = np.zeros(len(scale))
+        for index, correction, bias in (
+                (slice(0, 3), self.accel_matrix, self.accel_bias),
+                (slice(3, 6), np.eye(3), self.gyro_bias),
+                (slice(6, 9), self.mag_matrix, self.mag_bias)):
+            matrix[index, index] = correction * scale[index]
+            offset[index] = -correction.dot(bias)
+        return matrix.astype(np.float32), offset.astype(np.float32)
+
+    def apply(self, frames):
+        """Calibrate frames already decoded in physical units.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            One frame of 11 values, or a (N, 11) batch.
+
+        Returns
+        -------
+        numpy.ndarray
+            The calibrated frames.
+
+        """
+        matrix, offset = self.transform(np.ones(11))
+        return np.matmul(np.asarray(frames, dtype=np.float32),
+                         matrix.T) + offset
+
+    @classmethod
+    def fit(cls, frames, stationary=None, device=None):
+        """Fit a calibration to a rotation sweep.
+
+        The sweep should turn the IMU slowly through as many orientations
+        as possible, so the accelerometer and magnetometer readings cover
+        their ellipsoids; the accelerometer is mapped onto the unit sphere
+        and the magnetometer onto a sphere of the same mean radius.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            The (N, 11) uncalibrated frames of the sweep.
+        stationary : numpy.ndarray
+            Optional uncalibrated frames taken with the IMU at rest, used
+            to estimate the gyroscope bias.
+        device : str
+            The name of the calibrated device.
+
+        Returns
+        -------
+        IMUCalibration
+            The fitted calibration.
+
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        if frames.ndim != 2 or len(frames) < 9:
+            raise ValueError("At least 9 frames are needed for a fit.")
+
+        accel_bias, accel_shape = _fit_ellipsoid(frames[:, 0:3])
+        mag_bias, mag_shape = _fit_ellipsoid(frames[:, 6:9])
+        gyro_bias = None
+        if stationary is not None and len(stationary):
+            gyro_bias = np.mean(np.asarray(stationary)[:, 3:6], axis=0)
+        return cls(accel_matrix=_sphere_map(accel_shape, 1.0),
+                   accel_bias=accel_bias,
+                   gyro_bias=gyro_bias,
+                   mag_matrix=_sphere_map(mag_shape),
+                   mag_bias=mag_bias,
+                   device=device)
+
+    def to_dict(self):
+        """Return the calibration as a JSON-serializable dictionary."""
+        return {'device': self.device,
+                'accel_matrix': self.accel_matrix.tolist(),
+                'accel_bias': self.accel_bias.tolist(),
+                'gyro_bias': self.gyro_bias.tolist(),
+                'mag_matrix': self.mag_matrix.tolist(),
+                'mag_bias': self.mag_bias.tolist()}
+
+    @classmethod
+    def from_dict(cls, values):
+        """Return the calibration stored in a dictionary."""
+        return cls(**values)
+
+    def save(self, path=None):
+        """Save the calibration as JSON.
+
+        Parameters
+        ----------
+        path : str
+            The file to write; by default `<device>.json` in
+            `CALIBRATION_DIR`.
+
+        Returns
+        -------
+        str
+            The path of the file written.
+
+        """
+        if path is None:
+            if self.device is None:
+                raise ValueError("A path or a device name is required.")
+            os.makedirs(CALIBRATION_DIR, exist_ok=True)
+            path = os.path.join(CALIBRATION_DIR, self.device + '.json')
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, name):
+        """Load a saved calibration.
+
+        Parameters
+        ----------
+        name : str
+            A file path, or the name of a device saved in
+            `CALIBRATION_DIR`.
+
+        Returns
+        -------
+        IMUCalibration
+            The loaded calibration.
+
+        """
+        path = name
+        if not os.path.isfile(path):
+            path = os.path.join(CALIBRATION_DIR, name + '.json')
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def calibrate(read, num_samples=1000, rate=50, num_stationary=0,
+              device=None):
+    """Record a rotation sweep and fit a calibration to it.
+
+    The first `num_stationary` frames are taken with the IMU at rest to
+    estimate the gyroscope bias; the IMU should then be rotated slowly
+    through all orientations while the remaining frames are taken.
+
+    Parameters
+    ----------
+    read : function
+        Returns one uncalibrated frame of 11 values in physical units.
+    num_samples : int
+        The number of frames in the sweep.
+    rate : float
+        The sampling rate in Hz.
+    num_stationary : int
+        The number of frames taken at rest before the sweep.
+    device : str
+        The name of the calibrated device.
+
+    Returns
+    -------
+    IMUCalibration
+        The fitted calibration.
+
+    """
+    frames = np.zeros((num_stationary + num_samples, 11), dtype=np.float32)
+    period = 1 / rate
+    deadline = time.monotonic()
+    for i in range(len(frames)):
+        frames[i] = read()
+        deadline += period
+        time.sleep(max(deadline - time.monotonic(), 0))
+    return IMUCalibration.fit(frames[num_stationary:],
+                              frames[:num_stationary], device)
@@ -0,0 +1,273 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import math
+import numpy as np
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def _madgwick(q, ax, ay, az, gx, gy, gz, mx, my, mz, beta, dt):
+    """One step of Madgwick's MARG filter.
+
+    Gyro rates are in rad/s; accelerometer and magnetometer readings are
+    normalised here, so their units do not matter. A zero magnetometer
+    reading falls back to the accelerometer-only update.
+
+    """
+    q0, q1, q2, q3 = q
+
+    # Rate of change of quaternion from gyroscope
+    qdot0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+    qdot1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+    qdot2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+    qdot3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+
+    norm = math.sqrt(ax * ax + ay * ay + az * az)
+    if norm > 0:
+        ax, ay, az = ax / norm, ay / norm, az / norm
+        q0q0, q1q1, q2q2, q3q3 = q0 * q0, q1 * q1, q2 * q2, q3 * q3
+        norm = math.sqrt(mx * mx + my * my + mz * mz)
+        if norm > 0:
+            mx, my, mz = mx / norm, my / norm, mz / norm
+            q0q1, q0q2, q0q3 = q0 * q1, q0 * q2, q0 * q3
+            q1q2, q1q3, q2q3 = q1 * q2, q1 * q3, q2 * q3
+
+            # Reference direction of Earth's magnetic field
+            hx = mx * (q0q0 + q1q1 - q2q2 - q3q3) + \
+                2 * my * (q1q2 - q0q3) + 2 * mz * (q1q3 + q0q2)
+            hy = 2 * mx * (q1q2 + q0q3) + \
+                my * (q0q0 - q1q1 + q2q2 - q3q3) + 2 * mz * (q2q3 - q0q1)
+            bx = math.sqrt(hx * hx + hy * hy)
+            bz = 2 * mx * (q1q3 - q0q2) + 2 * my * (q2q3 + q0q1) + \
+                mz * (q0q0 - q1q1 - q2q2 + q3q3)
+
+            # Objective function and its Jacobian (gradient descent step)
+            fa0 = 2 * (q1q3 - q0q2) - ax
+            fa1 = 2 * (q0q1 + q2q3) - ay
+            fa2 = 1 - 2 * (q1q1 + q2q2) - az
+            fm0 = 2 * bx * (0.5 - q2q2 - q3q3) + 2 * bz * (q1q3 - q0q2) - mx
+            fm1 = 2 * bx * (q1q2 - q0q3) + 2 * bz * (q0q1 + q2q3) - my
+            fm2 = 2 * bx * (q0q2 + q1q3) + 2 * bz * (0.5 - q1q1 - q2q2) - mz
+
+            s0 = -2 * q2 * fa0 + 2 * q1 * fa1 - 2 * bz * q2 * fm0 + \
+                (-2 * bx * q3 + 2 * bz * q1) * fm1 + 2 * bx * q2 * fm2
+            s1 = 2 * q3 * fa0 + 2 * q0 * fa1 - 4 * q1 * fa2 + \
+                2 * bz * q3 * fm0 + (2 * bx * q2 + 2 * bz * q0) * fm1 + \
+                (2 * bx * q3 - 4 * bz * q1) * fm2
+            s2 = -2 * q0 * fa0 + 2 * q3 * fa1 - 4 * q2 * fa2 + \
+                (-4 * bx * q2 - 2 * bz * q0) * fm0 + \
+                (2 * bx * q1 + 2 * bz * q3) * fm1 + \
+                (2 * bx * q0 - 4 * bz * q2) * fm2
+            s3 = 2 * q1 * fa0 + 2 * q2 * fa1 + \
+                (-4 * bx * q3 + 2 * bz * q1) * fm0 + \
+                (-2 * bx * q0 + 2 * bz * q2) * fm1 + 2 * bx * q1 * fm2
+        else:
+            s0 = 4 * q0 * q2q2 + 2 * q2 * ax + 4 * q0 * q1q1 - 2 * q1 * ay
+            s1 = 4 * q1 * q3q3 - 2 * q3 * ax + 4 * q0q0 * q1 - 2 * q0 * ay - \
+                4 * q1 + 8 * q1 * q1q1 + 8 * q1 * q2q2 + 4 * q1 * az
+            s2 = 4 * q0q0 * q2 + 2 * q0 * ax + 4 * q2 * q3q3 - 2 * q3 * ay - \
+                4 * q2 + 8 * q2 * q1q1 + 8 * q2 * q2q2 + 4 * q2 * az
+            s3 = 4 * q1q1 * q3 - 2 * q1 * ax + 4 * q2q2 * q3 - 2 * q2 * ay
+
+        norm = math.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+        if norm > 0:
+            qdot0 -= beta * s0 / norm
+            qdot1 -= beta * s1 / norm
+            qdot2 -= beta * s2 / norm
+            qdot3 -= beta * s3 / norm
+
+    q0 += qdot0 * dt
+    q1 += qdot1 * dt
+    q2 += qdot2 * dt
+    q3 += qdot3 * dt
+    norm = math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+    return q0 / norm, q1 / norm, q2 / norm, q3 / norm
+
+
+class OrientationFilter(object):
+    """This class fuses IMU frames into an orientation estimate.
+
+    It implements Madgwick's gradient-descent filter: the gyroscope is
+    integrated on every sample and the drift is corrected towards the
+    gravity and magnetic field directions measured by the accelerometer
+    and magnetometer. Each update costs O(1) and works on a fixed state,
+    so it keeps up with high sample rates.
+
+    Frames have the layout of `G_IMU.get_data` (or `Grove_multi`'s IMU
+    data); `IMUFrame` instances are accepted too, in which case the time
+    step is taken from their timestamps.
+
+    Attributes
+    ----------
+    beta : float
+        The filter gain; larger values trust the accelerometer and
+        magnetometer more, smaller values trust the gyroscope more.
+    sample_period : float
+        The time step in seconds used when none can be derived.
+
+    """
+    def __init__(self, beta=0.1, sample_period=None):
+        """Return a new filter, starting from the identity orientation.
+
+        Parameters
+        ----------
+        beta : float
+            The filter gain.
+        sample_period : float
+            The default time step in seconds between two frames.
+
+        """
+        self.beta = beta
+        self.sample_period = sample_period
+        self.reset()
+
+    def reset(self):
+        """Reset the orientation to the identity."""
+        self._q = (1.0, 0.0, 0.0, 0.0)
+        self._timestamp = None
+
+    @property
+    def quaternion(self):
+        """The orientation as a new unit quaternion array (w, x, y, z)."""
+        return np.array(self._q, dtype=np.float64)
+
+    @property
+    def euler(self):
+        """The orientation as (roll, pitch, yaw) in degrees."""
+        q0, q1, q2, q3 = self._q
+        roll = math.atan2(q0 * q1 + q2 * q3, 0.5 - q1 * q1 - q2 * q2)
+        pitch = math.asin(max(-1.0, min(1.0, -2 * (q1 * q3 - q0 * q2))))
+        yaw = math.atan2(q1 * q2 + q0 * q3, 0.5 - q2 * q2 - q3 * q3)
+        return math.degrees(roll), math.degrees(pitch), math.degrees(yaw)
+
+    def update(self, frame, dt=None, out=None):
+        """Update the orientation with one frame.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray or list or IMUFrame
+            One IMU frame.
+        dt : float
+            The time step in seconds since the previous frame; by default
+            derived from the frame timestamps, or `sample_period`. As in
+            `update_batch`, the first timestamped frame only seeds the
+            clock when there is no `sample_period`: its step is 0.
+        out : numpy.ndarray
+            Optional array of 4 elements receiving the quaternion, to avoid
+            allocating one per frame.
+
+        Returns
+        -------
+        numpy.ndarray
+            The updated quaternion, `out` if given, else a new array.
+
+        """
+        timestamp = getattr(frame, 'timestamp', None)
+        if dt is None:
+            if timestamp is not None and self._timestamp is not None:
+                dt = timestamp - self._timestamp
+            elif self.sample_period is not None:
+                dt = self.sample_period
+            elif timestamp is not None:
+                dt = 0.0
+            else:
+                raise ValueError("Time step unknown; set sample_period.")
+        self._timestamp = timestamp
+
+        ax, ay, az, gx, gy, gz, mx, my, mz = \
+            [float(i) for i in getattr(frame, 'data', frame)[0:9]]
+        self._q = _madgwick(self._q, ax, ay, az,
+                            math.radians(gx), math.radians(gy),
+                            math.radians(gz), mx, my, mz, self.beta, dt)
+        if out is None:
+            return self.quaternion
+        out[:] = self._q
+        return out
+
+    def update_batch(self, frames, dt=None, timestamps=None, out=None):
+        """Update the orientation with a batch of buffered frames.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            A (N, 11) array of IMU frames, oldest first.
+        dt : float
+            The time step in seconds between frames; defaults to
+            `sample_period` when no timestamps are given.
+        timestamps : numpy.ndarray
+            Optional timestamps of the frames, e.g. from `IMUSampler`.
+        out : numpy.ndarray
+            Optional (N, 4) array receiving the quaternion after each frame.
+
+        Returns
+        -------
+        numpy.ndarray
+            The quaternion after each frame, as a (N, 4) array.
+
+        """
+        frames = np.asarray(frames)
+        count = len(frames)
+        if out is None:
+            out = np.empty((count, 4), dtype=np.float64)
+        if count == 0:
+            return out
+
+        if timestamps is not None:
+            steps = np.diff(np.asarray(timestamps, dtype=np.float64),
+                            prepend=np.nan)
+            if self._timestamp is not None:
+                steps[0] = timestamps[0] - self._timestamp
+            else:
+                steps[0] = dt if dt is not None else \
+                    (self.sample_period or 0.0)
+            steps = steps.tolist()
+            self._timestamp = float(timestamps[-1])
+        else:
+            if dt is None:
+                dt = self.sample_period
+            if dt is None:
+                raise ValueError("Time step unknown; set sample_period.")
+            steps = [dt] * count
+
+        gyro = np.radians(frames[:, 3:6].astype(np.float64))
+        values = np.concatenate((frames[:, 0:3], gyro, frames[:, 6:9]),
+                                axis=1).tolist()
+        q = self._q
+        beta = self.beta
+        for i, (ax, ay, az, gx, gy, gz, mx, my, mz) in enumerate(values):
+            q = _madgwick(q, ax, ay, az, gx, gy, gz, mx, my, mz,
+                          beta, steps[i])
+            out[i] = q
+        self._q = q
+        return out
@@ -0,0 +1,226 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import numpy as np
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+# Every function takes frames with the layout of `G_IMU.get_data`, as an
+# array whose last axis has 11 elements: a single frame of shape (11,) or a
+# batch of shape (N, 11). Results have the shape of the leading axes. Values
+# that cannot be computed (e.g. `asin` of an out-of-range accelerometer
+# reading) are NaN instead of raising.
+
+
+def heading(frames):
+    """Get the heading of each frame.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        IMU frames, with 11 values along the last axis.
+
+    Returns
+    -------
+    numpy.ndarray
+        The angle deviated from the X-axis, toward the positive Y-axis,
+        in degrees within [0, 360).
+
+    """
+    frames = np.asarray(frames)
+    result = np.degrees(np.arctan2(frames[..., 7], frames[..., 6]))
+    return np.where(result < 0, result + 360, result)
+
+
+def pitch_roll(frames):
+    """Get the pitch and roll of each frame from the accelerometer.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        IMU frames, with 11 values along the last axis.
+
+    Returns
+    -------
+    tuple
+        The pitch and roll arrays, in radians; NaN where the acceleration
+        is out of range.
+
+    """
+    frames = np.asarray(frames)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pitch = np.arcsin(-frames[..., 0])
+        roll = np.arcsin(frames[..., 1] / np.cos(pitch))
+    return pitch, roll
+
+
+def tilt_heading(frames):
+    """Get the tilt-compensated heading of each frame.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        IMU frames, with 11 values along the last axis.
+
+    Returns
+    -------
+    numpy.ndarray
+        The tilt heading in degrees; NaN where the acceleration is out of
+        range.
+
+    """
+    frames = np.asarray(frames)
+    pitch, roll = pitch_roll(frames)
+    mx, my, mz = frames[..., 6], frames[..., 7], frames[..., 8]
+    sin_pitch, cos_pitch = np.sin(pitch), np.cos(pitch)
+    sin_roll, cos_roll = np.sin(roll), np.cos(roll)
+
+    xh = mx * cos_pitch + mz * sin_pitch
+    yh = mx * sin_roll * sin_pitch + my * cos_roll - mz * sin_roll * cos_pitch
+    result = np.degrees(np.arctan2(yh, xh))
+    return np.where(yh < 0, result + 360, result)
+
+
+def atm(frames):
+    """Get the pressure of each frame in relative atmosphere.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        IMU frames, with 11 values along the last axis.
+
+    Returns
+    -------
+    numpy.ndarray
+        The related atmosphere.
+
+    """
+    return pressure_to_atm(np.asarray(frames)[..., 10])
+
+
+def altitude(frames):
+    """Get the altitude of each frame, as computed by `G_IMU`.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        IMU frames, with 11 values along the last axis.
+
+    Returns
+    -------
+    numpy.ndarray
+        The altitude value; NaN where the pressure is not positive.
+
+    """
+    return pressure_to_altitude(np.asarray(frames)[..., 10])
+
+
+def barometric_altitude(frames):
+    """Get the altitude of each frame, as computed by `Grove_multi`.
+
+    This is the international barometric formula from the BMP180 datasheet.
+
+    Parameters
+    ----------
+    frames : numpy.ndarray
+        IMU frames, with 11 values along the last axis.
+
+    Returns
+    -------
+    numpy.ndarray
+        The altitude in meters; NaN where the pressure is not positive.
+
+    """
+    return pressure_to_barometric_altitude(np.asarray(frames)[..., 10])
+
+
+def pressure_to_atm(pressure):
+    """Convert pressures to relative atmosphere.
+
+    Parameters
+    ----------
+    pressure : numpy.ndarray
+        Pressures in Pa.
+
+    Returns
+    -------
+    numpy.ndarray
+        The related atmosphere.
+
+    """
+    return np.asarray(pressure) / 101325
+
+
+def pressure_to_altitude(pressure):
+    """Convert pressures to altitudes, as computed by `G_IMU`.
+
+    Parameters
+    ----------
+    pressure : numpy.ndarray
+        Pressures in Pa.
+
+    Returns
+    -------
+    numpy.ndarray
+        The altitude value; NaN where the pressure is not positive.
+
+    """
+    pressure = np.asarray(pressure)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a = pressure / 1000
+        b = 1 / 5.25885
+        c = 288.15 - np.exp((np.log(a) + 18.2573) * b)
+    # log(0) would give the altitude of a vacuum, 44330 m, instead of NaN
+    return np.where(pressure > 0, (1 / 0.0065) * c, np.nan)
+
+
+def pressure_to_barometric_altitude(pressure):
+    """Convert pressures to altitudes, as computed by `Grove_multi`.
+
+    Parameters
+    ----------
+    pressure : numpy.ndarray
+        Pressures in Pa.
+
+    Returns
+    -------
+    numpy.ndarray
+        The altitude in meters; NaN where the pressure is not positive.
+
+    """
+    pressure = np.asarray(pressure)
+    with np.errstate(invalid='ignore'):
+        a = pressure / 101325
+        c = 1 - np.power(a, 1 / 5.255)
+    return np.where(pressure > 0, 44300 * c, np.nan)
@@ -0,0 +1,196 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import threading
+import time
+import numpy as np
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+class IMUSampler(object):
+    """This class samples a Grove IMU at a fixed rate in the background.
+
+    A dedicated thread reads `G_IMU` frames every `1 / rate` seconds and
+    stores them, with their `time.monotonic` timestamps, in a preallocated
+    ring buffer. Each sample is stored twice, `capacity` rows apart, so
+    that any window of up to `capacity` consecutive samples is a contiguous
+    slice: windows are returned as views, without copying.
+
+    Views stay valid until the sampler has taken `capacity` more samples;
+    copy them if they must be kept longer. While the sampler runs, the IMU
+    must not be used from another thread.
+
+    Attributes
+    ----------
+    imu : G_IMU
+        The IMU driver being sampled.
+    rate : float
+        The sampling rate in Hz.
+    capacity : int
+        The number of samples kept in the ring buffer.
+    count : int
+        The number of samples taken so far.
+    missed_deadlines : int
+        The number of sampling periods skipped because a read did not
+        complete in time.
+    overruns : int
+        The number of samples overwritten before `read_new` returned them.
+    error : Exception
+        The exception that stopped the sampling thread, if any.
+
+    """
+    def __init__(self, imu, rate, capacity=1024):
+        """Return a new sampler; call `start` to begin sampling.
+
+        Parameters
+        ----------
+        imu : G_IMU
+            The IMU driver to sample.
+        rate : float
+            The sampling rate in Hz.
+        capacity : int
+            The number of samples kept in the ring buffer.
+
+        """
+        if rate <= 0:
+            raise ValueError("Sampling rate must be positive.")
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive.")
+
+        self.imu = imu
+        self.rate = rate
+        self.capacity = capacity
+        self.count = 0
+        self.missed_deadlines = 0
+        self.overruns = 0
+        self.error = None
+        self._times = np.zeros(2 * capacity, dtype=np.float64)
+        self._frames = np.zeros((2 * capacity, 11), dtype=np.float32)
+        self._read = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """Start the sampling thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sampling thread and wait for it to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def window(self, num_samples):
+        """Return the most recent samples.
+
+        Parameters
+        ----------
+        num_samples : int
+            The number of samples, at most `capacity`.
+
+        Returns
+        -------
+        tuple
+            The timestamps and the (num_samples, 11) frames, as views into
+            the ring buffer; fewer rows are returned if fewer samples have
+            been taken.
+
+        """
+        if num_samples > self.capacity:
+            raise ValueError("Window larger than the sampler capacity.")
+        count = self.count
+        return self._slice(max(count - num_samples, 0), count)
+
+    def read_new(self):
+        """Return the samples taken since the previous call.
+
+        If more than `capacity` samples were taken in between, the oldest
+        ones are lost and counted in `overruns`.
+
+        Returns
+        -------
+        tuple
+            The timestamps and the frames, as views into the ring buffer.
+
+        """
+        count = self.count
+        start = self._read
+        if count - start > self.capacity:
+            self.overruns += count - start - self.capacity
+            start = count - self.capacity
+        self._read = count
+        return self._slice(start, count)
+
+    def _slice(self, start, stop):
+        if stop == start:
+            return self._times[0:0], self._frames[0:0]
+        end = (stop - 1) % self.capacity + 1 + self.capacity
+        begin = end - (stop - start)
+        return self._times[begin:end], self._frames[begin:end]
+
+    def _run(self):
+        period = 1 / self.rate
+        deadline = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                index = self.count % self.capacity
+                frame = self._frames[index]
+                self.imu.get_data(precision=None, out=frame)
+                self._times[index] = time.monotonic()
+                self._frames[index + self.capacity] = frame
+                self._times[index + self.capacity] = self._times[index]
+                self.count += 1
+
+                deadline += period
+                now = time.monotonic()
+                if now > deadline:
+                    skipped = int((now - deadline) / period) + 1
+                    self.missed_deadlines += skipped
+                    deadline += skipped * period
+                self._stop.wait(deadline - now)
+        except Exception as e:
+            self.error = e
@@ -0,0 +1,343 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+
+import weakref
+from .arduino_backend import base_microblaze
+from .arduino_backend import require_firmware
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+# An animation frame packs the 10-bit LED pattern with its duration in ms
+SEQUENCE_MAX_FRAMES = 64
+SEQUENCE_MAX_DURATION = ((1 << 22) - 1) / 1000
+
+_ledbar_states = weakref.WeakKeyDictionary()
+
+
+class _LEDbarState(object):
+    """Write-through cache of the LED bar driven by one Microblaze.
+
+    While `driven` is set the Microblaze changes the LED bar on its own, so
+    nothing is cached; `sticky` keeps it set across host writes.
+
+    """
+    __slots__ = ('last', 'leds', 'driven', 'sticky')
+
+    def __init__(self):
+        self.last = None
+        self.leds = None
+        self.driven = False
+        self.sticky = False
+
+
+def _state(microblaze):
+    key = base_microblaze(microblaze)
+    state = _ledbar_states.get(key)
+    if state is None:
+        state = _ledbar_states[key] = _LEDbarState()
+    return state
+
+
+def encode_brightness(data_in, brightness):
+    """Pack an LED pattern and per-LED brightness into mailbox words.
+
+    The brightness levels are one byte each and are packed four per word,
+    so the whole frame takes 4 words.
+
+    Parameters
+    ----------
+    data_in : int
+        10 LSBs of this parameter control the LEDbar.
+    brightness : list
+        The brightness of each of the 10 LEDs, from 0 to 0xFF.
+
+    Returns
+    -------
+    list
+        The pattern word followed by the 3 brightness words.
+
+    """
+    if len(brightness) != 10:
+        raise ValueError("Expected one brightness level per LED.")
+    words = [data_in & 0x3ff]
+    for i in range(0, 10, 4):
+        word = 0
+        for j, level in enumerate(brightness[i:i + 4]):
+            word |= (level & 0xff) << (8 * j)
+        words.append(word)
+    return words
+
+
+def encode_level(level, bright_level, green_to_red):
+    """Pack the arguments of a level command into one mailbox word.
+
+    Parameters
+    ----------
+    level : int
+        The number of LEDs lit, from 0 to 10.
+    bright_level : int
+        The brightness of all LEDs, from 0 to 3.
+    green_to_red : int
+        The direction of the sequence, 0 or 1.
+
+    Returns
+    -------
+    int
+        The level, brightness and direction in bits 0, 8 and 16.
+
+    """
+    return (level & 0xff) | ((bright_level & 0xff) << 8) | \
+        ((green_to_red & 0x1) << 16)
+
+
+def write_ledbar(microblaze, command, data=None, leds=None):
+    """Issue an LED bar command, unless it repeats the previous one.
+
+    The last LED bar command sent to each Microblaze is cached with its
+    data; sending the same command with the same data again would not
+    change what is lit, so the mailbox exchange is skipped. Nothing is
+    cached while the Microblaze drives the LED bar, see `release_ledbar`.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The LED bar command, e.g. `WRITE_LEDS`.
+    data : list
+        The words written to the mailbox before the command, if any.
+    leds : int
+        The 10-bit LED state resulting from the command, or None if it is
+        only known to the Microblaze.
+
+    Returns
+    -------
+    bool
+        True if the command was sent, False if it was skipped.
+
+    """
+    data = [] if data is None else list(data)
+    key = (command, tuple(data))
+    state = _state(microblaze)
+    if state.last == key:
+        return False
+    if data:
+        microblaze.write_mailbox(0, data)
+    microblaze.write_blocking_command(command)
+    if not state.sticky:
+        state.driven = False
+        state.last = key
+        state.leds = leds
+    return True
+
+
+def read_ledbar(microblaze, command=None, force=False):
+    """Return the LED bar state, from the cache when it is known.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The command reading the LED bar back, e.g. `READ_LEDS`, if the
+        program has one.
+    force : bool
+        Read the LED bar back from the Microblaze even if it is cached.
+
+    Returns
+    -------
+    int
+        The 10-bit LED state.
+
+    """
+    state = _state(microblaze)
+    if state.leds is not None and not force:
+        return state.leds
+    if command is None:
+        raise RuntimeError("LED bar state is unknown and cannot be read.")
+    microblaze.write_blocking_command(command)
+    leds = microblaze.read_mailbox(0)
+    if not state.driven:
+        state.leds = leds
+    return leds
+
+
+def play_ledbar(microblaze, command, patterns, durations, repeat=1):
+    """Upload an LED bar animation and have the Microblaze play it.
+
+    The whole sequence is sent in one mailbox write, one word per frame.
+    Playing a new sequence replaces the one running; any other LED bar
+    command cancels it.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The command starting the animation, e.g. `PLAY_SEQUENCE`.
+    patterns : list
+        The 10-bit LED pattern of each frame.
+    durations : float or list
+        The duration of each frame in seconds, or one for all frames.
+    repeat : int
+        The number of times the sequence is played, 0 to loop forever.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    RuntimeError
+        If the program on the IOP predates LED bar sequences.
+
+    """
+    require_firmware(microblaze, "LED bar sequences")
+    patterns = list(patterns)
+    if not 0 < len(patterns) <= SEQUENCE_MAX_FRAMES:
+        raise ValueError("Number of frames can only be 1 - {}.".format(
+            SEQUENCE_MAX_FRAMES))
+    if isinstance(durations, (int, float)):
+        durations = [durations] * len(patterns)
+    if len(durations) != len(patterns):
+        raise ValueError("Expected one duration per frame.")
+    if repeat < 0:
+        raise ValueError("Repeat count cannot be negative.")
+
+    frames = []
+    for pattern, duration in zip(patterns, durations):
+        if not 0.001 <= duration <= SEQUENCE_MAX_DURATION:
+            raise ValueError("Frame duration can only be 1 ms - {} s.".format(
+                SEQUENCE_MAX_DURATION))
+        frames.append((pattern & 0x3ff) | (int(round(duration * 1000)) << 10))
+    microblaze.write_mailbox(0, [len(frames), repeat] + frames)
+    microblaze.write_blocking_command(command)
+    release_ledbar(microblaze)
+
+
+def stop_ledbar(microblaze, command):
+    """Stop the LED bar animation, leaving its current frame lit.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    command : int
+        The command stopping the animation, e.g. `STOP_SEQUENCE`.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    RuntimeError
+        If the program on the IOP predates LED bar sequences.
+
+    """
+    require_firmware(microblaze, "LED bar sequences")
+    microblaze.write_blocking_command(command)
+    state = _state(microblaze)
+    state.driven = state.sticky
+    invalidate_ledbar(microblaze)
+
+
+def release_ledbar(microblaze, until_write=True):
+    """Hand the LED bar over to the Microblaze.
+
+    Call this when the Microblaze starts changing the LED bar on its own,
+    e.g. to play an animation. Until the host takes the LED bar back, its
+    state is always read from the Microblaze and writes are never skipped.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+    until_write : bool
+        Whether the next host write takes the LED bar back, as it cancels
+        what the Microblaze was doing; if False, only `reclaim_ledbar` does.
+
+    Returns
+    -------
+    None
+
+    """
+    state = _state(microblaze)
+    state.driven = True
+    if not until_write:
+        state.sticky = True
+    invalidate_ledbar(microblaze)
+
+
+def reclaim_ledbar(microblaze):
+    """Tell that the Microblaze stopped driving the LED bar on its own.
+
+    This ends `release_ledbar(until_write=False)`; the LED bar state is
+    still read from the Microblaze until the host writes it.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+
+    Returns
+    -------
+    None
+
+    """
+    _state(microblaze).sticky = False
+    invalidate_ledbar(microblaze)
+
+
+def invalidate_ledbar(microblaze):
+    """Forget the cached LED bar state.
+
+    Call this when the Microblaze changes the LED bar on its own, so the
+    next write is always sent.
+
+    Parameters
+    ----------
+    microblaze : Arduino
+        Microblaze processor instance.
+
+    Returns
+    -------
+    None
+
+    """
+    state = _state(microblaze)
+    state.last = None
+    state.leds = None
@@ -0,0 +1,239 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+
+import math
+import numpy as np
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+class Pedometer(object):
+    """This class counts steps in a stream of IMU frames.
+
+    The magnitude of the acceleration is band-pass filtered: a one-pole
+    high-pass removes gravity and a one-pole low-pass removes jitter. A step
+    is detected at each peak of the filtered signal above `threshold`; the
+    signal has to fall back below zero before the next peak is accepted,
+    and peaks closer than `min_interval` to the previous step are ignored.
+    The state is a handful of scalars, so each sample costs O(1) and the
+    memory used does not grow with the stream.
+
+    Cadence statistics are accumulated over consecutive windows of
+    `window` seconds; `stats` holds those of the last complete window.
+
+    Attributes
+    ----------
+    rate : float
+        The nominal sampling rate in Hz.
+    threshold : float
+        The minimum filtered acceleration of a step peak, in g.
+    min_interval : float
+        The minimum time between two steps, in seconds.
+    window : float
+        The length of the cadence statistics windows, in seconds.
+    on_step : function
+        Optional function called with the timestamp of each step.
+    steps : int
+        The number of steps counted so far.
+    stats : dict
+        Cadence statistics of the last complete window, or None.
+
+    """
+    def __init__(self, rate, threshold=0.1, min_interval=0.25, window=10.0,
+                 lowpass=3.0, highpass=0.5, on_step=None):
+        """Return a new pedometer.
+
+        Parameters
+        ----------
+        rate : float
+            The nominal sampling rate in Hz; used for the filter
+            coefficients and for frames without timestamps.
+        threshold : float
+            The minimum filtered acceleration of a step peak, in g.
+        min_interval : float
+            The minimum time between two steps, in seconds.
+        window : float
+            The length of the cadence statistics windows, in seconds.
+        lowpass : float
+            The cut-off frequency of the low-pass filter, in Hz.
+        highpass : float
+            The cut-off frequency of the high-pass filter, in Hz.
+        on_step : function
+            Optional function called with the timestamp of each step.
+
+        """
+        if rate <= 0:
+            raise ValueError("Sampling rate must be positive.")
+        self.rate = rate
+        self.threshold = threshold
+        self.min_interval = min_interval
+        self.window = window
+        self.on_step = on_step
+        self._lowpass = 1 - math.exp(-2 * math.pi * lowpass / rate)
+        self._highpass = 1 - math.exp(-2 * math.pi * highpass / rate)
+        self.reset()
+
+    def reset(self):
+        """Reset the step count, the filters and the statistics."""
+        self.steps = 0
+        self.stats = None
+        self._count = 0
+        self._baseline = None
+        self._value = 0.0
+        self._peak_value = None
+        self._peak_time = 0.0
+        self._last_step = None
+        self._window_start = None
+        self._window_steps = 0
+        self._intervals = 0
+        self._interval_sum = 0.0
+        self._interval_squares = 0.0
+
+    def update(self, frame, timestamp=None):
+        """Process one frame.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray or list or IMUFrame
+            One IMU frame.
+        timestamp : float
+            The time of the frame in seconds; by default the timestamp of
+            an `IMUFrame`, or the sample count divided by `rate`.
+
+        Returns
+        -------
+        float
+            The timestamp of the step detected by this frame, or None.
+
+        """
+        if timestamp is None:
+            timestamp = getattr(frame, 'timestamp', None)
+        if timestamp is None:
+            timestamp = self._count / self.rate
+        self._count += 1
+
+        data = getattr(frame, 'data', frame)
+        ax, ay, az = float(data[0]), float(data[1]), float(data[2])
+        return self._sample(math.sqrt(ax * ax + ay * ay + az * az),
+                            timestamp)
+
+    def update_batch(self, frames, timestamps=None):
+        """Process a batch of buffered frames.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            A (N, 11) array of IMU frames, oldest first.
+        timestamps : numpy.ndarray
+            Optional timestamps of the frames, e.g. from `IMUSampler`.
+
+        Returns
+        -------
+        list
+            The timestamps of the steps detected in the batch.
+
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        count = len(frames)
+        if timestamps is None:
+            timestamps = (self._count + np.arange(count)) / self.rate
+        self._count += count
+
+        magnitudes = np.sqrt(np.sum(frames[:, 0:3] ** 2, axis=1))
+        steps = []
+        for magnitude, timestamp in zip(
+                magnitudes.tolist(),
+                np.asarray(timestamps, dtype=np.float64).tolist()):
+            step = self._sample(magnitude, timestamp)
+            if step is not None:
+                steps.append(step)
+        return steps
+
+    def _sample(self, magnitude, timestamp):
+        if self._baseline is None:
+            self._baseline = magnitude
+        self._baseline += self._highpass * (magnitude - self._baseline)
+        self._value += self._lowpass * \
+            (magnitude - self._baseline - self._value)
+        value = self._value
+
+        if self._window_start is None:
+            self._window_start = timestamp
+        elif timestamp - self._window_start >= self.window:
+            self._close_window(timestamp)
+
+        if value > self.threshold:
+            if self._peak_value is None or value > self._peak_value:
+                self._peak_value = value
+                self._peak_time = timestamp
+        elif value < 0 and self._peak_value is not None:
+            self._peak_value = None
+            if self._last_step is None or \
+                    self._peak_time - self._last_step >= self.min_interval:
+                return self._step(self._peak_time)
+        return None
+
+    def _step(self, timestamp):
+        if self._last_step is not None:
+            interval = timestamp - self._last_step
+            self._intervals += 1
+            self._interval_sum += interval
+            self._interval_squares += interval * interval
+        self._last_step = timestamp
+        self.steps += 1
+        self._window_steps += 1
+        if self.on_step is not None:
+            self.on_step(timestamp)
+        return timestamp
+
+    def _close_window(self, timestamp):
+        num = self._intervals
+        mean = std = None
+        if num:
+            mean = self._interval_sum / num
+            std = math.sqrt(max(self._interval_squares / num - mean * mean,
+                                0.0))
+        self.stats = {'start': self._window_start,
+                      'steps': self._window_steps,
+                      'cadence': 60 * self._window_steps / self.window,
+                      'mean_interval': mean,
+                      'std_interval': std}
+
+        elapsed = timestamp - self._window_start
+        self._window_start += self.window * math.floor(elapsed / self.window)
+        self._window_steps = 0
+        self._intervals = 0
+        self._interval_sum = 0.0
+        self._interval_squares = 0.0
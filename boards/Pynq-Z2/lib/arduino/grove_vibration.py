@@ -0,0 +1,201 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+ROAD_CONDITIONS = ("smooth", "bumpy", "rough")
+
+
+class VibrationMonitor(object):
+    """This class extracts vibration features from a stream of IMU frames.
+
+    The magnitude of the acceleration is cut into windows of `window`
+    samples, a new window starting every `hop` samples, so consecutive
+    windows overlap by `window - hop` samples. For each window it computes
+    the RMS and peak-to-peak of the vibration (the acceleration minus its
+    mean over the window) and the energy of the vibration in each
+    frequency band, from the Hann-windowed FFT of the window. All windows
+    completed by a batch of frames are processed at once, as a matrix.
+
+    Each window is classified into one of `ROAD_CONDITIONS` by comparing
+    its RMS to `thresholds`.
+
+    Attributes
+    ----------
+    rate : float
+        The nominal sampling rate in Hz.
+    window : int
+        The number of samples in a window.
+    hop : int
+        The number of samples between the starts of two windows.
+    bands : list
+        The (low, high) frequency bands in Hz.
+    thresholds : list
+        The increasing RMS values, in g, separating the road conditions.
+    condition : str
+        The road condition of the most recent window, or None.
+
+    """
+    def __init__(self, rate, window=128, hop=32,
+                 bands=((0.5, 5), (5, 15), (15, 50)), thresholds=(0.05, 0.2)):
+        """Return a new vibration monitor.
+
+        Parameters
+        ----------
+        rate : float
+            The nominal sampling rate in Hz.
+        window : int
+            The number of samples in a window.
+        hop : int
+            The number of samples between the starts of two windows; the
+            features are updated every `hop / rate` seconds.
+        bands : list
+            The (low, high) frequency bands in Hz.
+        thresholds : list
+            The increasing RMS values, in g, separating the road
+            conditions; one fewer than `ROAD_CONDITIONS`.
+
+        """
+        if rate <= 0:
+            raise ValueError("Sampling rate must be positive.")
+        if not 0 < hop <= window:
+            raise ValueError("Hop must be between 1 and the window size.")
+        if len(thresholds) != len(ROAD_CONDITIONS) - 1:
+            raise ValueError("Expected {} thresholds.".format(
+                len(ROAD_CONDITIONS) - 1))
+
+        self.rate = rate
+        self.window = window
+        self.hop = hop
+        self.bands = [tuple(band) for band in bands]
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+
+        self._taper = np.hanning(window)
+        frequencies = np.fft.rfftfreq(window, 1 / rate)
+        self._band_matrix = np.array(
+            [(frequencies >= low) & (frequencies < high)
+             for low, high in self.bands], dtype=np.float64).T
+        # Power spectral density scaling, including the one-sided doubling
+        self._psd_scale = np.full(len(frequencies),
+                                  2 / (rate * np.sum(self._taper ** 2)))
+        self._psd_scale[0] /= 2
+        if window % 2 == 0:
+            self._psd_scale[-1] /= 2
+        self._df = rate / window
+        self.reset()
+
+    def reset(self):
+        """Discard the buffered samples."""
+        self.condition = None
+        self._count = 0
+        self._samples = np.zeros(0, dtype=np.float64)
+        self._times = np.zeros(0, dtype=np.float64)
+
+    def update(self, frames, timestamps=None):
+        """Process a batch of frames.
+
+        Parameters
+        ----------
+        frames : numpy.ndarray
+            A (N, 11) array of IMU frames, oldest first.
+        timestamps : numpy.ndarray
+            Optional timestamps of the frames, e.g. from `IMUSampler`; by
+            default the sample count divided by `rate`.
+
+        Returns
+        -------
+        dict
+            The features of the windows completed by this batch, one row
+            per window: `time` (timestamp of the last sample), `rms` and
+            `peak_to_peak` (in g), `band_energy` (in g^2, one column per
+            band) and `condition` (an index into `ROAD_CONDITIONS`).
+
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        count = len(frames)
+        if timestamps is None:
+            timestamps = (self._count + np.arange(count)) / self.rate
+        self._count += count
+
+        magnitudes = np.sqrt(np.sum(frames[:, 0:3] ** 2, axis=1))
+        samples = np.concatenate((self._samples, magnitudes))
+        times = np.concatenate((self._times,
+                                np.asarray(timestamps, dtype=np.float64)))
+
+        num_windows = 0
+        if len(samples) >= self.window:
+            num_windows = (len(samples) - self.window) // self.hop + 1
+        stride = samples.strides[0]
+        windows = as_strided(samples, shape=(num_windows, self.window),
+                             strides=(self.hop * stride, stride),
+                             writeable=False)
+        features = self.features(windows)
+        features['time'] = times[self.window - 1 +
+                                 self.hop * np.arange(num_windows)]
+
+        consumed = num_windows * self.hop
+        self._samples = samples[consumed:].copy()
+        self._times = times[consumed:].copy()
+        if num_windows:
+            self.condition = ROAD_CONDITIONS[features['condition'][-1]]
+        return features
+
+    def features(self, windows):
+        """Compute the features of windows of acceleration magnitudes.
+
+        Parameters
+        ----------
+        windows : numpy.ndarray
+            A (K, window) array of acceleration magnitudes, in g.
+
+        Returns
+        -------
+        dict
+            The `rms`, `peak_to_peak`, `band_energy` and `condition` of
+            each window, as returned by `update`.
+
+        """
+        vibration = windows - np.mean(windows, axis=1, keepdims=True)
+        rms = np.sqrt(np.mean(vibration ** 2, axis=1))
+        spectrum = np.fft.rfft(vibration * self._taper, axis=1)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * self._psd_scale
+        return {'rms': rms,
+                'peak_to_peak': np.ptp(windows, axis=1),
+                'band_energy': np.dot(psd, self._band_matrix) * self._df,
+                'condition': np.searchsorted(self.thresholds, rms)}
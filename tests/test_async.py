@@ -0,0 +1,135 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import time
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import Grove_autoalarm
+from pynq.lib.arduino import Grove_gesgame
+from pynq.lib.arduino import Grove_multi
+from pynq.lib.arduino import Grove_pcounter
+from pynq.lib.arduino import Grove_psensor
+from pynq.lib.arduino import Grove_usranger
+from pynq.lib.arduino.arduino_backend import Transaction
+from pynq.lib.arduino.arduino_backend import mailbox_lock
+from pynq.lib.arduino.arduino_backend import write_async_command
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_reads_match_blocking_reads(sim):
+    info = sim(sensors={'distance': 42.0, 'gesture': 3, 'pir': 1})
+    imu = G_IMU(info, ARDUINO_GROVE_I2C)
+    assert run(imu.get_data_async()) == imu.get_data()
+    ranger = Grove_usranger(info)
+    assert run(ranger.get_distance_async()) == ranger.get_distance()
+    alarm = Grove_autoalarm(info)
+    assert run(alarm.get_distance_async()) == alarm.get_distance()
+    gesgame = Grove_gesgame(info)
+    assert run(gesgame.get_gesture_async()) == gesgame.get_gesture()
+    pcounter = Grove_pcounter(info)
+    assert run(pcounter.read_pir_async()) == pcounter.read_pir() == 1
+    psensor = Grove_psensor(info)
+    assert run(psensor.read_pir_async()) == psensor.read_pir() == 1
+
+
+def test_multisensor_reads(sim):
+    multi = Grove_multi(sim(sensors={'dht': (21.5, 40.0), 'light': 2.5}))
+    assert run(multi.get_imu_data_async()) == multi.get_imu_data()
+    assert run(multi.get_dht_data_async()) == [21.5, 40.0]
+    assert run(multi.get_al_data_async()) == multi.get_al_data()
+    assert run(multi.get_all_data_async()) == multi.get_all_data()
+
+
+def test_command_does_not_block_loop(sim):
+    psensor = Grove_psensor(sim(latency=0.2))
+    ticks = []
+    done = []
+
+    async def tick():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.005)
+
+    async def read():
+        await psensor.read_pir_async()
+        done.append(time.monotonic())
+
+    async def main():
+        await asyncio.gather(read(), tick())
+
+    run(main())
+    assert len(ticks) == 5 and ticks[-1] < done[0]
+
+
+def test_exchanges_are_serialized(sim):
+    multi = Grove_multi(sim(sensors={'dht': (21.5, 40.0), 'light': 2.5},
+                            latency=0.005))
+
+    async def main():
+        return await asyncio.gather(
+            *[coro for _ in range(3) for coro in (
+                multi.get_dht_data_async(), multi.get_al_data_async())])
+
+    results = run(main())
+    assert results[0::2] == [[21.5, 40.0]] * 3
+    assert results[1::2] == [multi.get_al_data()] * 3
+
+
+def test_execute_async(sim):
+    multi = Grove_multi(sim(sensors={'light': 2.5}))
+    transaction = Transaction(multi.microblaze).add(0x7, 1)
+    assert run(transaction.execute_async()) == transaction.execute()
+
+
+def test_mailbox_lock_is_per_microblaze(sim):
+    first = Grove_psensor(sim()).microblaze
+    second = Grove_psensor(sim()).microblaze
+    assert mailbox_lock(first) is mailbox_lock(first)
+    assert mailbox_lock(first) is not mailbox_lock(second)
+
+
+def test_write_async_command(sim):
+    psensor = Grove_psensor(sim(latency=0.02))
+    psensor.microblaze.write_mailbox(0, 1)
+    start = time.monotonic()
+    run(write_async_command(psensor.microblaze, 0x5))
+    assert time.monotonic() - start >= 0.02
+    assert psensor.microblaze.outputs['relay'] == 1
@@ -0,0 +1,96 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import Arduino_Sim
+from pynq.lib.arduino import Arduino_Stats
+from pynq.lib.arduino import Grove_psensor
+from pynq.lib.arduino import clear_program_cache
+from pynq.lib.arduino.arduino_backend import base_microblaze
+from pynq.lib.arduino.arduino_backend import mailbox_lock
+from pynq.lib.arduino.arduino_backend import open_microblaze
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+PROGRAM = "arduino_grove_pcounter.bin"
+
+
+def test_program_is_reused(sim):
+    info = sim()
+    microblaze = open_microblaze(info, PROGRAM)
+    assert isinstance(microblaze, Arduino_Sim)
+    assert open_microblaze(info, PROGRAM) is microblaze
+    assert open_microblaze(info, PROGRAM, force=True) is not microblaze
+
+
+def test_cache_can_be_cleared(sim):
+    info = sim()
+    microblaze = open_microblaze(info, PROGRAM)
+    clear_program_cache()
+    assert open_microblaze(info, PROGRAM) is not microblaze
+
+
+def test_stopped_program_is_reloaded(sim):
+    info = sim()
+    microblaze = open_microblaze(info, PROGRAM)
+    microblaze.reset()
+    reloaded = open_microblaze(info, PROGRAM)
+    assert reloaded is not microblaze and reloaded.state == 'RUNNING'
+
+
+def test_other_program_is_loaded(sim):
+    info = sim()
+    microblaze = open_microblaze(info, PROGRAM)
+    other = open_microblaze(info, "arduino_grove_psensor.bin")
+    assert other is not microblaze
+    assert open_microblaze(info, PROGRAM) is not microblaze
+
+
+def test_switch_is_configured_once(sim):
+    info = sim()
+    microblaze = Grove_psensor(info).microblaze
+    microblaze.firmware.configured = False
+    assert Grove_psensor(info).microblaze is microblaze
+    assert not microblaze.firmware.configured
+
+    Grove_psensor(info, relay_pin=arduino.ARDUINO_GROVE_G6)
+    assert microblaze.firmware.configured
+
+
+def test_base_microblaze(sim):
+    microblaze = open_microblaze(sim(), PROGRAM)
+    wrapped = Arduino_Stats(Arduino_Stats(microblaze))
+    assert base_microblaze(wrapped) is microblaze
+    assert mailbox_lock(wrapped) is mailbox_lock(microblaze)
@@ -0,0 +1,126 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import IMUCalibration
+from pynq.lib.arduino import grove_imu_calibration
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+# Symmetric distortions, recovered exactly by the fit
+ACCEL_DISTORTION = np.array([[1.05, 0.02, 0.00],
+                             [0.02, 0.95, 0.01],
+                             [0.00, 0.01, 1.10]])
+ACCEL_BIAS = np.array([0.05, -0.03, 0.02])
+MAG_DISTORTION = np.array([[40.0, 3.0, 1.0],
+                           [3.0, 30.0, 2.0],
+                           [1.0, 2.0, 35.0]])
+MAG_BIAS = np.array([12.0, -7.0, 20.0])
+GYRO_BIAS = np.array([0.5, -1.0, 0.25])
+
+
+def sweep(count=500, seed=0):
+    rng = np.random.RandomState(seed)
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1, keepdims=True)
+    frames = np.zeros((count, 11))
+    frames[:, 0:3] = directions.dot(ACCEL_DISTORTION.T) + ACCEL_BIAS
+    frames[:, 3:6] = GYRO_BIAS
+    frames[:, 6:9] = directions.dot(MAG_DISTORTION.T) + MAG_BIAS
+    return frames
+
+
+def test_fit_ellipsoid():
+    frames = sweep()
+    calibration = IMUCalibration.fit(frames, stationary=frames[:50],
+                                     device='imu0')
+    assert calibration.device == 'imu0'
+    assert np.allclose(calibration.accel_bias, ACCEL_BIAS, atol=1e-6)
+    assert np.allclose(calibration.accel_matrix,
+                       np.linalg.inv(ACCEL_DISTORTION), atol=1e-6)
+    assert np.allclose(calibration.mag_bias, MAG_BIAS, atol=1e-4)
+    assert np.allclose(calibration.gyro_bias, GYRO_BIAS)
+
+    corrected = calibration.apply(frames)
+    assert np.allclose(np.linalg.norm(corrected[:, 0:3], axis=1), 1,
+                       atol=1e-4)
+    radius = np.linalg.norm(corrected[:, 6:9], axis=1)
+    assert np.allclose(radius, radius.mean(), rtol=1e-4)
+    assert np.allclose(corrected[:, 3:6], 0, atol=1e-5)
+
+
+def test_fit_needs_enough_frames():
+    with pytest.raises(ValueError):
+        IMUCalibration.fit(sweep(8))
+    flat = sweep()
+    flat[:, 2] = flat[:, 8] = 0
+    with pytest.raises(ValueError):
+        IMUCalibration.fit(flat)
+
+
+def test_save_load(tmp_path):
+    calibration = IMUCalibration.fit(sweep(), device='imu0')
+    path = calibration.save(str(tmp_path / 'imu.json'))
+    loaded = IMUCalibration.load(path)
+    assert loaded.to_dict() == calibration.to_dict()
+
+
+def test_save_load_by_device(tmp_path, monkeypatch):
+    monkeypatch.setattr(grove_imu_calibration, 'CALIBRATION_DIR',
+                        str(tmp_path / 'imu_calibration'))
+    calibration = IMUCalibration(mag_bias=MAG_BIAS, device='imu0')
+    path = calibration.save()
+    assert path == str(tmp_path / 'imu_calibration' / 'imu0.json')
+    assert IMUCalibration.load('imu0').to_dict() == calibration.to_dict()
+    with pytest.raises(ValueError):
+        IMUCalibration().save()
+
+
+def test_imu_applies_calibration(sim, tmp_path):
+    frame = (1000, -2000, 16384, 300, 0, -300, 4096, 4096, 0, 25, 90000)
+    raw = G_IMU(sim(sensors={'imu': frame}), ARDUINO_GROVE_I2C)
+    expected = raw.get_data(precision=None)
+    calibration = IMUCalibration(accel_bias=ACCEL_BIAS, gyro_bias=GYRO_BIAS,
+                                 mag_matrix=np.diag([2, 1, 1]),
+                                 mag_bias=MAG_BIAS)
+    expected = calibration.apply(expected)
+
+    path = calibration.save(str(tmp_path / 'imu.json'))
+    imu = G_IMU(sim(sensors={'imu': frame}), ARDUINO_GROVE_I2C,
+                calibration=path)
+    assert np.allclose(imu.get_data(precision=None), expected, rtol=1e-5)
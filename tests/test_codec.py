@@ -0,0 +1,180 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import Grove_multi
+from pynq.lib.arduino.grove_codec import IMUDecoder
+from pynq.lib.arduino.grove_codec import IMU_SCALE
+from pynq.lib.arduino.grove_codec import decode_floats
+from pynq.lib.arduino.grove_codec import encode_imu_config
+from pynq.lib.arduino.grove_codec import imu_scale
+from pynq.lib.arduino.grove_codec import present
+from pynq.lib.arduino.grove_codec import reg2float
+from pynq.lib.arduino.grove_codec import reg2int
+from pynq.lib.arduino.grove_codec import to_list
+from pynq.lib.arduino.grove_imu_calibration import IMUCalibration
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def registers(values):
+    return np.asarray(values, dtype=np.float32).view(np.uint32)
+
+
+FRAME = (0, 0, 16384, 16384, -16384, 0, 100, 0, -200, 25, 101325)
+RAW_FRAME = registers(FRAME)
+
+
+def test_reg2float_keeps_shape():
+    values = np.arange(22, dtype=np.float32).reshape(2, 11) - 5.5
+    assert np.array_equal(reg2float(registers(values)), values)
+
+
+def test_reg2float_implicit_one():
+    assert reg2float(0x3fc00000) == 1.5
+    assert reg2float(0xbf800000) == -1.0
+
+
+def test_reg2int_is_signed():
+    assert reg2int(0xffffffff) == -1
+    assert list(reg2int([0x7fffffff, 0x80000000])) == [2 ** 31 - 1, -2 ** 31]
+
+
+def test_decode_floats():
+    values = decode_floats(RAW_FRAME, IMU_SCALE)
+    assert values.dtype == np.float32
+    assert values[2] == 1.0
+    assert values[3] == 125.0 and values[4] == -125.0
+    assert values[6] == pytest.approx(100 * 1200 / 4096)
+    assert values[10] == 101325
+
+
+def test_decode_floats_batch():
+    out = np.empty((2, 11), dtype=np.float32)
+    result = decode_floats(np.stack([RAW_FRAME, RAW_FRAME]), IMU_SCALE, out)
+    assert result is out
+    assert np.array_equal(out[1], decode_floats(RAW_FRAME, IMU_SCALE))
+
+
+def test_to_list():
+    values = np.array([1.004, 2.006], dtype=np.float32)
+    assert to_list(values) == [1.0, 2.01]
+    assert all(type(v) is float for v in to_list(values))
+
+
+def test_imu_scale():
+    scale = imu_scale(16, 2000)
+    assert scale.dtype == np.float32
+    assert scale[0] == 16 / 32768 and scale[3] == 2000 / 32768
+    assert np.array_equal(imu_scale(), IMU_SCALE)
+
+
+def test_encode_imu_config():
+    assert encode_imu_config() == [0, 0, 0, 1]
+    assert encode_imu_config(16, 2000, 100, 41) == [3, 3, 9, 3]
+    assert encode_imu_config(rate=1000 / 256) == [0, 0, 255, 1]
+    for kwargs in ({'accel_range': 3}, {'gyro_range': 300},
+                   {'bandwidth': 100}, {'rate': 2000}, {'rate': 0}):
+        with pytest.raises(ValueError):
+            encode_imu_config(**kwargs)
+
+
+def test_encode_imu_config_unfiltered():
+    assert encode_imu_config(bandwidth=250) == [0, 0, 0, 0]
+    assert encode_imu_config(rate=8000, bandwidth=250) == [0, 0, 0, 0]
+    with pytest.raises(ValueError):
+        encode_imu_config(rate=1000, bandwidth=250)
+
+
+def test_decoder_without_calibration():
+    decoder = IMUDecoder()
+    assert np.array_equal(decoder.decode(RAW_FRAME),
+                          decode_floats(RAW_FRAME, IMU_SCALE))
+
+
+def test_decoder_with_calibration():
+    calibration = IMUCalibration(accel_bias=[0.1, 0, 0],
+                                 gyro_bias=[1, 2, 3],
+                                 mag_matrix=np.diag([2, 1, 1]))
+    decoder = IMUDecoder(calibration=calibration)
+    expected = calibration.apply(decode_floats(RAW_FRAME, IMU_SCALE))
+    assert np.allclose(decoder.decode(RAW_FRAME), expected, rtol=1e-5)
+
+    batch = decoder.decode(np.stack([RAW_FRAME, RAW_FRAME]))
+    assert np.allclose(batch[1], expected, rtol=1e-5)
+
+    decoder.calibration = None
+    assert np.array_equal(decoder.decode(RAW_FRAME),
+                          decode_floats(RAW_FRAME, IMU_SCALE))
+
+
+def test_imu_decode(sim):
+    imu = G_IMU(sim(sensors={'imu': FRAME}), ARDUINO_GROVE_I2C)
+    assert imu.get_data() == to_list(decode_floats(RAW_FRAME, IMU_SCALE))
+
+
+def test_light_sensor_between_one_and_two_volts(sim):
+    multi = Grove_multi(sim(sensors={'light': 1.5}))
+    assert multi.get_al_data() == round(1.5 * 350 / 3.3, 2)
+
+
+def test_present():
+    values = np.array([1.004, 2.006], dtype=np.float32)
+    assert present(values) == [1.0, 2.01]
+    assert present(values, 1) == [1.0, 2.0]
+    assert present(values, None) is values
+
+
+def test_raw_imu_data(sim):
+    imu = G_IMU(sim(sensors={'imu': FRAME}), ARDUINO_GROVE_I2C)
+    out = np.empty(11, dtype=np.float32)
+    data = imu.get_data(precision=None, out=out)
+    assert data is out
+    assert np.array_equal(data, decode_floats(RAW_FRAME, IMU_SCALE))
+    assert imu.get_data(precision=4) == to_list(data, 4)
+
+
+def test_raw_multisensor_data(sim):
+    multi = Grove_multi(sim(sensors={'dht': (21.25, 40.125),
+                                     'light': 1.2345}))
+    dht = multi.get_dht_data(precision=None)
+    assert dht.dtype == np.float32 and list(dht) == [21.25, 40.125]
+    assert multi.get_dht_data() == [21.25, 40.12]
+    light = multi.get_al_data(precision=None)
+    assert light == np.float32(1.2345) * np.float32(350 / 3.3)
+    imu, dht, light = multi.get_all_data(precision=None)
+    assert isinstance(imu, np.ndarray) and isinstance(dht, np.ndarray)
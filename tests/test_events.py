@@ -0,0 +1,261 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import time
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import Grove_autoalarm
+from pynq.lib.arduino import Grove_pcounter
+from pynq.lib.arduino import Grove_psensor
+from pynq.lib.arduino.arduino_grove_autoalarm import MAX_EVENTS
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def steps(*edges):
+    """Return a sensor model stepping to `value` at each `(t, value)`."""
+    def model(t):
+        value = 0
+        for start, level in edges:
+            if t >= start:
+                value = level
+        return value
+    return model
+
+
+def test_read_events(sim):
+    alarm = Grove_autoalarm(sim(sensors={
+        'distance': steps((0, 15), (0.05, 55))}))
+    alarm.start_events(period=0.005)
+    time.sleep(0.1)
+    events = alarm.read_events()
+    assert [band for _, band, _ in events] == [1, 5]
+    assert [distance for _, _, distance in events] == \
+        pytest.approx([15, 55])
+    assert events[0][0] < events[1][0]
+    assert events[1][0] == pytest.approx(0.05, abs=0.01)
+    assert alarm.band == 5
+    assert alarm.microblaze.outputs['ledbar'] == 0b11111
+    assert alarm.read_events() == []
+
+
+def test_events_hysteresis(sim):
+    alarm = Grove_autoalarm(sim(sensors={
+        'distance': steps((0, 15), (0.02, 21), (0.04, 23), (0.06, 19))}))
+    alarm.start_events(period=0.005, hysteresis=2)
+    time.sleep(0.08)
+    assert [band for _, band, _ in alarm.read_events()] == [1, 2]
+
+
+def test_events_dropped(sim):
+    alarm = Grove_autoalarm(sim(sensors={
+        'distance': lambda t: 15 + 10 * (int(t * 1000) % 2)}))
+    alarm.start_events(period=0.001, hysteresis=0)
+    time.sleep(0.1)
+    assert len(alarm.read_events()) == 64
+    assert alarm.events_dropped > 0
+
+
+def test_stop_events(sim):
+    alarm = Grove_autoalarm(sim(sensors={
+        'distance': steps((0, 15), (0.03, 55))}))
+    alarm.start_events(period=0.005)
+    alarm.stop_events()
+    time.sleep(0.05)
+    assert alarm.read_events() == []
+
+
+def test_wait_events(sim):
+    alarm = Grove_autoalarm(sim(sensors={
+        'distance': steps((0, 15), (0.05, 55))}))
+    alarm.start_events(period=0.005)
+    events = asyncio.run(asyncio.wait_for(alarm.wait_events(), 1))
+    assert events[0][1] == 1
+    events = asyncio.run(asyncio.wait_for(alarm.wait_events(), 1))
+    assert [band for _, band, _ in events] == [5]
+
+
+def test_events_on_stock_program(sim):
+    alarm = Grove_autoalarm(sim(firmware_version=0))
+    for method in (alarm.start_events, alarm.stop_events, alarm.read_events):
+        with pytest.raises(RuntimeError):
+            method()
+    with pytest.raises(RuntimeError):
+        asyncio.run(alarm.wait_events())
+
+
+def test_event_count_out_of_range(sim):
+    alarm = Grove_autoalarm(sim())
+    alarm.microblaze.write_mailbox(0, [MAX_EVENTS + 1, 0])
+    with pytest.raises(RuntimeError):
+        alarm._events()
+
+
+@pytest.mark.parametrize('thresholds', [[], list(range(16)), [20, 10]])
+def test_start_events_invalid(sim, thresholds):
+    alarm = Grove_autoalarm(sim())
+    with pytest.raises(ValueError):
+        alarm.start_events(thresholds)
+
+
+def test_count(sim):
+    pcounter = Grove_pcounter(sim(sensors={
+        'pir': steps((0.01, 1), (0.02, 0), (0.03, 1), (0.04, 0),
+                     (0.05, 1), (0.052, 0))}))
+    pcounter.start_counting(debounce=0.005)
+    time.sleep(0.08)
+    assert pcounter.get_count() == 2
+    assert pcounter.microblaze.outputs['ledbar'] == 0b11
+    assert asyncio.run(pcounter.get_count_async()) == 2
+    pcounter.reset_count()
+    assert pcounter.get_count() == 0
+    assert pcounter.microblaze.outputs['ledbar'] == 0
+
+
+def test_stop_counting_keeps_count(sim):
+    pcounter = Grove_pcounter(sim(sensors={
+        'pir': steps((0.01, 1), (0.02, 0), (0.2, 1))}))
+    pcounter.start_counting(debounce=0.001, display=False)
+    time.sleep(0.03)
+    pcounter.stop_counting()
+    time.sleep(0.2)
+    assert pcounter.get_count() == 1
+    assert pcounter.microblaze.outputs.get('ledbar', 0) == 0
+
+
+def test_counter_on_stock_program(sim):
+    pcounter = Grove_pcounter(sim(firmware_version=0))
+    for method in (pcounter.start_counting, pcounter.stop_counting,
+                   pcounter.get_count, pcounter.reset_count):
+        with pytest.raises(RuntimeError):
+            method()
+    with pytest.raises(RuntimeError):
+        asyncio.run(pcounter.get_count_async())
+
+
+def test_wait_for_motion(sim):
+    pcounter = Grove_pcounter(sim(sensors={'pir': steps((0.05, 1))}))
+    start = time.monotonic()
+    assert pcounter.wait_for_motion(timeout=1)
+    assert time.monotonic() - start >= 0.04
+
+
+def test_wait_for_motion_timeout(sim):
+    psensor = Grove_psensor(sim())
+    assert not psensor.wait_for_motion(timeout=0.05)
+
+
+def record_interrupt_loops(monkeypatch, driver):
+    """Return the list of event loops the interrupt of `driver` is awaited on."""
+    interrupt = driver.microblaze.interrupt
+    wait = interrupt.wait
+    loops = []
+
+    async def record():
+        loops.append(asyncio.get_running_loop())
+        await wait()
+    monkeypatch.setattr(interrupt, 'wait', record)
+    return loops
+
+
+def test_wait_for_motion_on_thread_loop(sim, monkeypatch):
+    psensor = Grove_psensor(sim(sensors={'pir': steps((0.05, 1))}))
+    loops = record_interrupt_loops(monkeypatch, psensor)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        assert psensor.wait_for_motion(timeout=1)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert loops and all(running is loop for running in loops)
+
+
+def test_wait_for_motion_in_event_loop(sim, monkeypatch):
+    psensor = Grove_psensor(sim(sensors={'pir': steps((0.05, 1))}))
+    loops = record_interrupt_loops(monkeypatch, psensor)
+
+    async def wait(timeout):
+        return psensor.wait_for_motion(timeout)
+
+    assert asyncio.run(wait(1))
+    assert loops == []
+    psensor = Grove_psensor(sim())
+    assert not asyncio.run(wait(0.05))
+
+
+def test_wait_for_motion_on_stock_program(sim):
+    for driver in (Grove_pcounter, Grove_psensor):
+        pir = driver(sim(firmware_version=0))
+        with pytest.raises(RuntimeError):
+            pir.wait_for_motion(timeout=0.05)
+        with pytest.raises(RuntimeError):
+            asyncio.run(pir.wait_for_motion_async())
+
+
+def test_wait_for_motion_async(sim):
+    pcounter = Grove_pcounter(sim(sensors={'pir': steps((0.05, 1))}))
+    asyncio.run(asyncio.wait_for(pcounter.wait_for_motion_async(), 1))
+    with pytest.raises(asyncio.TimeoutError):
+        pcounter = Grove_pcounter(sim())
+        asyncio.run(asyncio.wait_for(pcounter.wait_for_motion_async(), 0.05))
+
+
+def test_rule(sim):
+    psensor = Grove_psensor(sim(sensors={
+        'pir': steps((0.01, 1), (0.02, 0), (0.03, 1), (0.04, 0))}))
+    psensor.start_rule(hold=0.05)
+    time.sleep(0.035)
+    status = psensor.get_rule_status()
+    assert status['running'] and status['relay'] == 1
+    time.sleep(0.07)
+    status = psensor.get_rule_status()
+    assert status['relay'] == 0
+    assert status['triggers'] == 2 and status['activations'] == 1
+    psensor.stop_rule()
+    assert not psensor.get_rule_status()['running']
+
+
+def test_rule_on_stock_program(sim):
+    psensor = Grove_psensor(sim(firmware_version=0))
+    for method in (psensor.start_rule, psensor.stop_rule,
+                   psensor.get_rule_status):
+        with pytest.raises(RuntimeError):
+            method()
+
+
+def test_start_rule_invalid(sim):
+    psensor = Grove_psensor(sim())
+    with pytest.raises(ValueError):
+        psensor.start_rule(hold=-1)
@@ -0,0 +1,107 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino.grove_imu import FIFO_MAX_FRAMES
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+@pytest.fixture
+def imu(sim):
+    return G_IMU(sim(), ARDUINO_GROVE_I2C)
+
+
+def test_read_fifo(imu):
+    imu.start_fifo(1000)
+    time.sleep(0.05)
+    frames = imu.read_fifo()
+    assert frames.dtype == np.float32 and frames.shape[1] == 11
+    assert 40 <= len(frames) <= FIFO_MAX_FRAMES
+    assert np.all(frames[:, 2] == 1.0)
+    assert imu.fifo_dropped == 0
+
+
+def test_read_fifo_max_frames(imu):
+    imu.start_fifo(1000)
+    time.sleep(0.02)
+    assert len(imu.read_fifo(5)) == 5
+    assert len(imu.read_fifo()) >= 10
+
+
+def test_read_fifo_precision(imu):
+    imu.start_fifo(1000)
+    time.sleep(0.01)
+    frames = imu.read_fifo(2, precision=2)
+    assert frames[0] == imu.get_data()
+
+
+def test_fifo_overflow(imu):
+    imu.start_fifo(50000)
+    time.sleep(0.05)
+    imu.read_fifo()
+    assert imu.fifo_dropped > 0
+    imu.start_fifo(1000)
+    assert imu.fifo_dropped == 0
+
+
+def test_stop_fifo(imu):
+    imu.start_fifo(1000)
+    time.sleep(0.01)
+    imu.stop_fifo()
+    time.sleep(0.01)
+    assert imu.read_fifo().shape == (0, 11)
+
+
+@pytest.mark.parametrize('max_frames', [0, FIFO_MAX_FRAMES + 1])
+def test_read_fifo_invalid(imu, max_frames):
+    with pytest.raises(ValueError):
+        imu.read_fifo(max_frames)
+
+
+def test_start_fifo_invalid(imu):
+    with pytest.raises(ValueError):
+        imu.start_fifo(0)
+
+
+def test_fifo_on_stock_program(sim):
+    imu = G_IMU(sim(firmware_version=0), ARDUINO_GROVE_I2C)
+    for method in (lambda: imu.start_fifo(100), imu.stop_fifo,
+                   imu.read_fifo):
+        with pytest.raises(RuntimeError):
+            method()
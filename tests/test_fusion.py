@@ -0,0 +1,149 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+import time
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import IMUFrame
+from pynq.lib.arduino import OrientationFilter
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def frame(roll=0.0, gyro_z=0.0, mag=(30.0, 0.0, -40.0)):
+    """Return a static frame rolled by `roll` degrees around the X-axis."""
+    angle = math.radians(roll)
+    my = mag[1] * math.cos(angle) + mag[2] * math.sin(angle)
+    mz = -mag[1] * math.sin(angle) + mag[2] * math.cos(angle)
+    return np.array([0, math.sin(angle), math.cos(angle), 0, 0, gyro_z,
+                     mag[0], my, mz, 25, 101325], dtype=np.float32)
+
+
+@pytest.mark.parametrize('mag', [(30.0, 0.0, -40.0), (0.0, 0.0, 0.0)])
+def test_converges_to_gravity(mag):
+    fusion = OrientationFilter(beta=0.5, sample_period=0.01)
+    for _ in range(2000):
+        fusion.update(frame(roll=30, mag=mag))
+    roll, pitch, _ = fusion.euler
+    assert roll == pytest.approx(30, abs=0.5)
+    assert pitch == pytest.approx(0, abs=0.5)
+    assert np.linalg.norm(fusion.quaternion) == pytest.approx(1)
+
+
+def test_integrates_gyroscope():
+    fusion = OrientationFilter(beta=0, sample_period=0.01)
+    for _ in range(100):
+        fusion.update(frame(gyro_z=90))
+    assert fusion.euler[2] == pytest.approx(90, abs=0.1)
+    fusion.reset()
+    assert list(fusion.quaternion) == [1, 0, 0, 0]
+
+
+def test_explicit_step():
+    fusion = OrientationFilter(beta=0)
+    fusion.update(frame(gyro_z=10), dt=0.5)
+    assert fusion.euler[2] == pytest.approx(5, abs=0.01)
+
+
+def test_step_from_timestamps():
+    fusion = OrientationFilter(beta=0, sample_period=0.01)
+    fusion.update(IMUFrame(frame(gyro_z=10), 10.0))
+    fusion.update(IMUFrame(frame(gyro_z=10), 10.5))
+    assert fusion.euler[2] == pytest.approx(5.1, abs=0.01)
+
+
+def test_first_timestamp_seeds_clock():
+    fusion = OrientationFilter(beta=0)
+    quaternion = fusion.update(IMUFrame(frame(gyro_z=10), 10.0))
+    assert list(quaternion) == [1, 0, 0, 0]
+    fusion.update(IMUFrame(frame(gyro_z=10), 10.5))
+    assert fusion.euler[2] == pytest.approx(5, abs=0.01)
+
+
+def test_frames_from_imu(sim):
+    # 3640 counts at +/-250 deg/s is about 27.8 deg/s around Z
+    raw = (0, 0, 16384, 0, 0, 3640, 100, 0, -200, 25, 101325)
+    imu = G_IMU(sim(sensors={'imu': raw}), ARDUINO_GROVE_I2C)
+    fusion = OrientationFilter(beta=0)
+    frames = []
+    for _ in range(5):
+        frames.append(imu.get_frame())
+        fusion.update(frames[-1])
+        time.sleep(0.01)
+    elapsed = frames[-1].timestamp - frames[0].timestamp
+    rate = 3640 * 250 / 32768
+    assert fusion.euler[2] == pytest.approx(rate * elapsed, rel=1e-3)
+
+
+def test_step_unknown():
+    with pytest.raises(ValueError):
+        OrientationFilter().update(frame())
+    with pytest.raises(ValueError):
+        OrientationFilter().update_batch([frame()])
+
+
+def test_batch_matches_updates():
+    frames = np.stack([frame(roll=r, gyro_z=g)
+                       for r, g in zip(range(0, 50), range(50, 100))])
+    single = OrientationFilter(sample_period=0.01)
+    expected = [list(single.update(f)) for f in frames]
+    batch = OrientationFilter(sample_period=0.01)
+    out = np.empty((50, 4))
+    assert batch.update_batch(frames, out=out) is out
+    assert np.allclose(out, expected)
+    assert np.allclose(batch.quaternion, single.quaternion)
+
+
+def test_batch_timestamps():
+    frames = np.stack([frame(gyro_z=10)] * 3)
+    fusion = OrientationFilter(beta=0)
+    fusion.update_batch(frames, timestamps=[1.0, 1.25, 1.5])
+    assert fusion.euler[2] == pytest.approx(5, abs=0.01)
+    fusion.update_batch(frames[:1], timestamps=[2.0])
+    assert fusion.euler[2] == pytest.approx(10, abs=0.01)
+    assert fusion.update_batch(frames[:0]).shape == (0, 4)
+
+
+def test_updates_return_new_quaternions():
+    fusion = OrientationFilter(beta=0.0, sample_period=0.01)
+    quaternions = [fusion.update(frame(gyro_z=90)) for _ in range(3)]
+    assert not np.allclose(quaternions[0], quaternions[2])
+    assert fusion.quaternion is not fusion.quaternion
+
+    out = np.zeros(4)
+    assert fusion.update(frame(gyro_z=90), out=out) is out
+    assert np.array_equal(out, fusion.quaternion)
@@ -0,0 +1,206 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import math
+import time
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import Grove_multi
+from pynq.lib.arduino import IMUFrame
+from pynq.lib.arduino import instrument
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+GET_DATA = 0x3
+GET_PRESSURE = 0xD
+
+# Raw counts: level, with the field pointing between X and Y
+FRAME = (0, 0, 16384, 0, 0, 0, 4096, 4096, 0, 25, 90000)
+
+
+@pytest.fixture
+def imu(sim):
+    return G_IMU(sim(sensors={'imu': FRAME}), ARDUINO_GROVE_I2C)
+
+
+def test_get_frame_is_one_read(imu):
+    stats = instrument(imu)
+    before = time.monotonic()
+    frame = imu.get_frame()
+    assert before <= frame.timestamp <= time.monotonic()
+    frame.heading, frame.tilt_heading, frame.atm, frame.altitude
+    assert stats.stats()['0x{:x}'.format(GET_DATA)]['count'] == 1
+    assert frame.data.dtype == np.float32
+    assert list(frame.accel) == [0, 0, 1]
+    assert frame.temperature == 25 and frame.pressure == 90000
+
+
+def test_derived_values(imu):
+    frame = imu.get_frame()
+    assert frame.heading == pytest.approx(45)
+    assert frame.tilt_heading == pytest.approx(45)
+    assert frame.atm == pytest.approx(90000 / 101325)
+    c = 288.15 - math.exp((math.log(90) + 18.2573) / 5.25885)
+    assert frame.altitude == pytest.approx(c / 0.0065)
+
+
+def test_derived_values_are_cached():
+    frame = IMUFrame(np.array([0, 0, 1, 0, 0, 0, 0, 1, 0, 25, 101325],
+                              dtype=np.float32))
+    assert frame.heading == pytest.approx(90)
+    assert frame.atm == 1
+    frame.data[6:8] = [1, 0]
+    frame.data[10] = 0
+    assert frame.heading == pytest.approx(90)
+    assert frame.atm == 1
+    assert IMUFrame(frame.data).heading == 0
+
+
+def test_heading_range():
+    frame = IMUFrame(np.array([0, 0, 1, 0, 0, 0, 0, -1, 0, 25, 101325],
+                              dtype=np.float32))
+    assert frame.heading == pytest.approx(270)
+
+
+def test_tilt_heading_out_of_range():
+    frame = IMUFrame(np.array([2, 0, 0, 0, 0, 0, 1, 0, 0, 25, 101325],
+                              dtype=np.float32))
+    with pytest.raises(RuntimeError):
+        frame.tilt_heading
+
+
+def test_rounded_getters(imu):
+    frame = imu.get_frame()
+    assert imu.get_heading() == round(frame.heading, 2)
+    assert imu.get_tilt_heading() == round(frame.tilt_heading, 2)
+
+
+def test_get_frame_async(imu):
+    frame = asyncio.run(imu.get_frame_async())
+    assert np.array_equal(frame.data, imu.get_frame().data)
+
+
+def test_configure_changes_scaling(sim):
+    frame = (0, 8192, 16384, 16384, 0, -4096, 100, 0, -200, 25, 101325)
+    imu = G_IMU(sim(sensors={'imu': frame}), ARDUINO_GROVE_I2C)
+    before = imu.get_data(precision=None)
+    imu.configure(accel_range=8, gyro_range=2000, rate=100, bandwidth=41)
+    assert imu.microblaze.outputs['imu_config'] == [2, 3, 9, 3]
+    assert np.array_equal(imu.get_data(precision=None), before)
+    assert imu.get_data()[0:6] == [0, 0.5, 1, 125, 0, -31.25]
+
+
+def test_configure_back_to_power_on_ranges(sim):
+    frame = (32000, 0, 0, 0, 0, 0, 0, 0, 0, 25, 101325)
+    imu = G_IMU(sim(sensors={'imu': frame}), ARDUINO_GROVE_I2C)
+    imu.configure(accel_range=4)
+    imu.configure(accel_range=2)
+    assert imu.get_data(precision=None)[0] == pytest.approx(32000 / 16384)
+
+
+def test_multisensor_configure_imu(sim):
+    frame = (0, 0, 16384, 0, 0, 0, 0, 0, 0, 25, 101325)
+    multi = Grove_multi(sim(sensors={'imu': frame}))
+    multi.configure_imu(accel_range=16)
+    assert multi.microblaze.outputs['imu_config'] == [3, 0, 0, 1]
+    assert multi.get_imu_data()[2] == 1
+
+
+def test_configure_on_stock_program(sim):
+    imu = G_IMU(sim(firmware_version=0), ARDUINO_GROVE_I2C)
+    with pytest.raises(RuntimeError):
+        imu.configure(accel_range=8)
+    multi = Grove_multi(sim(firmware_version=0))
+    with pytest.raises(RuntimeError):
+        multi.configure_imu(accel_range=8)
+
+
+def test_get_pressure_reads_barometer_only(imu):
+    stats = instrument(imu)
+    assert imu.get_pressure(oversampling=3) == [25, 90000]
+    assert imu.microblaze.outputs['bmp180_oversampling'] == 3
+    commands = stats.stats()
+    assert commands['0x{:x}'.format(GET_PRESSURE)]['count'] == 1
+    assert '0x{:x}'.format(GET_DATA) not in commands
+    with pytest.raises(ValueError):
+        imu.get_pressure(oversampling=4)
+
+
+def test_get_pressure_async(imu):
+    values = asyncio.run(imu.get_pressure_async(precision=None))
+    assert list(values) == [25, 90000]
+    assert imu.microblaze.outputs['bmp180_oversampling'] == 0
+
+
+def test_atm_and_altitude_from_frame_by_default(imu):
+    stats = instrument(imu)
+    frame = imu.get_frame()
+    assert imu.get_atm() == round(frame.atm, 2)
+    assert imu.get_altitude() == round(frame.altitude, 2)
+    commands = stats.stats()
+    assert commands['0x{:x}'.format(GET_DATA)]['count'] == 3
+    assert '0x{:x}'.format(GET_PRESSURE) not in commands
+
+
+def test_atm_and_altitude_from_pressure(imu):
+    stats = instrument(imu)
+    frame = imu.get_frame()
+    assert imu.get_atm(oversampling=1) == round(frame.atm, 2)
+    assert imu.microblaze.outputs['bmp180_oversampling'] == 1
+    assert imu.get_altitude(oversampling=2) == round(frame.altitude, 2)
+    assert imu.microblaze.outputs['bmp180_oversampling'] == 2
+    assert stats.stats()['0x{:x}'.format(GET_PRESSURE)]['count'] == 2
+
+
+def test_multisensor_get_pressure(sim):
+    multi = Grove_multi(sim(sensors={'imu': FRAME}))
+    assert multi.get_pressure(oversampling=2) == [25, 90000]
+    assert multi.microblaze.outputs['bmp180_oversampling'] == 2
+
+
+def test_get_pressure_on_stock_program(sim):
+    imu = G_IMU(sim(firmware_version=0), ARDUINO_GROVE_I2C)
+    multi = Grove_multi(sim(firmware_version=0))
+    for driver in (imu, multi):
+        with pytest.raises(RuntimeError):
+            driver.get_pressure()
+        with pytest.raises(RuntimeError):
+            asyncio.run(driver.get_pressure_async())
+        with pytest.raises(RuntimeError):
+            driver.get_altitude(oversampling=0)
+        assert isinstance(driver.get_altitude(), float)
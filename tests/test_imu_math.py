@@ -0,0 +1,162 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino.grove_imu_math import altitude
+from pynq.lib.arduino.grove_imu_math import atm
+from pynq.lib.arduino.grove_imu_math import barometric_altitude
+from pynq.lib.arduino.grove_imu_math import heading
+from pynq.lib.arduino.grove_imu_math import pitch_roll
+from pynq.lib.arduino.grove_imu_math import pressure_to_altitude
+from pynq.lib.arduino.grove_imu_math import pressure_to_atm
+from pynq.lib.arduino.grove_imu_math import \
+    pressure_to_barometric_altitude
+from pynq.lib.arduino.grove_imu_math import tilt_heading
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+# The scalar implementations the vectorized functions replaced, without
+# their final rounding.
+
+def scalar_heading(frame):
+    mx, my = frame[6], frame[7]
+    heading = 180 * math.atan2(my, mx) / math.pi
+    if heading < 0:
+        heading += 360
+    return heading
+
+
+def scalar_tilt_heading(frame):
+    ax, ay = frame[0], frame[1]
+    mx, my, mz = frame[6], frame[7], frame[8]
+    pitch = math.asin(-ax)
+    roll = math.asin(ay / math.cos(pitch))
+    xh = mx * math.cos(pitch) + mz * math.sin(pitch)
+    yh = mx * math.sin(roll) * math.sin(pitch) + \
+        my * math.cos(roll) - mz * math.sin(roll) * math.cos(pitch)
+    tilt_heading = 180 * math.atan2(yh, xh) / math.pi
+    if yh < 0:
+        tilt_heading += 360
+    return tilt_heading
+
+
+def scalar_atm(frame):
+    return frame[10] / 101325
+
+
+def scalar_altitude(frame):
+    a = frame[10] / 1000
+    b = 1 / 5.25885
+    c = 288.15 - math.exp((math.log(a) + 18.2573)*b)
+    return (1/0.0065) * c
+
+
+def scalar_barometric_altitude(frame):
+    a = frame[10] / 101325
+    b = 1 / 5.255
+    c = 1 - pow(a, b)
+    return 44300 * c
+
+
+@pytest.fixture
+def frames():
+    rng = np.random.RandomState(0)
+    frames = rng.uniform(-1, 1, (200, 11))
+    frames[:, 0:2] *= 0.7
+    frames[:, 6:9] *= 50
+    frames[:, 10] = rng.uniform(30000, 110000, 200)
+    return frames
+
+
+@pytest.mark.parametrize('vectorized, scalar', [
+    (heading, scalar_heading),
+    (tilt_heading, scalar_tilt_heading),
+    (atm, scalar_atm),
+    (altitude, scalar_altitude),
+    (barometric_altitude, scalar_barometric_altitude),
+])
+def test_matches_scalar(frames, vectorized, scalar):
+    result = vectorized(frames)
+    assert result.shape == (len(frames),)
+    assert np.allclose(result, [scalar(frame) for frame in frames],
+                       rtol=1e-9, atol=1e-9)
+    assert np.ndim(vectorized(frames[0])) == 0
+    assert vectorized(frames[0]) == pytest.approx(scalar(frames[0]))
+
+
+def test_float32_frames(frames):
+    single = frames.astype(np.float32)
+    assert np.allclose(heading(single), heading(frames), atol=1e-3)
+    assert np.allclose(altitude(single), altitude(frames), atol=0.1)
+
+
+def test_batch_axes(frames):
+    batch = frames.reshape(4, 50, 11)
+    assert heading(batch).shape == (4, 50)
+    assert np.array_equal(heading(batch).ravel(), heading(frames))
+
+
+def test_out_of_range_is_nan(frames):
+    frames[0, 0] = 1.5
+    frames[1, 0:2] = [0.8, 0.9]
+    pitch, roll = pitch_roll(frames)
+    assert np.isnan(pitch[0]) and np.isnan(roll[1])
+    result = tilt_heading(frames)
+    assert np.isnan(result[0:2]).all()
+    assert not np.isnan(result[2:]).any()
+
+
+@pytest.mark.parametrize('vectorized, scalar', [
+    (pressure_to_atm, scalar_atm),
+    (pressure_to_altitude, scalar_altitude),
+    (pressure_to_barometric_altitude, scalar_barometric_altitude),
+])
+def test_pressure_matches_scalar(frames, vectorized, scalar):
+    result = vectorized(frames[:, 10])
+    assert np.allclose(result, [scalar(frame) for frame in frames],
+                       rtol=1e-9, atol=1e-9)
+    assert vectorized(frames[0, 10]) == pytest.approx(scalar(frames[0]))
+
+
+@pytest.mark.parametrize('vectorized', [
+    altitude, barometric_altitude])
+def test_altitude_of_non_positive_pressure_is_nan(frames, vectorized):
+    frames[0:3, 10] = [0, -1000, 101325]
+    result = vectorized(frames)
+    assert np.isnan(result[0:2]).all()
+    assert not np.isnan(result[2:]).any()
+    assert np.isnan(vectorized(frames[0]))
@@ -0,0 +1,279 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import Grove_autoalarm
+from pynq.lib.arduino import Grove_gesgame
+from pynq.lib.arduino import Grove_pcounter
+from pynq.lib.arduino import instrument
+from pynq.lib.arduino.arduino_grove_autoalarm import \
+    WRITE_LEDS as ALARM_WRITE_LEDS
+from pynq.lib.arduino.arduino_grove_pcounter import PLAY_SEQUENCE
+from pynq.lib.arduino.arduino_grove_pcounter import READ_LEDS
+from pynq.lib.arduino.arduino_grove_pcounter import SET_BRIGHTNESS
+from pynq.lib.arduino.arduino_grove_pcounter import SET_BRIGHTNESS_PACKED
+from pynq.lib.arduino.arduino_grove_pcounter import SET_LEVEL
+from pynq.lib.arduino.arduino_grove_pcounter import SET_LEVEL_PACKED
+from pynq.lib.arduino.arduino_grove_pcounter import WRITE_LEDS
+from pynq.lib.arduino.grove_ledbar import SEQUENCE_MAX_FRAMES
+from pynq.lib.arduino.grove_ledbar import encode_brightness
+from pynq.lib.arduino.grove_ledbar import encode_level
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def count(stats, command):
+    entry = stats.stats().get('0x{:x}'.format(command))
+    return 0 if entry is None else entry['count']
+
+
+def written(stats, command):
+    return stats.stats()['0x{:x}'.format(command)]['bytes_written']
+
+
+@pytest.fixture
+def pcounter(sim):
+    return Grove_pcounter(sim())
+
+
+def test_encode_brightness():
+    words = encode_brightness(0x7ff, list(range(1, 11)))
+    assert words == [0x3ff, 0x04030201, 0x08070605, 0x0a09]
+    with pytest.raises(ValueError):
+        encode_brightness(0, [0xff] * 9)
+
+
+def test_encode_level():
+    assert encode_level(7, 2, 1) == 0x10207
+
+
+def test_brightness_layouts(sim):
+    brightness = [0xff, 0xaa, 0x01, 0x00] * 2 + [0xff, 0xaa]
+    outputs = []
+    for packed, command, num_bytes in ((False, SET_BRIGHTNESS, 44),
+                                       (True, SET_BRIGHTNESS_PACKED, 16)):
+        pcounter = Grove_pcounter(sim(), packed=packed)
+        stats = instrument(pcounter)
+        pcounter.write_brightness(0x3f0, brightness)
+        assert written(stats, command) == num_bytes
+        outputs.append(dict(pcounter.microblaze.outputs))
+    assert outputs[0] == outputs[1]
+    assert outputs[0]['brightness'] == brightness
+
+
+def test_level_layouts(sim):
+    outputs = []
+    for packed, command, num_bytes in ((False, SET_LEVEL, 12),
+                                       (True, SET_LEVEL_PACKED, 4)):
+        pcounter = Grove_pcounter(sim(), packed=packed)
+        stats = instrument(pcounter)
+        pcounter.write_level(4, 2, 1)
+        assert written(stats, command) == num_bytes
+        outputs.append(dict(pcounter.microblaze.outputs))
+    assert outputs[0] == outputs[1]
+    assert outputs[0]['ledbar'] == 0b1111000000
+
+
+def test_packed_on_stock_program(sim):
+    with pytest.raises(RuntimeError):
+        Grove_pcounter(sim(firmware_version=0), packed=True)
+    Grove_pcounter(sim(firmware_version=0)).write_level(4, 2, 1)
+
+
+def test_repeated_write_is_skipped(pcounter):
+    stats = instrument(pcounter)
+    pcounter.write_binary(0x155)
+    pcounter.write_binary(0x155)
+    assert count(stats, WRITE_LEDS) == 1
+    pcounter.write_binary(0x2aa)
+    assert count(stats, WRITE_LEDS) == 2
+    assert pcounter.microblaze.outputs['ledbar'] == 0x2aa
+
+
+def test_read_is_cached(pcounter):
+    stats = instrument(pcounter)
+    pcounter.write_binary(0x155)
+    assert pcounter.read() == 0x155
+    assert count(stats, READ_LEDS) == 0
+    assert pcounter.read(force=True) == 0x155
+    assert count(stats, READ_LEDS) == 1
+
+
+def test_read_after_level(pcounter):
+    stats = instrument(pcounter)
+    pcounter.write_level(3, 3, 0)
+    assert pcounter.read() == 0b111
+    assert pcounter.read() == 0b111
+    assert count(stats, READ_LEDS) == 1
+
+
+def test_cache_is_shared_with_instrumented_driver(pcounter):
+    pcounter.write_binary(0x155)
+    stats = instrument(pcounter)
+    pcounter.write_binary(0x155)
+    assert count(stats, WRITE_LEDS) == 0
+
+
+def test_start_events_invalidates_cache(sim):
+    alarm = Grove_autoalarm(sim())
+    stats = instrument(alarm)
+    alarm.write_binary(0x1)
+    alarm.write_binary(0x1)
+    assert count(stats, ALARM_WRITE_LEDS) == 1
+    alarm.start_events(period=0.01)
+    alarm.write_binary(0x1)
+    assert count(stats, ALARM_WRITE_LEDS) == 2
+    alarm.stop_events()
+
+
+def test_event_mode_writes_are_not_skipped(sim):
+    alarm = Grove_autoalarm(sim())
+    stats = instrument(alarm)
+    alarm.start_events(period=0.01)
+    alarm.write_binary(0x1)
+    alarm.write_binary(0x1)
+    assert count(stats, ALARM_WRITE_LEDS) == 2
+    alarm.stop_events()
+    alarm.write_binary(0x1)
+    alarm.write_binary(0x1)
+    assert count(stats, ALARM_WRITE_LEDS) == 3
+
+
+def test_sequence_is_one_upload(pcounter):
+    stats = instrument(pcounter)
+    pcounter.play_sequence([0x1, 0x2, 0x4, 0x8, 0x10], 0.05)
+    assert count(stats, PLAY_SEQUENCE) == 1
+    assert written(stats, PLAY_SEQUENCE) == 4 * (2 + 5)
+    assert pcounter.microblaze.outputs['ledbar'] == 0x1
+
+
+def test_sequence_plays_once(pcounter):
+    pcounter.play_sequence([0x1, 0x2, 0x4], 0.01, repeat=1)
+    time.sleep(0.05)
+    assert pcounter.read(force=True) == 0b100
+
+
+def test_sequence_loops(pcounter):
+    pcounter.play_sequence([0x1, 0x2], [0.05, 0.05], repeat=0)
+    time.sleep(0.07)
+    assert pcounter.read(force=True) == 0b10
+    time.sleep(0.05)
+    assert pcounter.read(force=True) == 0b1
+
+
+def test_write_cancels_sequence(pcounter):
+    pcounter.play_sequence([0x1, 0x2], 0.01, repeat=0)
+    pcounter.write_binary(0x3ff)
+    time.sleep(0.03)
+    assert pcounter.read(force=True) == 0x3ff
+
+
+def test_stop_sequence_keeps_frame(sim):
+    gesgame = Grove_gesgame(sim())
+    gesgame.play_sequence([0x1, 0x2], 0.02, repeat=0)
+    time.sleep(0.03)
+    gesgame.stop_sequence()
+    leds = gesgame.microblaze.outputs['ledbar']
+    time.sleep(0.03)
+    gesgame.write_binary(leds)
+    assert gesgame.microblaze.outputs['ledbar'] == leds == 0x2
+
+
+@pytest.mark.parametrize('driver', [Grove_autoalarm, Grove_gesgame,
+                                    Grove_pcounter])
+def test_sequence_on_stock_program(sim, driver):
+    ledbar = driver(sim(firmware_version=0))
+    with pytest.raises(RuntimeError):
+        ledbar.play_sequence([0x1, 0x2], 0.02)
+    with pytest.raises(RuntimeError):
+        ledbar.stop_sequence()
+
+
+def test_sequence_is_not_cached(pcounter):
+    stats = instrument(pcounter)
+    pcounter.write_binary(0x1)
+    pcounter.play_sequence([0x1, 0x2], 0.02, repeat=0)
+    time.sleep(0.03)
+    assert pcounter.read() == 0x2
+    assert count(stats, READ_LEDS) == 1
+    pcounter.write_binary(0x1)
+    assert count(stats, WRITE_LEDS) == 2
+    assert pcounter.microblaze.outputs['ledbar'] == 0x1
+    time.sleep(0.03)
+    assert pcounter.read() == 0x1
+    assert count(stats, READ_LEDS) == 1
+
+
+def test_stopped_sequence_is_read_back(pcounter):
+    pcounter.play_sequence([0x1, 0x2, 0x4], 0.02, repeat=0)
+    time.sleep(0.03)
+    pcounter.stop_sequence()
+    leds = pcounter.microblaze.outputs['ledbar']
+    assert pcounter.read() == leds
+    pcounter.write_binary(leds)
+    assert pcounter.microblaze.outputs['ledbar'] == leds
+
+
+def test_counter_display_is_not_cached(sim):
+    pcounter = Grove_pcounter(sim(sensors={
+        'pir': lambda t: int(0.02 <= t < 0.04)}))
+    stats = instrument(pcounter)
+    pcounter.write_binary(0x0)
+    pcounter.start_counting(debounce=0.005, display=True)
+    pcounter.write_binary(0x0)
+    pcounter.write_binary(0x0)
+    assert count(stats, WRITE_LEDS) == 3
+    time.sleep(0.06)
+    assert pcounter.read() == 0b1
+    assert pcounter.read() == 0b1
+    assert count(stats, READ_LEDS) == 2
+
+    pcounter.stop_counting()
+    assert pcounter.read() == 0b1
+    assert pcounter.read() == 0b1
+    assert count(stats, READ_LEDS) == 4
+    pcounter.write_binary(0x3)
+    pcounter.write_binary(0x3)
+    assert count(stats, WRITE_LEDS) == 4
+    assert pcounter.read() == 0x3
+    assert count(stats, READ_LEDS) == 4
+
+
+@pytest.mark.parametrize('args', [
+    ([], 0.1), ([0x1] * (SEQUENCE_MAX_FRAMES + 1), 0.1),
+    ([0x1, 0x2], [0.1]), ([0x1], 0), ([0x1], 0.1, -1)])
+def test_play_sequence_invalid(pcounter, args):
+    with pytest.raises(ValueError):
+        pcounter.play_sequence(*args)
@@ -0,0 +1,97 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import Pedometer
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+RATE = 50
+STEP_RATE = 2.0
+
+
+def walk(seconds, step_rate=STEP_RATE, amplitude=0.3):
+    t = np.arange(int(seconds * RATE)) / RATE
+    frames = np.zeros((len(t), 11))
+    frames[:, 2] = 1 + amplitude * np.sin(2 * np.pi * step_rate * t)
+    return frames
+
+
+def test_counts_steps():
+    pedometer = Pedometer(RATE)
+    for frame in walk(30):
+        pedometer.update(frame)
+    assert abs(pedometer.steps - 30 * STEP_RATE) <= 2
+
+
+def test_cadence():
+    pedometer = Pedometer(RATE, window=10.0)
+    pedometer.update_batch(walk(30))
+    stats = pedometer.stats
+    assert stats is not None
+    assert stats['cadence'] == pytest.approx(60 * STEP_RATE, abs=6)
+    assert stats['mean_interval'] == pytest.approx(1 / STEP_RATE, abs=0.02)
+    assert stats['std_interval'] < 0.02
+
+
+def test_batch_matches_updates():
+    frames = walk(12)
+    single = Pedometer(RATE)
+    steps = [single.update(frame) for frame in frames]
+    batch = Pedometer(RATE)
+    assert batch.update_batch(frames) == [s for s in steps if s is not None]
+    assert batch.steps == single.steps
+
+
+def test_standing_still():
+    pedometer = Pedometer(RATE)
+    pedometer.update_batch(walk(10, amplitude=0.02))
+    assert pedometer.steps == 0
+
+
+def test_on_step_and_reset():
+    seen = []
+    pedometer = Pedometer(RATE, on_step=seen.append)
+    pedometer.update_batch(walk(5))
+    assert len(seen) == pedometer.steps > 0
+    pedometer.reset()
+    assert pedometer.steps == 0
+    assert pedometer.stats is None
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        Pedometer(0)
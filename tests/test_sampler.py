@@ -0,0 +1,147 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import itertools
+import time
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import IMUSampler
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+def numbered_frames():
+    """Return an IMU model numbering its reads in the temperature field."""
+    return ((0, 0, 16384, 0, 0, 0, 100, 0, 0, i, 101325)
+            for i in itertools.count())
+
+
+def run_until(sampler, count, timeout=5):
+    sampler.start()
+    deadline = time.monotonic() + timeout
+    while sampler.count < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+    sampler.stop()
+    assert sampler.error is None
+    assert sampler.count >= count
+
+
+@pytest.fixture
+def imu(sim):
+    return G_IMU(sim(sensors={'imu': numbered_frames()}), ARDUINO_GROVE_I2C)
+
+
+def numbers(frames):
+    return frames[:, 9].astype(int).tolist()
+
+
+def test_window_wraps_around(imu):
+    sampler = IMUSampler(imu, 2000, capacity=8)
+    run_until(sampler, 20)
+    count = sampler.count
+    times, frames = sampler.window(8)
+    assert numbers(frames) == list(range(count - 8, count))
+    assert np.all(np.diff(times) > 0)
+    assert frames.base is not None and times.base is not None
+    times, frames = sampler.window(3)
+    assert numbers(frames) == list(range(count - 3, count))
+
+
+def test_window_before_capacity(imu):
+    sampler = IMUSampler(imu, 2000, capacity=8)
+    times, frames = sampler.window(4)
+    assert len(times) == 0 and frames.shape == (0, 11)
+    run_until(sampler, 2)
+    times, frames = sampler.window(8)
+    assert numbers(frames) == list(range(sampler.count))
+
+
+def test_read_new(imu):
+    sampler = IMUSampler(imu, 2000, capacity=64)
+    run_until(sampler, 5)
+    first = numbers(sampler.read_new()[1])
+    assert first == list(range(sampler.count))
+    assert len(sampler.read_new()[0]) == 0
+    run_until(sampler, sampler.count + 5)
+    second = numbers(sampler.read_new()[1])
+    assert second == list(range(first[-1] + 1, sampler.count))
+    assert sampler.overruns == 0
+
+
+def test_overruns(imu):
+    sampler = IMUSampler(imu, 2000, capacity=8)
+    run_until(sampler, 20)
+    count = sampler.count
+    assert numbers(sampler.read_new()[1]) == list(range(count - 8, count))
+    assert sampler.overruns == count - 8
+
+
+def test_missed_deadlines(sim):
+    imu = G_IMU(sim(latency=0.005), ARDUINO_GROVE_I2C)
+    sampler = IMUSampler(imu, 1000, capacity=16)
+    run_until(sampler, 5)
+    assert sampler.missed_deadlines >= 4 * (sampler.count - 1)
+    times = sampler.window(sampler.count)[0]
+    assert np.all(np.diff(times) >= 0.005)
+
+
+def test_deadlines_kept(imu):
+    with IMUSampler(imu, 200, capacity=16) as sampler:
+        time.sleep(0.1)
+    assert 10 <= sampler.count <= 30
+
+
+def test_error_stops_sampling(sim):
+    imu = G_IMU(sim(sensors={'imu': iter([])}), ARDUINO_GROVE_I2C)
+    sampler = IMUSampler(imu, 1000)
+    sampler.start()
+    deadline = time.monotonic() + 1
+    while sampler.error is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    sampler.stop()
+    assert isinstance(sampler.error, RuntimeError)
+    assert sampler.count == 0
+
+
+@pytest.mark.parametrize('rate, capacity', [(0, 8), (100, 0)])
+def test_invalid_arguments(imu, rate, capacity):
+    with pytest.raises(ValueError):
+        IMUSampler(imu, rate, capacity)
+
+
+def test_window_larger_than_capacity(imu):
+    with pytest.raises(ValueError):
+        IMUSampler(imu, 100, capacity=8).window(9)
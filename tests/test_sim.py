@@ -0,0 +1,173 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO
+from pynq.lib.arduino import ARDUINO_GROVE_I2C
+from pynq.lib.arduino import Arduino_Sim
+from pynq.lib.arduino import G_IMU
+from pynq.lib.arduino import Grove_gesgame
+from pynq.lib.arduino import Grove_multi
+from pynq.lib.arduino import Grove_pcounter
+from pynq.lib.arduino import Grove_psensor
+from pynq.lib.arduino import Grove_usranger
+from pynq.lib.arduino import MAILBOX_OFFSET
+from pynq.lib.arduino import MAILBOX_PY2IOP_CMD_OFFSET
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+PROGRAM = "arduino_grove_psensor.bin"
+READ_PIR = 0x3
+WRITE_RELAY = 0x5
+
+
+def command_word(microblaze):
+    return microblaze.read(MAILBOX_OFFSET + MAILBOX_PY2IOP_CMD_OFFSET)
+
+
+def test_mailbox():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM)
+    microblaze.write_mailbox(4, [1, 2, 3])
+    assert microblaze.read_mailbox(4, 3) == [1, 2, 3]
+    assert microblaze.read_mailbox(8) == 2
+    microblaze.write_mailbox(0, -1)
+    assert microblaze.read_mailbox(0) == 0xffffffff
+
+
+def test_unaligned_access():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM)
+    with pytest.raises(MemoryError):
+        microblaze.read_mailbox(2)
+    with pytest.raises(MemoryError):
+        microblaze.write_mailbox(2, 0)
+
+
+def test_blocking_command():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM, sensors={'pir': 1})
+    microblaze.write_blocking_command(READ_PIR)
+    assert command_word(microblaze) == 0
+    assert microblaze.read_mailbox(0) == 1
+
+
+def test_latency():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM, latency={WRITE_RELAY: 0.03})
+    microblaze.write_mailbox(0, 1)
+    microblaze.write_non_blocking_command(WRITE_RELAY)
+    assert command_word(microblaze) == WRITE_RELAY
+    assert 'relay' not in microblaze.outputs
+    time.sleep(0.04)
+    assert command_word(microblaze) == 0
+    assert microblaze.outputs['relay'] == 1
+
+    start = time.monotonic()
+    microblaze.write_blocking_command(WRITE_RELAY)
+    assert time.monotonic() - start >= 0.03
+    start = time.monotonic()
+    microblaze.write_blocking_command(READ_PIR)
+    assert time.monotonic() - start < 0.03
+
+
+def test_unsupported_command():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM)
+    with pytest.raises(RuntimeError):
+        microblaze.write_blocking_command(0x3f)
+
+
+def test_unknown_program():
+    with pytest.raises(ValueError):
+        Arduino_Sim(ARDUINO, "unknown.bin")
+
+
+def test_program_resets_memory():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM)
+    microblaze.write_mailbox(0, 7)
+    microblaze.reset()
+    assert microblaze.state == 'STOPPED'
+    microblaze.program()
+    assert microblaze.state == 'RUNNING'
+    assert microblaze.read_mailbox(0) == 0
+
+
+def test_sensor_models():
+    microblaze = Arduino_Sim(ARDUINO, PROGRAM, sensors={
+        'pir': iter([1, 0]),
+        'distance': lambda t: 10 + t,
+        'gesture': iter([])})
+    assert [microblaze.sample('pir') for _ in range(3)] == [1, 0, 0]
+    assert 10 <= microblaze.sample('distance') < 11
+    assert microblaze.sample('light') == 1.0
+    with pytest.raises(RuntimeError):
+        microblaze.sample('gesture')
+
+
+def test_backend(sim):
+    psensor = Grove_psensor(sim(sensors={'pir': 1}))
+    assert isinstance(psensor.microblaze, Arduino_Sim)
+    assert psensor.microblaze.firmware.configured
+    assert psensor.read_pir() == 1
+    psensor.write_relay(1)
+    assert psensor.microblaze.outputs['relay'] == 1
+
+
+def test_imu(sim):
+    imu = G_IMU(sim(), ARDUINO_GROVE_I2C)
+    data = imu.get_data()
+    assert len(data) == 11
+    assert data[2] == 1.0
+
+
+def test_multisensor(sim):
+    multi = Grove_multi(sim(sensors={'dht': (21.5, 40.0)}))
+    assert multi.get_dht_data() == [21.5, 40.0]
+    assert len(multi.get_imu_data()) == 11
+
+
+def test_usranger(sim):
+    ranger = Grove_usranger(sim(sensors={'distance': 42.0}))
+    assert ranger.get_distance() == pytest.approx(42.0)
+
+
+def test_gesgame(sim):
+    gesgame = Grove_gesgame(sim(sensors={'gesture': 3}))
+    gesgame.write_binary(0x155)
+    assert gesgame.microblaze.outputs['ledbar'] == 0x155
+
+
+def test_pcounter(sim):
+    pcounter = Grove_pcounter(sim(sensors={'pir': 1}))
+    pcounter.write_binary(0x3ff)
+    assert pcounter.microblaze.outputs['ledbar'] == 0x3ff
+    assert pcounter.read_pir() == 1
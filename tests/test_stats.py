@@ -0,0 +1,123 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import io
+import json
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import Arduino_Stats
+from pynq.lib.arduino import BATCH_COMMANDS
+from pynq.lib.arduino import GET_FIRMWARE_VERSION
+from pynq.lib.arduino import Grove_multi
+from pynq.lib.arduino import Grove_psensor
+from pynq.lib.arduino import instrument
+from pynq.lib.arduino.arduino_backend import Transaction
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+READ_PIR = 0x3
+WRITE_RELAY = 0x5
+
+
+def test_traffic(sim):
+    psensor = Grove_psensor(sim())
+    stats = instrument(psensor, names={READ_PIR: 'READ_PIR'})
+    assert isinstance(psensor.microblaze, Arduino_Stats)
+    psensor.read_pir()
+    psensor.read_pir()
+    psensor.write_relay(1)
+    result = stats.stats()
+    assert set(result) == {'READ_PIR', '0x5'}
+    assert result['READ_PIR']['count'] == 2
+    assert result['READ_PIR']['bytes_read'] == 8
+    assert result['READ_PIR']['bytes_written'] == 0
+    assert result['0x5']['bytes_written'] == 4
+    assert result['0x5']['bytes_read'] == 0
+    assert result['READ_PIR']['wait']['count'] == 2
+    assert result['READ_PIR']['read']['count'] == 2
+
+
+def test_wait_latency(sim):
+    psensor = Grove_psensor(sim(latency={READ_PIR: 0.01}))
+    stats = instrument(psensor)
+    psensor.read_pir()
+    wait = stats.stats()['0x3']['wait']
+    assert wait['min_us'] >= 10000
+    assert sum(wait['buckets_us'].values()) == 1
+    assert int(list(wait['buckets_us'])[0]) > wait['min_us']
+
+
+def test_async_wait_latency(sim):
+    psensor = Grove_psensor(sim(latency={READ_PIR: 0.01}))
+    stats = instrument(psensor)
+    asyncio.run(psensor.read_pir_async())
+    wait = stats.stats()['0x3']['wait']
+    assert wait['count'] == 1 and wait['min_us'] >= 10000
+
+
+def test_transaction_is_one_command(sim):
+    multi = Grove_multi(sim())
+    stats = instrument(multi)
+    multi.get_all_data()
+    multi.get_all_data()
+    result = stats.stats()
+    assert sorted(result) == ['0x{:x}'.format(BATCH_COMMANDS),
+                              '0x{:x}'.format(GET_FIRMWARE_VERSION)]
+    assert result['0x{:x}'.format(GET_FIRMWARE_VERSION)]['count'] == 1
+    assert result['0x{:x}'.format(BATCH_COMMANDS)]['count'] == 2
+    assert result['0x{:x}'.format(BATCH_COMMANDS)]['bytes_read'] == 8 * 14
+
+    stats.reset_stats()
+    Transaction(multi.microblaze).add(0x7, 1).execute()
+    assert stats.stats()['0x{:x}'.format(BATCH_COMMANDS)]['count'] == 1
+
+
+def test_instrument_is_idempotent(sim):
+    psensor = Grove_psensor(sim())
+    stats = instrument(psensor)
+    assert instrument(psensor) is stats
+    assert stats.state == 'RUNNING'
+
+
+def test_dump_json(sim):
+    psensor = Grove_psensor(sim())
+    stats = instrument(psensor)
+    psensor.read_pir()
+    fp = io.StringIO()
+    stats.dump_json(fp)
+    assert json.loads(fp.getvalue()) == json.loads(stats.dump_json())
+    assert json.loads(stats.dump_json())['0x3']['count'] == 1
+    stats.reset_stats()
+    assert stats.stats() == {}
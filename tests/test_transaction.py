@@ -0,0 +1,125 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import asyncio
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import ARDUINO
+from pynq.lib.arduino import Arduino_Sim
+from pynq.lib.arduino import Grove_multi
+from pynq.lib.arduino import instrument
+from pynq.lib.arduino import MAILBOX_PY2IOP_DATA_OFFSET
+from pynq.lib.arduino.arduino_backend import Transaction
+from pynq.lib.arduino.arduino_backend import firmware_version
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+GET_IMU_DATA = 0x3
+GET_DHT_DATA = 0x5
+GET_AL_DATA = 0x7
+
+SENSORS = {'dht': (21.5, 40.0), 'light': 2.5}
+
+
+@pytest.fixture
+def microblaze():
+    return Arduino_Sim(ARDUINO, "arduino_grove_multisensor.bin",
+                       sensors=SENSORS)
+
+
+def floats(words):
+    return np.asarray(words, dtype=np.uint32).view(np.float32).tolist()
+
+
+def test_execute(microblaze):
+    results = Transaction(microblaze).add(GET_DHT_DATA, 2) \
+        .add(GET_AL_DATA, 1).add(GET_IMU_DATA, 11).execute()
+    assert [len(words) for words in results] == [2, 1, 11]
+    assert floats(results[0]) == [21.5, 40.0]
+    assert floats(results[1]) == [2.5]
+    assert floats(results[2])[2] == 16384.0
+
+
+def test_execute_single_word(microblaze):
+    results = Transaction(microblaze).add(GET_AL_DATA, 1).execute()
+    assert floats(results[0]) == [2.5]
+
+
+def test_mailbox_overflow(microblaze):
+    transaction = Transaction(microblaze)
+    with pytest.raises(ValueError):
+        transaction.add(GET_IMU_DATA, MAILBOX_PY2IOP_DATA_OFFSET // 4 + 1)
+    assert transaction.commands == [] and transaction.num_words == 0
+
+
+def test_unbatchable_command(microblaze):
+    transaction = Transaction(microblaze).add(0x1, 0)
+    with pytest.raises(RuntimeError):
+        transaction.execute()
+
+
+def test_get_all_data(sim):
+    multi = Grove_multi(sim(sensors=SENSORS))
+    assert multi.get_all_data() == [multi.get_imu_data(),
+                                    multi.get_dht_data(),
+                                    multi.get_al_data()]
+
+
+def test_firmware_version(sim):
+    assert firmware_version(Grove_multi(sim()).microblaze) == 1
+    stock = Grove_multi(sim(firmware_version=0))
+    assert firmware_version(stock.microblaze) == 0
+
+
+def test_stock_program_cannot_batch():
+    microblaze = Arduino_Sim(ARDUINO, "arduino_grove_multisensor.bin",
+                             firmware_version=0)
+    transaction = Transaction(microblaze).add(GET_AL_DATA, 1)
+    with pytest.raises(RuntimeError, match="arduino_grove_multisensor.bin"):
+        transaction.execute()
+    with pytest.raises(RuntimeError):
+        asyncio.run(transaction.execute_async())
+
+
+def test_get_all_data_on_stock_program(sim):
+    multi = Grove_multi(sim(sensors=SENSORS, firmware_version=0))
+    stats = instrument(multi)
+    expected = [multi.get_imu_data(), multi.get_dht_data(),
+                multi.get_al_data()]
+    assert multi.get_all_data() == expected
+    assert asyncio.run(multi.get_all_data_async()) == expected
+    commands = stats.stats()
+    assert '0x{:x}'.format(arduino.BATCH_COMMANDS) not in commands
+    assert commands['0x{:x}'.format(GET_DHT_DATA)]['count'] == 3
@@ -0,0 +1,98 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import Grove_usranger
+from pynq.lib.arduino.arduino_grove_usranger import BURST_MAX_PINGS
+from pynq.lib.arduino.arduino_grove_usranger import BURST_MAX_TIME
+from pynq.lib.arduino.arduino_grove_usranger import PING_TIMEOUT
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+ECHOES = [40.0, 12.0, 41.0, 39.0, 90.0]
+
+
+def ranger(sim, echoes):
+    return Grove_usranger(sim(sensors={'distance': iter(echoes)}))
+
+
+def test_burst_returns_every_echo(sim):
+    distances = ranger(sim, ECHOES).get_distance_burst(len(ECHOES))
+    assert isinstance(distances, np.ndarray)
+    assert np.allclose(distances, ECHOES, atol=0.01)
+
+
+def test_burst_single_ping(sim):
+    distances = ranger(sim, [25.0]).get_distance_burst(1)
+    assert np.allclose(distances, [25.0], atol=0.01)
+
+
+def test_burst_timeout_reads_500(sim):
+    distances = ranger(sim, [600.0, 30.0]).get_distance_burst(2)
+    assert np.allclose(distances, [500, 30.0], atol=0.01)
+
+
+def test_burst_median(sim):
+    distance = ranger(sim, ECHOES).get_distance_burst(5, 'median')
+    assert distance == pytest.approx(40.0, abs=0.01)
+    distance = ranger(sim, ECHOES[:4]).get_distance_burst(4, 'median')
+    assert distance == pytest.approx(39.5, abs=0.01)
+
+
+def test_burst_trimmed_mean(sim):
+    distance = ranger(sim, ECHOES).get_distance_burst(5, 'trimmed_mean')
+    assert distance == pytest.approx(40.0, abs=0.01)
+
+
+def test_burst_invalid_arguments(sim):
+    usranger = ranger(sim, ECHOES)
+    for args in ((0,), (BURST_MAX_PINGS + 1,), (5, 'mean'),
+                 (4, 'trimmed_mean', 0.5)):
+        with pytest.raises(ValueError):
+            usranger.get_distance_burst(*args)
+
+
+def test_longest_burst(sim):
+    assert BURST_MAX_PINGS * PING_TIMEOUT <= BURST_MAX_TIME
+    echoes = [10.0 + i for i in range(BURST_MAX_PINGS)]
+    distances = ranger(sim, echoes).get_distance_burst(BURST_MAX_PINGS)
+    assert np.allclose(distances, echoes, atol=0.01)
+
+
+def test_burst_on_stock_program(sim):
+    usranger = Grove_usranger(sim(firmware_version=0))
+    with pytest.raises(RuntimeError):
+        usranger.get_distance_burst(5)
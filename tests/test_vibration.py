@@ -0,0 +1,99 @@
+#   Copyright (c) 2019, Xilinx, Inc.
+#   All rights reserved.
+#
+#   Redistribution and use in source and binary forms, with or without
+#   modification, are permitted provided that the following conditions are met:
+#
+#   1.  Redistributions of source code must retain the above copyright notice,
+#       this list of conditions and the following disclaimer.
+#
+#   2.  Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#
+#   3.  Neither the name of the copyright holder nor the names of its
+#       contributors may be used to endorse or promote products derived from
+#       this software without specific prior written permission.
+#
+#   THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#   AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#   THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#   PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+#   CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#   EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#   PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS;
+#   OR BUSINESS INTERRUPTION). HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY,
+#   WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR
+#   OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF
+#   ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+import pytest
+
+arduino = pytest.importorskip("pynq.lib.arduino")
+from pynq.lib.arduino import VibrationMonitor
+from pynq.lib.arduino.grove_vibration import ROAD_CONDITIONS
+
+
+__author__ = "Cong Zou"
+__copyright__ = "Copyright 2019, Xilinx"
+__email__ = "pynq_support@xilinx.com"
+
+
+RATE = 100
+
+
+def shake(count, frequency, amplitude):
+    t = np.arange(count) / RATE
+    frames = np.zeros((count, 11))
+    frames[:, 2] = 1 + amplitude * np.sin(2 * np.pi * frequency * t)
+    return frames
+
+
+def test_sine_energy_in_band():
+    monitor = VibrationMonitor(RATE)
+    features = monitor.update(shake(512, 10, 0.1))
+    assert len(features['time']) == (512 - 128) // 32 + 1
+    energy = features['band_energy']
+    assert energy.shape == (len(features['time']), 3)
+    # A sine of amplitude A carries A^2 / 2 of energy
+    assert np.allclose(energy[:, 1], 0.005, rtol=0.1)
+    assert np.all(energy[:, 0] < 1e-3 * energy[:, 1])
+    assert np.all(energy[:, 2] < 1e-3 * energy[:, 1])
+
+
+def test_low_frequency_band():
+    monitor = VibrationMonitor(RATE)
+    energy = monitor.update(shake(512, 2, 0.1))['band_energy']
+    assert np.all(np.argmax(energy, axis=1) == 0)
+
+
+def test_rms_and_condition():
+    monitor = VibrationMonitor(RATE)
+    features = monitor.update(shake(256, 10, 0.1))
+    assert np.allclose(features['rms'], 0.1 / np.sqrt(2), rtol=0.05)
+    assert np.allclose(features['peak_to_peak'], 0.2, rtol=0.05)
+    assert monitor.condition == ROAD_CONDITIONS[1]
+
+    monitor.update(shake(256, 10, 0.01))
+    assert monitor.condition == ROAD_CONDITIONS[0]
+
+
+def test_incremental_matches_batch():
+    frames = shake(600, 10, 0.1)
+    batch = VibrationMonitor(RATE).update(frames)
+    monitor = VibrationMonitor(RATE)
+    parts = [monitor.update(frames[i:i + 37]) for i in range(0, 600, 37)]
+    assert np.allclose(np.concatenate([p['time'] for p in parts]),
+                       batch['time'])
+    assert np.allclose(np.concatenate([p['band_energy'] for p in parts]),
+                       batch['band_energy'])
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        VibrationMonitor(0)
+    with pytest.raises(ValueError):
+        VibrationMonitor(RATE, window=64, hop=65)
+    with pytest.raises(ValueError):
+        VibrationMonitor(RATE, thresholds=(0.1,))